@@ -0,0 +1,223 @@
+# Alignment.py — line our capture up with a reference LAF trace (e.g. an ARTA export) without new recordings
+# CaptureConfig.start_offset_ms / window_sec / dbfs_to_dbspl make our numbers match ARTA's; instead of tuning
+# them by repeated captures, take one capture we already have (a WAV, or measure_once()["raw"]) and the LAF
+# trace ARTA logged for the same sound. Both are turned into LAF(t) envelopes on a 1 ms grid, the time offset
+# is the peak of their normalized FFT cross-correlation (sub-sample by parabolic interpolation) and the level
+# offset is the median level difference over the aligned overlap where the reference is within 20 dB of its
+# maximum. The level offset is the dBFS -> dB SPL offset that makes our LAF read as ARTA's (a soft-cal).
+#
+#   python -m common_modules.Alignment arta_log.csv capture.wav                     # report only
+#   python -m common_modules.Alignment arta_log.csv capture.wav --save --device UR22  # soft-cal + default window
+#   python -m common_modules.Alignment                                               # self-check
+from __future__ import annotations
+import argparse, csv, re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from common_modules.Audio import (CaptureConfig, _laf_fast_env_sq, _pick_channel, a_weighting_sos,
+                                  save_calibration, save_window)
+
+STEP_S = 0.001      # envelope grid
+FLOOR_DB = 60.0     # envelopes are floored this far below their maximum (detector settling, silence)
+SIGNAL_DB = 20.0    # level offset from where the reference is within this of its maximum
+
+
+# ---------------- Traces ----------------
+def _number(cell: str) -> Optional[float]:
+    m = re.match(r"^\s*([-+]?\d+(?:[.,]\d+)?(?:[eE][-+]?\d+)?)", cell)
+    return float(m.group(1).replace(",", ".")) if m else None
+
+# (t, level_db) from a CSV trace: ARTA SPL-meter log exports, or our own --trace (t_sec, LAF_dB). The level
+# column is the one whose header mentions LAF (else the last numeric one), time the one mentioning t / time
+# (else the first); without a time column the rows are ref_step_s apart
+def load_reference_trace(path, ref_step_s: float = 0.01) -> Tuple[np.ndarray, np.ndarray]:
+    text = Path(path).read_text(encoding="utf-8", errors="replace")
+    delim = ";" if ";" in text else ("\t" if "\t" in text else ",") # ';' exports use decimal commas
+    header, rows = None, []
+    for row in csv.reader(text.splitlines(), delimiter=delim):
+        values = [_number(c) for c in row if c.strip()]
+        if len(values) >= 1 and all(v is not None for v in values):
+            rows.append(values)
+        elif not rows and row:
+            header = [c.strip().lower() for c in row if c.strip()]
+    if not rows:
+        raise ValueError(f"{path}: no numeric rows")
+    width = min(len(r) for r in rows)
+    data = np.array([r[:width] for r in rows])
+    level_col, time_col = width - 1, (0 if width > 1 else None)
+    if header and len(header) >= width:
+        laf = [i for i, h in enumerate(header[:width]) if "laf" in h]
+        level_col = laf[0] if laf else level_col
+        times = [i for i, h in enumerate(header[:width]) if h.startswith("t") and i != level_col]
+        time_col = times[0] if times else (time_col if time_col != level_col else None)
+    level = data[:, level_col]
+    t = data[:, time_col] if time_col is not None else np.arange(len(level)) * ref_step_s
+    if np.any(np.diff(t) <= 0):
+        t = np.arange(len(level)) * ref_step_s
+    return t - t[0], level
+
+# LAF(t) of a capture on a step_s grid, in dBFS + dbfs_to_dbspl
+def laf_trace(x: np.ndarray, fs: int, dbfs_to_dbspl: float = 0.0, step_s: float = STEP_S) -> Tuple[np.ndarray, np.ndarray]:
+    from scipy.signal import sosfilt
+    env = _laf_fast_env_sq(sosfilt(a_weighting_sos(fs), x), fs)
+    hop = max(int(round(step_s * fs)), 1)
+    db = 10 * np.log10(env[::hop] + 1e-30) + dbfs_to_dbspl
+    return np.arange(len(db)) * hop / fs, db
+
+def load_capture(path) -> Tuple[np.ndarray, int]:
+    from scipy.io import wavfile
+    fs, data = wavfile.read(path)
+    if np.issubdtype(data.dtype, np.integer):
+        data = data.astype(np.float64) / float(np.iinfo(data.dtype).max + 1)
+    return _pick_channel(np.asarray(data), auto=True, average=False), int(fs)
+
+
+# ---------------- Estimation ----------------
+@dataclass
+class AlignmentResult:
+    time_offset_s: float      # the reference's t = 0 is this far into our capture (< 0: before it started)
+    level_offset_db: float    # dBFS -> dB SPL offset that makes our LAF equal the reference (soft-cal)
+    correlation: float        # normalized cross-correlation at the peak (1 = identical shape)
+    residual_db: float        # spread (std) of the level difference after alignment
+    overlap_s: float
+    window_sec: float         # reference duration: the analysis window that matches it
+
+    @property
+    def start_offset_ms(self) -> int:
+        return max(int(round(self.time_offset_s * 1000)), 0)
+
+    def report(self) -> str:
+        lines = [f"[align] time offset {self.time_offset_s * 1e3:+.1f} ms, level offset {self.level_offset_db:.2f} dB "
+                 f"(correlation {self.correlation:.3f}, residual {self.residual_db:.2f} dB over {self.overlap_s:.2f} s)",
+                 f"[align] -> start_offset_ms={self.start_offset_ms}, window_sec={self.window_sec:.3f}, "
+                 f"dbfs_to_dbspl={self.level_offset_db:.2f}"]
+        if self.time_offset_s < 0:
+            lines.append(f"[align] the reference starts {-self.time_offset_s * 1e3:.0f} ms before our capture: "
+                         f"lower pre_roll_ms by that much (or start the capture earlier)")
+        if self.correlation < 0.8:
+            lines.append("[align] low correlation: check that both traces are of the same sound")
+        return "\n".join(lines)
+
+
+def _floored(db: np.ndarray) -> np.ndarray:
+    return np.maximum(db, db.max() - FLOOR_DB)
+
+# where the reference trace (ref_t, ref_db) sits in capture x: time and level offsets. min_overlap: fraction
+# of the reference that must overlap the capture for a candidate offset
+def estimate_alignment(ref_t: np.ndarray, ref_db: np.ndarray, x: np.ndarray, fs: int,
+                       step_s: float = STEP_S, min_overlap: float = 0.5) -> AlignmentResult:
+    from scipy.signal import correlate
+    _, ours_db = laf_trace(x, fs, 0.0, step_s)
+    grid = np.arange(0.0, ref_t[-1] + step_s / 2, step_s)
+    ref_i = np.interp(grid, ref_t, ref_db)
+    a = _floored(ours_db)
+    b = _floored(ref_i)
+    a0, b0 = a - a.mean(), b - b.mean()
+    num = correlate(a0, b0, mode="full", method="fft")
+    ea = correlate(a0 ** 2, np.ones(len(b0)), mode="full", method="fft")  # sum of a0^2 under the reference
+    eb = correlate(np.ones(len(a0)), b0 ** 2, mode="full", method="fft")
+    overlap = correlate(np.ones(len(a0)), np.ones(len(b0)), mode="full", method="fft")
+    ncc = np.where(overlap >= min_overlap * len(b0), num / np.sqrt(np.maximum(ea * eb, 1e-30)), -np.inf)
+    k = int(np.argmax(ncc))
+    frac = 0.0
+    if 0 < k < len(ncc) - 1 and np.isfinite(ncc[k - 1]) and np.isfinite(ncc[k + 1]):
+        y0, y1, y2 = ncc[k - 1], ncc[k], ncc[k + 1]
+        den = y0 - 2 * y1 + y2
+        frac = 0.5 * (y0 - y2) / den if den != 0 else 0.0
+    lag = k - (len(b0) - 1) # ours[n + lag] ~ ref[n]
+    tau = (lag + frac) * step_s
+    # level difference over the overlap, at the whole-sample lag
+    n = np.arange(len(b))
+    valid = (n + lag >= 0) & (n + lag < len(a)) & (ref_i >= ref_i.max() - SIGNAL_DB)
+    diff = ref_i[valid] - ours_db[n[valid] + lag]
+    return AlignmentResult(time_offset_s=float(tau), level_offset_db=float(np.median(diff)), correlation=float(ncc[k]),
+                           residual_db=float(np.std(diff)), overlap_s=float(valid.sum() * step_s),
+                           window_sec=float(ref_t[-1]))
+
+# a measure_once() result (or any {"raw", "fs"}) against a reference trace file
+def align_to_reference(capture: dict, reference_path, ref_step_s: float = 0.01) -> AlignmentResult:
+    ref_t, ref_db = load_reference_trace(reference_path, ref_step_s)
+    return estimate_alignment(ref_t, ref_db, capture["raw"], capture["fs"])
+
+# store the result as the device's soft-cal offset and default analysis window (used by measure_once)
+def apply_alignment(cfg: CaptureConfig, device_name: str, result: AlignmentResult, save: bool = True) -> CaptureConfig:
+    cfg.dbfs_to_dbspl = result.level_offset_db
+    cfg.start_offset_ms, cfg.window_sec = result.start_offset_ms, round(result.window_sec, 3)
+    if save:
+        save_calibration(cfg, device_name, cfg.dbfs_to_dbspl)
+        save_window(cfg, device_name, cfg.start_offset_ms, cfg.window_sec)
+    return cfg
+
+
+# ---------------- Self-check ----------------
+# a capture of noise bursts and an "ARTA" trace of a window of it (known offset and calibration, logged every
+# 10 ms with 0.1 dB rounding, written as a semicolon CSV with decimal commas): both offsets must come back
+def selfcheck_alignment(fs: int = 48000, workdir=None) -> bool:
+    import tempfile
+    rng = np.random.default_rng(3)
+    n = int(8.0 * fs)
+    block = int(0.12 * fs)
+    env = np.repeat(rng.uniform(0.02, 1.0, n // block + 1), block)[:n]
+    x = 0.05 * env * rng.normal(0.0, 1.0, n)
+    ok = True
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="align_"))
+    for offset_s, cal, duration in ((0.2374, 97.3, 5.0), (1.5, 104.0, 3.0)):
+        t, db = laf_trace(x, fs, cal, 0.001)
+        sel = (t >= offset_s) & (t <= offset_s + duration)
+        ref_t, ref_db = t[sel][::10] - offset_s, np.round(db[sel][::10], 1)
+        path = workdir / f"arta_{offset_s}.csv"
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(["Time [s]", "LAF [dB]"])
+            for ti, di in zip(ref_t, ref_db):
+                w.writerow([f"{ti:.3f}".replace(".", ","), f"{di:.1f}".replace(".", ",")])
+        r = align_to_reference({"raw": x, "fs": fs}, path)
+        good = abs(r.time_offset_s - offset_s) < 0.002 and abs(r.level_offset_db - cal) < 0.1
+        ok &= good
+        print(f"[selfcheck] true offset {offset_s * 1e3:.1f} ms / {cal:.2f} dB:")
+        print(r.report() + ("" if good else "  <-- FAILED"))
+    print(f"[selfcheck] alignment {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+__all__ = [
+    "AlignmentResult",
+    "load_reference_trace",
+    "load_capture",
+    "laf_trace",
+    "estimate_alignment",
+    "align_to_reference",
+    "apply_alignment",
+    "selfcheck_alignment",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Estimate time and level offsets of our capture against a reference LAF trace")
+    p.add_argument("reference", nargs="?", help="Reference LAF trace CSV (ARTA export); default: self-check")
+    p.add_argument("capture", nargs="?", help="Our capture of the same sound (WAV)")
+    p.add_argument("--ref-step", type=float, default=0.01, help="Row spacing (s) if the reference has no time column")
+    p.add_argument("--save", action="store_true", help="Save as the device's soft-cal offset and default window")
+    p.add_argument("--device", default="UR22", help="Device name hint for --save")
+    p.add_argument("--open-ch", type=int, default=2, help="Channels opened on the device (part of the calibration key)")
+    args = p.parse_args()
+
+    if not args.reference:
+        selfcheck_alignment()
+    else:
+        if not args.capture:
+            p.error("capture is required with a reference")
+        x, fs = load_capture(args.capture)
+        ref_t, ref_db = load_reference_trace(args.reference, args.ref_step)
+        result = estimate_alignment(ref_t, ref_db, x, fs)
+        print(result.report())
+        if args.save:
+            from common_modules.Audio import device_name_from_id, find_input_device_id
+            cfg = CaptureConfig(device_name_hint=args.device, samplerate=fs, open_channels=args.open_ch)
+            name = device_name_from_id(find_input_device_id(args.device))
+            apply_alignment(cfg, name, result)
+            print(f"[align] saved for {name} -> {cfg.cal_file}")
@@ -6,8 +6,10 @@ from pathlib import Path
 from typing import Optional, Dict, Tuple
 
 import numpy as np
-import sounddevice as sd
-from scipy.signal import sosfilt, bilinear_zpk, zpk2sos, sosfreqz
+from scipy.signal import lfilter, sosfilt, bilinear_zpk, zpk2sos, sosfreqz
+
+# sounddevice (PortAudio) is imported by the capture functions only, so the DSP here also runs on machines
+# without an audio stack (dry runs, reprocessing archived captures)
 
 
 # ---------------- A- and C-weighting (digital, unity @ 1 kHz) ----------------
@@ -58,6 +60,14 @@ class CaptureConfig:
     cal_file: Path = Path("audio_cal.json")
     # extras
     dump_trace_csv: Optional[Path] = None    # write LAF(t) dB trace here
+    archive_path: Optional[Path] = None      # append every raw capture (all opened channels) to this Audio_archive
+    archive_codec: str = "int24"             # "int24" | "int16" | "float32"
+    archive_meta: Optional[dict] = None      # extra metadata stored with the capture, e.g. the stimulus
+    loudness: Optional[str] = None           # "free" | "diffuse": add ISO 532-1 loudness (sone / phon) to the metrics
+    # capture health (always recorded). A capture over a limit is retried health_retries times, then fails
+    max_xruns: Optional[int] = None          # overflows + underflows allowed (0 = none); None = not checked
+    max_jitter_ms: Optional[float] = None    # block arrival jitter allowed; None = not checked
+    health_retries: int = 1
     debug: bool = False
 
 
@@ -65,6 +75,7 @@ class CaptureConfig:
 def find_input_device_id(name_hint: Optional[str]) -> Optional[int]:
     if not name_hint:
         return None
+    import sounddevice as sd
     name_hint = name_hint.lower()
     devs = sd.query_devices()
     apis = sd.query_hostapis()
@@ -77,6 +88,7 @@ def find_input_device_id(name_hint: Optional[str]) -> Optional[int]:
     return None
 
 def device_name_from_id(dev_id: Optional[int]) -> str:
+    import sounddevice as sd
     devs = sd.query_devices()
     if isinstance(dev_id, int):
         return devs[dev_id]["name"]
@@ -110,6 +122,98 @@ def save_calibration(cfg: CaptureConfig, device_name: str, offset: float) -> Non
     data[_cal_key(device_name, cfg)] = float(offset)
     cfg.cal_file.write_text(json.dumps(data, indent=2))
 
+# default analysis window per device (e.g. from Alignment against an ARTA trace), next to the calibration
+def _window_key(device_name: str, cfg: CaptureConfig) -> str:
+    return _cal_key(device_name, cfg) + "|window"
+
+def load_window(cfg: CaptureConfig, device_name: str) -> Optional[Tuple[int, Optional[float]]]:
+    if not cfg.cal_file.exists():
+        return None
+    try:
+        w = json.loads(cfg.cal_file.read_text()).get(_window_key(device_name, cfg))
+    except Exception:
+        return None
+    return (int(w["start_offset_ms"]), w.get("window_sec")) if w else None
+
+def save_window(cfg: CaptureConfig, device_name: str, start_offset_ms: int, window_sec: Optional[float]) -> None:
+    data = {}
+    if cfg.cal_file.exists():
+        try:
+            data = json.loads(cfg.cal_file.read_text())
+        except Exception:
+            data = {}
+    data[_window_key(device_name, cfg)] = {"start_offset_ms": int(start_offset_ms), "window_sec": window_sec}
+    cfg.cal_file.write_text(json.dumps(data, indent=2))
+
+
+# ---------------- Capture health ----------------
+@dataclass
+class CaptureHealth:
+    overflows: int = 0                   # blocks PortAudio flagged input overflow (samples lost before we got them)
+    underflows: int = 0                  # blocks flagged input underflow (padded, not real audio)
+    blocks: int = 0
+    block_ms: float = 0.0                # mean block length
+    latency_ms: Optional[float] = None   # input latency reported by the stream
+    jitter_ms: float = 0.0               # std of (block arrival interval - block length)
+    max_late_ms: float = 0.0             # longest a block arrived after it was due
+    attempts: int = 1                    # captures measure_once took for this result
+
+    @property
+    def xruns(self) -> int:
+        return self.overflows + self.underflows
+
+    # what is over the limits (None = not checked); empty when healthy
+    def problems(self, max_xruns: Optional[int] = None, max_jitter_ms: Optional[float] = None) -> list:
+        out = []
+        if max_xruns is not None and self.xruns > max_xruns:
+            out.append(f"{self.overflows} overflows + {self.underflows} underflows > {max_xruns}")
+        if max_jitter_ms is not None and self.jitter_ms > max_jitter_ms:
+            out.append(f"block jitter {self.jitter_ms:.2f} ms > {max_jitter_ms} ms")
+        return out
+
+    def to_dict(self) -> dict:
+        d = {k: (round(v, 3) if isinstance(v, float) else v) for k, v in self.__dict__.items()}
+        d["xruns"] = self.xruns
+        return d
+
+    def describe(self) -> str:
+        latency = "?" if self.latency_ms is None else f"{self.latency_ms:.1f}"
+        return (f"{self.overflows} overflows, {self.underflows} underflows in {self.blocks} blocks of {self.block_ms:.1f} ms, "
+                f"latency {latency} ms, jitter {self.jitter_ms:.2f} ms (max late {self.max_late_ms:.1f} ms)")
+
+class CaptureHealthError(RuntimeError):
+    def __init__(self, message: str, health: CaptureHealth):
+        super().__init__(message)
+        self.health = health
+
+class CaptureMonitor:
+    """Fed from the stream callback: xrun flags and the arrival time of every block."""
+    def __init__(self, fs: int):
+        self.fs = fs
+        self.reset()
+
+    def reset(self):
+        self.overflows = self.underflows = 0
+        self.arrivals, self.frames = [], []
+
+    def block(self, frames: int, status=None, now: Optional[float] = None):
+        self.arrivals.append(time.perf_counter() if now is None else now)
+        self.frames.append(frames)
+        if status is not None:
+            self.overflows += bool(getattr(status, "input_overflow", False))
+            self.underflows += bool(getattr(status, "input_underflow", False))
+
+    def health(self, latency_s: Optional[float] = None) -> CaptureHealth:
+        h = CaptureHealth(self.overflows, self.underflows, len(self.frames),
+                          latency_ms=None if latency_s is None else 1e3 * float(latency_s))
+        if self.frames:
+            h.block_ms = 1e3 * float(np.mean(self.frames)) / self.fs
+        if len(self.arrivals) > 1:
+            # a block is due one block length after the previous one; a driver delivering late or in bursts shows here
+            late = np.diff(self.arrivals) - np.asarray(self.frames[1:], dtype=np.float64) / self.fs
+            h.jitter_ms, h.max_late_ms = 1e3 * float(np.std(late)), 1e3 * max(float(late.max()), 0.0)
+        return h
+
 
 # ---------------- Capture ----------------
 def _pick_channel(arr: np.ndarray, auto: bool, average: bool) -> np.ndarray:
@@ -124,20 +228,48 @@ def _pick_channel(arr: np.ndarray, auto: bool, average: bool) -> np.ndarray:
     # default to left
     return arr[:, 0].astype(np.float64)
 
-def record_raw(cfg: CaptureConfig, device_id: Optional[int]) -> np.ndarray:
+# on_block: called with each block of raw (frames, channels) samples as it is read (e.g. an archive writer).
+# health: a CaptureHealth to fill in with the xruns, latency and block timing of this capture
+def record_raw(cfg: CaptureConfig, device_id: Optional[int], on_block=None, health: Optional[CaptureHealth] = None) -> np.ndarray:
+    import queue
+    import sounddevice as sd
     frames = int(cfg.duration_s * cfg.samplerate)
     ch_to_open = max(1, cfg.open_channels)
 
     sd.check_input_settings(device=device_id, channels=ch_to_open, samplerate=cfg.samplerate)
 
+    # callback stream: PortAudio's xrun flags and the block timing are only seen there
+    monitor, q = CaptureMonitor(cfg.samplerate), queue.Queue()
+    def callback(indata, n, time_info, status):
+        monitor.block(n, status)
+        q.put(indata.copy())
+
     with sd.InputStream(device=device_id,
                         channels=ch_to_open,
                         samplerate=cfg.samplerate,
                         dtype="float32",
-                        latency=cfg.latency) as stream:
+                        latency=cfg.latency,
+                        callback=callback) as stream:
         if cfg.pre_roll_ms > 0:
             time.sleep(cfg.pre_roll_ms / 1000.0)
-        data, _ = stream.read(frames)  # (frames, ch)
+            while not q.empty(): # the pre-roll is discarded and not counted in the health
+                q.get_nowait()
+            monitor.reset()
+        blocks, got = [], 0
+        while got < frames:
+            try:
+                block = q.get(timeout=frames / cfg.samplerate + 5.0)
+            except queue.Empty:
+                raise RuntimeError(f"Capture stalled: {got}/{frames} frames received") from None
+            block = block[:frames - got]
+            if on_block is not None:
+                on_block(block)
+            blocks.append(block)
+            got += len(block)
+        latency_s = stream.latency
+    data = np.concatenate(blocks, axis=0)  # (frames, ch)
+    if health is not None:
+        vars(health).update(vars(monitor.health(latency_s)))
 
     x = _pick_channel(data, auto=cfg.auto_channel, average=cfg.average_lr)
     if cfg.debug:
@@ -152,23 +284,109 @@ def _laf_fast_env_sq(x: np.ndarray, fs: int, tau: float = 0.125) -> np.ndarray:
     """Exponential IEC 'Fast' detector operating on mean-square."""
     alpha = 1.0 - np.exp(-1.0/(tau*fs))
     ms = x.astype(np.float64)**2
-    y = 0.0
-    env = np.empty_like(ms)
-    for i, v in enumerate(ms):
-        y += alpha*(v - y)
-        env[i] = y
-    return env  # mean-square
-
-def _subwindow(x: np.ndarray, fs: int, start_ms: int, window_sec: Optional[float]) -> np.ndarray:
+    # y[i] = y[i-1] + alpha*(ms[i] - y[i-1]) from y = 0, as a one-pole IIR instead of a per-sample loop
+    return lfilter([alpha], [1.0, alpha - 1.0], ms)  # mean-square
+
+class TruePeakMeter:
+    """Inter-sample (true) peak of a stream, block by block, by 4x polyphase interpolation (BS.1770 style).
+
+    The interpolator (Kaiser-windowed sinc, taps_per_phase taps per phase: within 0.03 dB up to 0.85 of
+    Nyquist, images below -50 dB) is precomputed as one matrix giving the interpolated points within two
+    samples of a sample from its neighbours. Only local maxima of |x| that could still beat the running
+    peak (|x| times the interpolator's gain) are candidates; the top_k by parabolic estimate are
+    interpolated, then the rest whose estimate is within tol_db of the peak found. This matches
+    interpolating every sample for content up to ~0.4 fs (above that it may under-read by ~0.1 dB, as
+    any 4x meter does) at a fraction of the cost: a few ms per 10 s of noise, more for steady high tones.
+    """
+    def __init__(self, oversample: int = 4, taps_per_phase: int = 24, top_k: int = 256, tol_db: float = 2.0,
+                 lead: Optional[np.ndarray] = None):
+        self.M, self.reach, self.gain = _true_peak_bank(oversample, taps_per_phase)
+        self._taps = np.arange(-self.reach, self.reach + 1)
+        self.top_k, self._tol = top_k, 10 ** (tol_db / 20)
+        self.buf = np.zeros(self.reach)   # before the stream: zeros, or the end of `lead`
+        if lead is not None and len(lead):
+            lead = np.asarray(lead, dtype=np.float64)[-self.reach:]
+            self.buf[len(self.buf) - len(lead):] = lead
+        self.next = self.reach            # first sample of buf not yet evaluated
+        self.peak = 0.0
+
+    def process(self, block: np.ndarray) -> float:
+        buf = np.concatenate([self.buf, np.asarray(block, dtype=np.float64).reshape(-1)])
+        lo, hi = self.next, len(buf) - self.reach  # samples with their whole neighbourhood in buf
+        if hi > lo:
+            ax = np.abs(buf)
+            mid = ax[lo:hi]
+            self.peak = max(self.peak, float(mid.max()))
+            cand = (mid >= ax[lo - 1:hi - 1]) & (mid >= ax[lo + 1:hi + 1]) & (mid * self.gain > self.peak)
+            j = np.flatnonzero(cand) + lo
+            if len(j):
+                # parabolic estimate of each local peak: interpolate the top_k, then only the ones whose
+                # estimate comes within tol_db of the peak found so far
+                a, b, c = ax[j - 1], ax[j], ax[j + 1]
+                est = b + (a - c) ** 2 / (8 * np.maximum(2 * b - a - c, 1e-30))
+                order = np.argsort(-est)
+                self._interpolate(buf, j[order[:self.top_k]])
+                rest = order[self.top_k:]
+                self._interpolate(buf, j[rest[est[rest] * self._tol > self.peak]])
+            self.next = hi
+        keep = self.next - self.reach
+        self.buf, self.next = buf[keep:], self.reach
+        return self.peak
+
+    def _interpolate(self, buf: np.ndarray, j: np.ndarray):
+        if len(j):
+            win = buf[j[:, None] + self._taps]
+            self.peak = max(self.peak, float(np.abs(win @ self.M.T).max()))
+
+    def finish(self, tail: Optional[np.ndarray] = None) -> float:
+        after = np.zeros(self.reach)      # after the stream: zeros, or the start of `tail`
+        if tail is not None and len(tail):
+            after[:min(len(tail), self.reach)] = np.asarray(tail)[:self.reach]
+        return self.process(after)
+
+_TP_BANKS: Dict[Tuple[int, int], tuple] = {}
+
+def _true_peak_bank(oversample: int, taps_per_phase: int, span: int = 2):
+    # rows: interpolated points at t = j + f/L for |t - j| < span; columns: samples j-reach .. j+reach
+    key = (oversample, taps_per_phase)
+    if key not in _TP_BANKS:
+        from scipy.signal import firwin
+        L, T = oversample, taps_per_phase
+        h = firwin(L * T + 1, 1.0 / L, window=("kaiser", 6.0)) * L  # odd length: phase 0 is the samples themselves
+        D, reach = L * T // 2, T // 2 + span
+        offsets = range(-(span * L - 1), span * L)
+        M = np.zeros((len(offsets), 2 * reach + 1))
+        for fi, f in enumerate(offsets):
+            for ri, r in enumerate(range(-reach, reach + 1)):
+                k = D - r * L + f
+                if 0 <= k < len(h):
+                    M[fi, ri] = h[k]
+        _TP_BANKS[key] = (M, reach, float(np.abs(M).sum(axis=1).max()))
+    return _TP_BANKS[key]
+
+# true peak of x[start:stop]; the samples around the window are its neighbours (not zeros), so cutting a
+# window out of a longer signal adds no edge overshoot
+def true_peak(x: np.ndarray, oversample: int = 4, block: int = 1 << 16, start: int = 0, stop: Optional[int] = None) -> float:
+    stop = len(x) if stop is None else min(stop, len(x))
+    meter = TruePeakMeter(oversample, lead=x[max(start - block, 0):start])
+    for i in range(start, stop, block):
+        meter.process(x[i:min(i + block, stop)])
+    return meter.finish(x[stop:stop + meter.reach])
+
+def _window_bounds(n: int, fs: int, start_ms: int, window_sec: Optional[float]) -> Tuple[int, int]:
     i0 = max(int(start_ms/1000 * fs), 0)
     if window_sec is None:
-        return x[i0:]
-    i1 = min(i0 + int(window_sec * fs), len(x))
+        return i0, n
+    return i0, min(i0 + int(window_sec * fs), n)
+
+def _subwindow(x: np.ndarray, fs: int, start_ms: int, window_sec: Optional[float]) -> np.ndarray:
+    i0, i1 = _window_bounds(len(x), fs, start_ms, window_sec)
     return x[i0:i1]
 
 def compute_metrics(x: np.ndarray, fs: int, dbfs_to_dbspl: float,
                     start_offset_ms: int = 0, window_sec: Optional[float] = None,
-                    dump_trace_csv: Optional[Path] = None) -> Dict[str, float]:
+                    dump_trace_csv: Optional[Path] = None, true_peaks: bool = True,
+                    loudness: Optional[str] = None) -> Dict[str, float]:
     # A-weight, unity @ 1k
     sosA = a_weighting_sos(fs)
     xA = sosfilt(sosA, x)
@@ -196,7 +414,20 @@ def compute_metrics(x: np.ndarray, fs: int, dbfs_to_dbspl: float,
             for i, val in enumerate(laf_series_db):
                 w.writerow([t0 + i/fs, float(val)])
 
-    return {"LeqA": leqA, "LAFmax": lafmax, "LAFmin": lafmin, "LApeak": la_peak}
+    out = {"LeqA": leqA, "LAFmax": lafmax, "LAFmin": lafmin, "LApeak": la_peak}
+    if true_peaks:
+        # 4x oversampled: A- and C-weighted true peak in the window, and the unweighted one of the whole
+        # capture in dB re full scale (clipping)
+        i0, i1 = _window_bounds(len(x), fs, start_offset_ms, window_sec)
+        xC = sosfilt(c_weighting_sos(fs), x)
+        out["LAtruepeak"] = 20*np.log10(true_peak(xA, start=i0, stop=i1) + 1e-30) + dbfs_to_dbspl
+        out["LCpeak"] = 20*np.log10(true_peak(xC, start=i0, stop=i1) + 1e-30) + dbfs_to_dbspl
+        out["dBTP"] = 20*np.log10(true_peak(x) + 1e-30)
+    if loudness:
+        # Zwicker loudness of the window in the given sound field: N_sone, LN_phon, Nmax_sone, N5_sone, LN5_phon
+        from common_modules.Loudness import loudness_metrics
+        out.update(loudness_metrics(x, fs, dbfs_to_dbspl, loudness, start_offset_ms, window_sec))
+    return out
 
 
 # ---------------- Public API ----------------
@@ -214,12 +445,45 @@ def measure_once(cfg: CaptureConfig) -> Dict[str, object]:
         else:
             cfg.dbfs_to_dbspl = float(loaded)
 
-    raw = record_raw(cfg, dev_id)
+    # resolve analysis window: a saved default applies only while the config does not set one
+    if cfg.start_offset_ms == 0 and cfg.window_sec is None:
+        saved = load_window(cfg, dev_name)
+        if saved is not None:
+            cfg.start_offset_ms, cfg.window_sec = saved
+            if cfg.debug:
+                print(f"[debug] Saved analysis window: start {cfg.start_offset_ms} ms, length {cfg.window_sec} s")
+
+    # a capture over the health limits is taken again (each attempt is archived, with its health)
+    attempts = 1 + max(cfg.health_retries, 0)
+    for attempt in range(1, attempts + 1):
+        health = CaptureHealth()
+        if cfg.archive_path is None:
+            raw = record_raw(cfg, dev_id, health=health)
+            archive_id = None
+        else:
+            # raw blocks are compressed by the writer's thread while the capture runs
+            from common_modules.Audio_archive import ArchiveWriter
+            with ArchiveWriter(cfg.archive_path, codec=cfg.archive_codec) as w:
+                w.begin(cfg.samplerate, max(1, cfg.open_channels), device=dev_name, dbfs_to_dbspl=cfg.dbfs_to_dbspl,
+                        start_offset_ms=cfg.start_offset_ms, window_sec=cfg.window_sec, auto_channel=cfg.auto_channel,
+                        average_lr=cfg.average_lr, stimulus=cfg.archive_meta)
+                raw = record_raw(cfg, dev_id, on_block=w.write, health=health)
+                archive_id = w.end(health=health.to_dict())
+        health.attempts = attempt
+        problems = health.problems(cfg.max_xruns, cfg.max_jitter_ms)
+        if cfg.debug or problems:
+            print(f"[health] capture {attempt}/{attempts}: {health.describe()}")
+        if not problems:
+            break
+        if attempt == attempts:
+            raise CaptureHealthError(f"Capture unhealthy after {attempts} attempts: {'; '.join(problems)}", health)
     metrics = compute_metrics(raw, cfg.samplerate, cfg.dbfs_to_dbspl,
                               start_offset_ms=cfg.start_offset_ms,
                               window_sec=cfg.window_sec,
-                              dump_trace_csv=cfg.dump_trace_csv)
-    return {"device_id": dev_id, "device_name": dev_name, "raw": raw, "fs": cfg.samplerate, "metrics": metrics}
+                              dump_trace_csv=cfg.dump_trace_csv,
+                              loudness=cfg.loudness)
+    return {"device_id": dev_id, "device_name": dev_name, "raw": raw, "fs": cfg.samplerate, "metrics": metrics,
+            "archive_id": archive_id, "health": health}
 
 
 # ---------------- Calibration (hard + soft) ----------------
@@ -289,14 +553,86 @@ def selfcheck_dsp(fs: int) -> bool:
     return ok_gain and abs(err_db) < 0.2
 
 
+# true peak on analytic signals: a fs/4 sine sampled 45 degrees off its crests (samples 3.01 dB low), a
+# band-limited pulse centred between two samples, a 1 kHz sine (no inter-sample gain) and LCpeak of a
+# 94 dB calibrator tone (peak = RMS + 3.01 dB); also block-by-block == whole signal
+def selfcheck_true_peak(fs: int) -> bool:
+    n = int(fs * 1.0)
+    fade = np.ones(n)
+    ramp = np.hanning(2 * int(0.01 * fs))
+    fade[:len(ramp) // 2], fade[-(len(ramp) // 2):] = ramp[:len(ramp) // 2], ramp[len(ramp) // 2:]
+    t = np.arange(n) / fs
+    k = np.arange(-2000, 2000)
+    cases = [("fs/4 sine at 45 deg", 0.5 * fade * np.sin(2 * np.pi * fs / 4 * t + np.pi / 4), 0.5),
+             ("half-sample pulse", 0.8 * np.sinc(0.8 * (k - 0.5)), 0.8),
+             ("1 kHz sine", 0.5 * fade * np.sin(2 * np.pi * 1000.0 * t + 0.3), 0.5)]
+    ok = True
+    for name, x, want in cases:
+        sample_db = 20*np.log10(np.max(np.abs(x)) / want)
+        tp_db = 20*np.log10(true_peak(x) / want)
+        blocks_db = 20*np.log10(true_peak(x, block=777) / want)
+        good = abs(tp_db) < 0.05 and abs(blocks_db - tp_db) < 1e-9
+        ok &= good
+        print(f"[selfcheck] true peak {name}: sample peak {sample_db:+.2f} dB, true peak {tp_db:+.3f} dB"
+              f"{'' if good else '  <-- FAILED'}")
+    cal = 0.1 * np.sqrt(2) * fade * np.sin(2 * np.pi * 1000.0 * t) # -20 dBFS RMS, 94 dB at offset 114
+    m = compute_metrics(cal, fs, 114.0, start_offset_ms=200, window_sec=0.5)
+    good = abs(m["LCpeak"] - 97.01) < 0.05 and abs(m["LAtruepeak"] - 97.01) < 0.05
+    ok &= good
+    print(f"[selfcheck] 94 dB 1 kHz: LCpeak {m['LCpeak']:.2f} dB, LAtruepeak {m['LAtruepeak']:.2f} dB (want 97.01)"
+          f"{'' if good else '  <-- FAILED'}")
+    x = np.random.default_rng(0).normal(0.0, 0.01, 10 * fs)
+    t0 = time.perf_counter()
+    compute_metrics(x, fs, 94.0, true_peaks=False)
+    t1 = time.perf_counter()
+    compute_metrics(x, fs, 94.0)
+    t2 = time.perf_counter()
+    print(f"[selfcheck] compute_metrics on 10 s of noise: {1e3 * (t1 - t0):.0f} ms, with true peaks {1e3 * (t2 - t1):.0f} ms")
+    return ok
+
+
+# capture health from a simulated callback schedule: 10 ms blocks on time (0.1 ms scheduling noise), then the
+# same with one overflow and a 30 ms stall made up by a burst. The clean one must pass a 0-xrun / 1 ms jitter
+# limit, the other must fail both
+def selfcheck_capture_health(fs: int) -> bool:
+    from types import SimpleNamespace
+    rng = np.random.default_rng(0)
+    n, block = 500, int(0.01 * fs)
+    due = np.arange(n) * block / fs
+    ok = True
+    for name, stall in (("clean", False), ("overflow + stall", True)):
+        arrivals = due + rng.normal(0.0, 1e-4, n)
+        if stall:
+            arrivals[200:203] = arrivals[203] # three blocks held back by the driver, then delivered at once
+        mon = CaptureMonitor(fs)
+        for i, t in enumerate(arrivals):
+            mon.block(block, SimpleNamespace(input_overflow=stall and i == 203, input_underflow=False), now=t)
+        h = mon.health(latency_s=0.0087)
+        problems = h.problems(max_xruns=0, max_jitter_ms=1.0)
+        good = (len(problems) == 2 and h.overflows == 1 and h.max_late_ms > 25) if stall else (not problems and h.jitter_ms < 0.3)
+        ok &= good
+        print(f"[selfcheck] capture health, {name}: {h.describe()} -> {'; '.join(problems) or 'healthy'}"
+              f"{'' if good else '  <-- FAILED'}")
+    return ok
+
+
 __all__ = [
     "CaptureConfig",
+    "CaptureHealth",
+    "CaptureHealthError",
+    "CaptureMonitor",
     "measure_once",
     "calibrate",
     "calibrate_soft",
     "load_calibration",
     "save_calibration",
+    "load_window",
+    "save_window",
     "selfcheck_dsp",
+    "TruePeakMeter",
+    "true_peak",
+    "selfcheck_true_peak",
+    "selfcheck_capture_health",
 ]
 
 
@@ -317,9 +653,16 @@ if __name__ == "__main__":
     p.add_argument("--calibrate", action="store_true", help="Hard cal with 1 kHz @ known SPL on mic")
     p.add_argument("--known-spl", type=float, default=94.0)
     p.add_argument("--trace", type=Path, help="Write LAF time series (t, LAF_dB) to CSV")
+    p.add_argument("--archive", type=Path, help="Append the raw capture to this archive (Audio_archive)")
+    p.add_argument("--loudness", choices=("free", "diffuse"), help="Add ISO 532-1 loudness for this sound field")
+    p.add_argument("--max-xruns", type=int, help="Retry (then fail) a capture with more overflows + underflows")
+    p.add_argument("--max-jitter-ms", type=float, help="Retry (then fail) a capture with more block timing jitter")
+    p.add_argument("--health-retries", type=int, default=1)
     args = p.parse_args()
 
     selfcheck_dsp(args.fs)
+    selfcheck_true_peak(args.fs)
+    selfcheck_capture_health(args.fs)
 
     cfg = CaptureConfig(
         device_name_hint=args.device,
@@ -332,6 +675,11 @@ if __name__ == "__main__":
         auto_channel=not args.no_auto_channel,
         average_lr=args.avg_lr,
         dump_trace_csv=args.trace,
+        archive_path=args.archive,
+        loudness=args.loudness,
+        max_xruns=args.max_xruns,
+        max_jitter_ms=args.max_jitter_ms,
+        health_retries=args.health_retries,
         debug=args.debug
     )
 
@@ -345,4 +693,5 @@ if __name__ == "__main__":
 
     res = measure_once(cfg)
     print("Device:", res["device_name"])
+    print("Health:", res["health"].describe())
     print(res["metrics"])
@@ -0,0 +1,339 @@
+# Audio_archive.py — compact archive of every raw capture, for reprocessing without a bench
+# measure_once (CaptureConfig.archive_path) appends each capture, all opened channels, to one archive file
+# with its metadata (device, fs, calibration offset, window, stimulus, ...). A new weighting or window is then
+# a loop over the archive instead of a re-measurement:
+#
+#   python -m common_modules.Audio_archive captures.aarc                  # list
+#   python -m common_modules.Audio_archive captures.aarc --metrics        # recompute the metrics of every capture
+#   python -m common_modules.Audio_archive captures.aarc --metrics --loudness free   # ... with ISO 532-1 loudness
+#   python -m common_modules.Audio_archive captures.aarc --extract 12 --wav m12.wav
+#   python -m common_modules.Audio_archive                                # self-check + benchmark
+#
+# Codecs: "int24" (default; the ADC's own resolution, so lossless in practice), "int16" (96 dB range below
+# full scale, enough for cabin levels with the calibration offset), "float32" (bit exact). Samples are delta
+# coded, split into byte planes and zlib compressed in chunks of chunk_s seconds by a background thread, so
+# the writer keeps up with capture (blocks are queued as they arrive). The file is a sequence of records:
+#   chunk  b"AACH" <seq, chunk no, frames, nbytes> payload
+#   meta   b"AAMT" <seq, 0, 0, nbytes> JSON
+# and <archive>.idx holds one JSON line per capture with its chunk offsets and metadata, so one capture is
+# loaded with a seek and its own chunks only. A missing or stale index is rebuilt from the record headers
+# (payloads are skipped, not decompressed). One writer per archive at a time.
+from __future__ import annotations
+import argparse, json, os, queue, struct, threading, time, zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+CODECS = ("int24", "int16", "float32")
+_HEAD = struct.Struct("<4sIIII")  # magic, seq, chunk no, frames, nbytes
+_CHUNK, _META = b"AACH", b"AAMT"
+
+
+# ---------------- Codec ----------------
+def _full_scale(codec: str) -> int:
+    return {"int24": 2 ** 23, "int16": 2 ** 15}[codec]
+
+# (frames, channels) float in [-1, 1] -> compressed bytes; also returns the number of clipped samples
+def encode_block(x: np.ndarray, codec: str, level: int = 3) -> Tuple[bytes, int]:
+    x = np.asarray(x)
+    if x.ndim == 1:
+        x = x[:, None]
+    if codec == "float32":
+        planes = np.ascontiguousarray(x, dtype="<f4").view(np.uint8).reshape(-1, 4).T
+        return zlib.compress(planes.tobytes(), level), 0
+    fs_ = _full_scale(codec)
+    q = np.rint(np.asarray(x, dtype=np.float64) * fs_)
+    clipped = int(np.count_nonzero((q >= fs_) | (q < -fs_)))
+    q = np.clip(q, -fs_, fs_ - 1).astype("<i4")
+    d = np.diff(q, axis=0, prepend=np.zeros((1, q.shape[1]), dtype="<i4")) # per channel
+    planes = d.view(np.uint8).reshape(-1, 4).T # low bytes together, the (mostly constant) high bytes together
+    return zlib.compress(planes.tobytes(), level), clipped
+
+def decode_block(payload: bytes, codec: str, frames: int, channels: int) -> np.ndarray:
+    raw = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(4, -1).T.copy()
+    if codec == "float32":
+        return raw.view("<f4").reshape(frames, channels)
+    d = raw.view("<i4").reshape(frames, channels)
+    return np.cumsum(d, axis=0, dtype=np.int64).astype(np.float32) / _full_scale(codec)
+
+
+# ---------------- Writer ----------------
+class ArchiveWriter():
+    # with ArchiveWriter("captures.aarc") as w:
+    #     w.begin(fs=48000, channels=2, device="UR22", dbfs_to_dbspl=110.4, stimulus={...})
+    #     w.write(block) ...                  # from the capture loop, any block size
+    #     capture_id = w.end(extra_meta)      # waits for the encoder, then indexes the capture
+    # or w.add(x, fs=..., ...) for a finished capture
+    def __init__(self, path, codec: str = "int24", chunk_s: float = 1.0, level: int = 3):
+        if codec not in CODECS:
+            raise ValueError(f"codec must be one of {CODECS}, not {codec!r}")
+        self.path = Path(path)
+        self.codec, self.chunk_s, self.level = codec, chunk_s, level
+        known = ArchiveReader(self.path).index if self.path.exists() else []
+        self.next_seq = max((e["id"] for e in known), default=-1) + 1
+        self.f = open(self.path, "ab")
+        self.meta = None
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._encoder, name="audio-archive", daemon=True)
+        self._thread.start()
+
+    def _encoder(self):
+        while True:
+            item = self._q.get()
+            try:
+                if item is None:
+                    return
+                seq, chunk_no, block = item
+                payload, clipped = encode_block(block, self.codec, self.level)
+                offset = self.f.tell()
+                self.f.write(_HEAD.pack(_CHUNK, seq, chunk_no, len(block), len(payload)))
+                self.f.write(payload)
+                self.chunks.append([offset, len(payload), len(block)])
+                self.clipped += clipped
+            finally:
+                self._q.task_done()
+
+    def begin(self, fs: int, channels: int = 1, **meta):
+        if self.meta is not None:
+            raise RuntimeError("begin() while a capture is open; end() it first")
+        self.meta = {"fs": int(fs), "channels": int(channels), "codec": self.codec,
+                     "time": time.strftime("%Y-%m-%d %H:%M:%S"), **meta}
+        self.seq = self.next_seq
+        self.chunks: List[list] = []
+        self.clipped = 0
+        self._pending: List[np.ndarray] = []
+        self._pending_frames = 0
+        self._chunk_no = 0
+        self.frames = 0
+
+    def _flush(self):
+        if self._pending_frames:
+            block = np.concatenate(self._pending, axis=0)
+            self._q.put((self.seq, self._chunk_no, block))
+            self._chunk_no += 1
+            self._pending, self._pending_frames = [], 0
+
+    def write(self, block: np.ndarray):
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block[:, None]
+        self._pending.append(block)
+        self._pending_frames += len(block)
+        self.frames += len(block)
+        if self._pending_frames >= self.chunk_s * self.meta["fs"]:
+            self._flush()
+
+    def end(self, **meta) -> int:
+        self._flush()
+        self._q.join()
+        m = {**self.meta, **meta, "frames": self.frames, "clipped": self.clipped}
+        body = json.dumps(m, default=str).encode("utf-8")
+        self.f.write(_HEAD.pack(_META, self.seq, 0, 0, len(body)))
+        self.f.write(body)
+        self.f.flush()
+        with open(_index_path(self.path), "a", encoding="utf-8") as idx:
+            idx.write(json.dumps({"id": self.seq, "chunks": self.chunks, "end": self.f.tell(), "meta": m}, default=str) + "\n")
+        self.meta = None
+        self.next_seq += 1
+        return self.seq
+
+    def add(self, x: np.ndarray, fs: int, **meta) -> int:
+        x = np.asarray(x)
+        self.begin(fs, 1 if x.ndim == 1 else x.shape[1], **meta)
+        step = max(int(self.chunk_s * fs), 1)
+        for i in range(0, len(x), step):
+            self.write(x[i:i + step])
+        return self.end()
+
+    def close(self):
+        if self.meta is not None:
+            self.end(incomplete=True)
+        self._q.put(None)
+        self._thread.join()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# ---------------- Reader ----------------
+def _index_path(path) -> Path:
+    return Path(str(path) + ".idx")
+
+# index entries from the record headers, starting at byte `start` (payloads are skipped)
+def scan_archive(path, start: int = 0) -> List[dict]:
+    entries: Dict[int, dict] = {}
+    done = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        while True:
+            offset = f.tell()
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                break
+            magic, seq, _, frames, nbytes = _HEAD.unpack(head)
+            if magic == _CHUNK:
+                entries.setdefault(seq, {"id": seq, "chunks": []})["chunks"].append([offset, nbytes, frames])
+                f.seek(nbytes, os.SEEK_CUR)
+            elif magic == _META:
+                body = f.read(nbytes)
+                if len(body) < nbytes:
+                    break
+                e = entries.pop(seq, {"id": seq, "chunks": []})
+                e["meta"], e["end"] = json.loads(body.decode("utf-8")), f.tell()
+                done.append(e)
+            else:
+                raise ValueError(f"{path}: corrupt record at byte {offset}")
+    return done # captures without a meta record (writer killed mid-capture) are left out
+
+class ArchiveReader():
+    # archive = ArchiveReader("captures.aarc"); x, meta = archive.load(12)   (x: frames x channels, float32 FS)
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index = self._load_index()
+        self._by_id = {e["id"]: e for e in self.index}
+
+    def _load_index(self) -> List[dict]:
+        entries = []
+        idx = _index_path(self.path)
+        if idx.exists():
+            with open(idx, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break # torn last line
+        size = self.path.stat().st_size if self.path.exists() else 0
+        known_end = max((e["end"] for e in entries), default=0)
+        if known_end < size: # index missing or behind the data: rebuild the tail from the record headers
+            entries += scan_archive(self.path, known_end)
+        return entries
+
+    def __len__(self):
+        return len(self.index)
+
+    def ids(self) -> List[int]:
+        return [e["id"] for e in self.index]
+
+    def meta(self, capture_id: int) -> dict:
+        return self._by_id[capture_id]["meta"]
+
+    # captures whose metadata matches every key=value (nested dicts such as stimulus compare as a whole)
+    def find(self, **match) -> List[int]:
+        return [e["id"] for e in self.index if all(e["meta"].get(k) == v for k, v in match.items())]
+
+    def load(self, capture_id: int) -> Tuple[np.ndarray, dict]:
+        e = self._by_id[capture_id]
+        m = e["meta"]
+        blocks = []
+        with open(self.path, "rb") as f:
+            for offset, nbytes, frames in sorted(e["chunks"]):
+                f.seek(offset + _HEAD.size)
+                blocks.append(decode_block(f.read(nbytes), m["codec"], frames, m["channels"]))
+        x = np.concatenate(blocks, axis=0) if blocks else np.zeros((0, m["channels"]), dtype=np.float32)
+        return x, m
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, dict]]:
+        for capture_id in self.ids():
+            yield self.load(capture_id)
+
+
+# metrics of an archived capture as measure_once would compute them now (same channel pick, cal and window)
+def reprocess(x: np.ndarray, meta: dict, **overrides) -> Dict[str, float]:
+    from common_modules.Audio import _pick_channel, compute_metrics
+    m = {**meta, **overrides}
+    mono = _pick_channel(x, auto=m.get("auto_channel", True), average=m.get("average_lr", False))
+    return compute_metrics(mono, m["fs"], m.get("dbfs_to_dbspl") or 94.0, start_offset_ms=m.get("start_offset_ms", 0),
+                           window_sec=m.get("window_sec"), loudness=m.get("loudness"))
+
+
+# ---------------- Self-check ----------------
+# streamed writes of synthesized captures in every codec: ratio, encode speed against real time, random
+# access to one capture, exactness, and the index rebuilt from the records
+def selfcheck_archive(n: int = 6, fs: int = 48000, duration_s: float = 10.0, workdir=None) -> bool:
+    import tempfile
+    from common_modules.Dry_run import synthesize_Capture
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="archive_"))
+    rng = np.random.default_rng(5)
+    caps = [np.stack([synthesize_Capture(("tone", i, 60.0 + 3 * i), duration_s, fs, 110.0, rng=rng),
+                      synthesize_Capture(None, duration_s, fs, 110.0, rng=rng)], axis=1).astype(np.float32) for i in range(n)]
+    raw_bytes = sum(c.size for c in caps) * 4
+    ok = True
+    for codec in CODECS:
+        path = workdir / f"captures_{codec}.aarc"
+        t = time.perf_counter()
+        with ArchiveWriter(path, codec=codec) as w:
+            for i, x in enumerate(caps):
+                w.begin(fs, 2, device="selfcheck", dbfs_to_dbspl=110.0, stimulus={"index": i})
+                for j in range(0, len(x), 1024): # callback-sized blocks
+                    w.write(x[j:j + 1024])
+                w.end()
+        encode_s = time.perf_counter() - t
+        size = path.stat().st_size
+        reader = ArchiveReader(path)
+        k = n // 2
+        t = time.perf_counter()
+        x, meta = reader.load(reader.find(stimulus={"index": k})[0])
+        load_ms = (time.perf_counter() - t) * 1e3
+        err = float(np.max(np.abs(x - caps[k])))
+        lsb = 0.0 if codec == "float32" else 1.0 / _full_scale(codec)
+        good = x.shape == caps[k].shape and err <= lsb / 2 + 1e-9
+        _index_path(path).unlink() # rebuilt from the record headers
+        rebuilt = ArchiveReader(path)
+        good &= rebuilt.ids() == list(range(n)) and rebuilt.meta(k)["stimulus"] == {"index": k}
+        lvl = abs(reprocess(x, meta)["LAFmax"] - reprocess(caps[k], meta)["LAFmax"])
+        good &= lvl < 0.01
+        ok &= good
+        print(f"[selfcheck] {codec:<8} {raw_bytes / size:5.2f}x smaller ({size / 1e6:.1f} MB for {n} x {duration_s:.0f} s stereo), "
+              f"encode {n * duration_s / encode_s:5.0f}x real time, load one capture {load_ms:.1f} ms, "
+              f"max error {err:.2e} FS, LAFmax change {lvl:.4f} dB{'' if good else '  <-- FAILED'}")
+    print(f"[selfcheck] audio archive {'OK' if ok else 'FAILED'} ({workdir})")
+    return ok
+
+
+__all__ = [
+    "CODECS",
+    "ArchiveWriter",
+    "ArchiveReader",
+    "scan_archive",
+    "encode_block",
+    "decode_block",
+    "reprocess",
+    "selfcheck_archive",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="List, extract or reprocess archived raw captures (default: self-check)")
+    p.add_argument("archive", nargs="?", help="Archive written with CaptureConfig.archive_path / --archive")
+    p.add_argument("--metrics", action="store_true", help="Recompute the metrics of every capture")
+    p.add_argument("--loudness", choices=("free", "diffuse"), help="With --metrics: add ISO 532-1 loudness")
+    p.add_argument("--extract", type=int, metavar="ID", help="Capture to extract")
+    p.add_argument("--wav", type=Path, help="WAV file for --extract (float32)")
+    args = p.parse_args()
+
+    if not args.archive:
+        selfcheck_archive()
+    elif args.extract is not None:
+        x, meta = ArchiveReader(args.archive).load(args.extract)
+        print(json.dumps(meta, indent=1, default=str))
+        if args.wav:
+            from scipy.io import wavfile
+            wavfile.write(args.wav, meta["fs"], x)
+            print(f"-> {args.wav}")
+    else:
+        reader = ArchiveReader(args.archive)
+        for capture_id in reader.ids():
+            m = reader.meta(capture_id)
+            line = (f"{capture_id:5d}  {m.get('time', '')}  {m.get('device', '')}  fs {m['fs']}  ch {m['channels']}  "
+                    f"{m['frames'] / m['fs']:.2f} s  {m['codec']}  cal {m.get('dbfs_to_dbspl')}  stimulus {m.get('stimulus')}")
+            if args.metrics:
+                x, _ = reader.load(capture_id)
+                line += "  " + ", ".join(f"{k} {v:.2f}" for k, v in reprocess(x, m, loudness=args.loudness).items())
+            print(line)
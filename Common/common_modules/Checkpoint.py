@@ -0,0 +1,176 @@
+# Checkpoint.py — crash-safe progress and resume for long measurement campaigns
+# Progress is the results journal itself (see Results_journal): a measurement counts as done once its
+# journal line is on disk. A small <output>_progress.json next to it stores the config fingerprint, so a
+# relaunch with the same config resumes and skips completed cells, while a changed config, or a campaign that
+# already finished (e.g. relaunched after flashing new ECU software), starts over as a new campaign.
+#
+# Cells are keyed by (row, sound index, level or volume, repeat). The row is part of the key because
+# the same index can appear in both the tone and the voice bank of one config.
+from __future__ import annotations
+import hashlib, json, os
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from common_modules.Results_journal import ResultsJournal, journal_path_for
+from common_modules.Results_matrix import ResultsMatrix
+
+Key = Tuple[int, object, object, object]
+
+
+# stable hash of everything that defines a campaign (sounds list, sim path, repeats, tolerances, ...)
+def config_Fingerprint(*parts) -> str:
+    blob = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+def progress_path_for(output_path_name):
+    return os.path.splitext(output_path_name)[0] + "_progress.json"
+
+def _norm(v):
+    # 128 and 128.0 (int from Excel, float from the journal) must give the same key
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+def make_key(row, index, level, repeat) -> Key:
+    return (int(row), _norm(index), _norm(level), _norm(repeat))
+
+
+class RunCheckpoint():
+    # resume=False always starts a fresh journal (the old one is kept as .bak), as does a finished campaign
+    def __init__(self, output_path_name, fingerprint: str, resume: bool = True):
+        self.fingerprint = fingerprint
+        self.progress_path = progress_path_for(output_path_name)
+        journal_path = journal_path_for(output_path_name)
+
+        state = self._read_state()
+        self.resumed = bool(resume and state.get("fingerprint") == fingerprint and not state.get("finished")
+                            and os.path.exists(journal_path))
+        if resume and state.get("fingerprint") == fingerprint and state.get("finished"):
+            print(f"The previous run of this config finished; starting a new campaign ({journal_path} kept as .bak)")
+        self.journal = ResultsJournal(journal_path, fresh=not self.resumed)
+        self.done: Dict[Key, float] = {}
+        self.matrix = ResultsMatrix() # all results of the campaign so far, for live per-sound statistics
+        if self.resumed:
+            records = self.journal.records()
+            for rec in records:
+                level = rec["volume"] if rec["volume"] is not None else rec["level"]
+                self.done[make_key(rec["row"], rec["index"], level, rec["repeat"])] = rec["value"]
+            self.matrix = ResultsMatrix.from_records(records)
+
+        runs = state.get("runs", []) if self.resumed else []
+        runs.append({"started": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"), "completed_at_start": len(self.done)})
+        self.started = runs[0]["started"] # start of the campaign, the same for every resume, new for every campaign
+        self.finished = False
+        self._write_state({"fingerprint": fingerprint, "runs": runs, "finished": False})
+        if self.resumed:
+            print(f"Resuming run: {len(self.done)} measurements already done ({self.journal.path})")
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, state: dict):
+        tmp = self.progress_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.progress_path)
+
+    # level: the key level (Suzuki level, Mitsubishi volume). repeat: 1 if the flow has no repeats
+    def is_done(self, row, index, level, repeat=1) -> bool:
+        return make_key(row, index, level, repeat) in self.done
+
+    def value(self, row, index, level, repeat=1) -> Optional[float]:
+        return self.done.get(make_key(row, index, level, repeat))
+
+    # journal the measurement (durably) and mark its cell done.
+    # volume is given for flows that sweep volume (it is then the key level, level stays the target)
+    def record(self, row, col, value, index, level, repeat=1, volume=None, bold=False, bench=None):
+        self.journal.append(row=row, col=col, value=value, index=index, level=level, volume=volume, repeat=repeat, bold=bold, bench=bench)
+        self.matrix.set(row, col, value, index=index, level=level)
+        self.done[make_key(row, index, level if volume is None else volume, repeat)] = value
+
+    def finish(self):
+        state = self._read_state()
+        state["finished"] = True
+        self._write_state(state)
+        self.finished = True
+
+    # identifies the campaign across resumes, e.g. for the results database
+    @property
+    def run_key(self) -> str:
+        return f"{self.fingerprint}@{self.started}"
+
+
+# ---------------- Self-check ----------------
+# a Suzuki-shaped loop over the mock engine and FakeRPA: crash at an injected measurement, relaunch, and
+# check every cell ends up measured exactly once with nothing repeated from row 1. Relaunching the finished
+# campaign must measure everything again, under a new run key
+def selfcheck_resume() -> bool:
+    import contextlib, io, tempfile
+    from common_modules.UTAS_mock import MockExecEngine
+    from common_modules.UTAS_wrapper import UtasWrapper
+    from common_modules.Fake_backends import FakeRPA, InjectedFailure
+
+    sounds = [(1, 128), (2, 200), (3, 255), (4, 64)]
+    repeats = 3
+    out = os.path.join(tempfile.mkdtemp(prefix="ckpt_"), "Output.xlsx")
+    fp = config_Fingerprint(sounds, "sim.cfg", repeats)
+    measured, run_keys = [], []
+
+    def run(fail_at):
+        engine = MockExecEngine()
+        UTAS = UtasWrapper(client=engine)
+        UTAS.load_project_settings("p"); UTAS.send_command("open_simulation"); UTAS.send_command("start_simulation")
+        rpa = FakeRPA(engine, fail_at=fail_at)
+        ckpt = RunCheckpoint(out, fp)
+        run_keys.append(ckpt.run_key)
+        try:
+            for row, (index, level) in enumerate(sounds, start=1):
+                for col in range(1, repeats + 1):
+                    if ckpt.is_done(row, index, level, col):
+                        continue
+                    UTAS.set_env("SoundTune_SoundNo", index)
+                    UTAS.set_env("SoundTune_SoundVolume_new", level / 2.55)
+                    UTAS.toggle_env("SoundTune_PlaySound")
+                    rpa.measure_Sound(Rec_duration=12)
+                    UTAS.toggle_env("SoundTune_StopSound")
+                    rpa.save_CSV(iter=col, Rec_duration=12)
+                    ckpt.record(row, col, rpa.process_CSV(iter=col, Rec_duration=12), index=index, level=level, repeat=col)
+                    measured.append((row, col))
+            ckpt.finish()
+        finally:
+            ckpt.journal.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            run(fail_at={5})
+        except InjectedFailure:
+            pass
+        run(fail_at=None)
+    expected = [(r, c) for r in range(1, len(sounds) + 1) for c in range(1, repeats + 1)]
+    ok = sorted(measured) == expected and len(measured) == len(set(measured)) and run_keys[0] == run_keys[1]
+    print(f"[selfcheck] resume after injected failure {'OK' if ok else 'FAILED'} ({len(measured)} measurements)")
+    first = len(measured)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(fail_at=None)
+    again = sorted(measured[first:]) == expected and run_keys[2] != run_keys[1]
+    print(f"[selfcheck] relaunch of a finished campaign {'OK' if again else 'FAILED'} ({len(measured) - first} measurements, new run key)")
+    return ok and again
+
+
+__all__ = [
+    "RunCheckpoint",
+    "config_Fingerprint",
+    "progress_path_for",
+    "make_key",
+    "selfcheck_resume",
+]
+
+
+if __name__ == "__main__":
+    selfcheck_resume()
@@ -0,0 +1,486 @@
+# Coordinator.py — split one test plan across several identical benches
+# A full sound catalogue takes hours on one bench. The coordinator cuts the plan into tasks (a few config
+# rows each) and hands them to one worker process per bench; each worker starts its own uTAS / measurement
+# backend and simulation once, then runs the project's strategy limited to the rows of its task (Runner).
+#
+# Every measurement is sent back as it is taken and journaled by the coordinator with the bench that took
+# it, so there is one journal, one Excel report (plus a "Benches" sheet) and one results database run.
+# A task whose worker raised is retried, preferably on another bench; a worker that dies or hangs longer
+# than task_timeout_s is dropped and its task reassigned with the cells it already measured marked done. A
+# bench that is not ready within startup_timeout_s (uTAS or the simulation hanging at start) is dropped too,
+# and the run stops with its tasks not run once no bench is left.
+# The coordinator journal is a normal RunCheckpoint, so relaunching an interrupted campaign resumes it.
+#
+# Workers are local processes (spawn, as on the Windows bench PCs); the messages are plain picklable tuples,
+# so the same protocol can be carried to other machines through multiprocessing.managers queues. A real bench
+# (bench_Backends) is this PC's uTAS engine and its one ARTA window, so a coordinator drives at most one real
+# bench; more need a backend_factory that gives every bench its own engine and measurement backend.
+#
+#   python -m common_modules.Coordinator                          # 3 mock benches, one dies and one fails
+#   python -m common_modules.Coordinator --benches 4 --sounds 40 --time-scale 0.01
+#   python -m common_modules.Coordinator --project ../Projects/Suzuki/Suzuki.py --config config.xlsx
+#   python -m common_modules.Coordinator --project ../Projects/Suzuki/Suzuki.py --bench-names a b c --mock
+from __future__ import annotations
+import argparse, os, queue, sys, time, traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from common_modules.Checkpoint import make_key
+from common_modules.Results_matrix import ResultsMatrix
+
+
+@dataclass
+class Task:
+    id: int
+    rows: List[int]
+    attempts: int = 0
+    benches: List[str] = field(default_factory=list) # benches it was given to, in order
+    errors: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BenchState:
+    name: str
+    process: object = None
+    task_q: object = None
+    ready: bool = False
+    started: bool = False   # sent "ready" once: its backends and simulation are up
+    alive: bool = True
+    task: Optional[Task] = None
+    task_started: float = 0.0
+    measurements: int = 0
+    tasks_done: int = 0
+    lost: str = ""   # why the coordinator stopped using this bench
+
+
+# ---------------- Backends ----------------
+# factory(bench) -> (UTAS, rpa), called inside the worker process. It must be picklable (a module level
+# function or a functools.partial of one) because workers are spawned.
+
+# the bench PC's own uTAS execution engine (local port) and ARTA window: one per PC, whatever the bench name
+def bench_Backends(bench: str):
+    from common_modules.HelperFunc import find_UTAS_Execution_Engine_Path, start_UTAS_Execution_Engine
+    from common_modules.UTAS_wrapper import UtasWrapper
+    from common_modules.RPA import RPA
+    engine_path = find_UTAS_Execution_Engine_Path()
+    assert engine_path is not None, f"{bench}: no uTAS execution engine found"
+    start_UTAS_Execution_Engine(engine_path)
+    return UtasWrapper(), RPA()
+
+# mock engine + FakeRPA. exit_at / fail_at: {bench: measurement number} to kill the worker / raise in it.
+# hang_at_start: benches whose backends never come up
+def mock_Bench_Backends(bench: str, noise_db: float = 0.3, time_scale: float = 0.0,
+                        exit_at: Optional[Dict[str, int]] = None, fail_at: Optional[Dict[str, int]] = None,
+                        hang_at_start: Sequence[str] = ()):
+    if bench in hang_at_start:
+        time.sleep(3600)
+    from common_modules.UTAS_mock import MockExecEngine
+    from common_modules.UTAS_wrapper import UtasWrapper
+    from common_modules.Fake_backends import FakeRPA
+    engine = MockExecEngine()
+    failing = (fail_at or {}).get(bench)
+    rpa = FakeRPA(engine, noise_db=noise_db, seed=sum(map(ord, bench)), time_scale=time_scale,
+                  fail_at={failing} if failing else None, exit_at=(exit_at or {}).get(bench))
+    return UtasWrapper(client=engine), rpa
+
+
+# ---------------- Worker ----------------
+class _BenchCheckpoint():
+    # the RunCheckpoint interface inside a worker: done cells come with the task, every record() is sent
+    # to the coordinator, which journals it
+    def __init__(self, bench, task_id, records, result_q):
+        self.bench, self.task_id, self.result_q = bench, task_id, result_q
+        self.done = {}
+        for rec in records:
+            level = rec["volume"] if rec["volume"] is not None else rec["level"]
+            self.done[make_key(rec["row"], rec["index"], level, rec["repeat"])] = rec["value"]
+        self.matrix = ResultsMatrix.from_records(records)
+
+    def is_done(self, row, index, level, repeat=1) -> bool:
+        return make_key(row, index, level, repeat) in self.done
+
+    def value(self, row, index, level, repeat=1):
+        return self.done.get(make_key(row, index, level, repeat))
+
+    def record(self, row, col, value, index, level, repeat=1, volume=None, bold=False):
+        rec = {"row": row, "col": col, "value": value, "index": index, "level": level, "repeat": repeat,
+               "volume": volume, "bold": bold}
+        self.result_q.put(("result", self.bench, self.task_id, rec))
+        self.matrix.set(row, col, value, index=index, level=level)
+        self.done[make_key(row, index, level if volume is None else volume, repeat)] = value
+
+
+class _NoReport():
+    # the coordinator owns the report; strategies still call maybe_save()
+    def maybe_save(self):
+        return False
+
+
+# one bench: start the backends and the simulation once, then run tasks until told to stop (None).
+# stdout goes to log_path so the benches do not interleave on the console
+def _bench_worker(bench, project, plan, tolerance, backend_factory, project_path, task_q, result_q, log_path, dry_run=None):
+    from common_modules.Runner import RunContext, start_Simulation
+    if log_path:
+        sys.stdout = sys.stderr = open(log_path, "a", buffering=1, encoding="utf-8")
+    if os.environ.get("AA_UTAS_TRACE"):
+        root, ext = os.path.splitext(os.environ["AA_UTAS_TRACE"])
+        os.environ["AA_UTAS_TRACE"] = f"{root}_{bench}{ext}" # one trace per bench
+    try:
+        UTAS, rpa = backend_factory(bench)
+        start_Simulation(UTAS, project, plan, project_path, dry_run)
+    except BaseException:
+        traceback.print_exc()
+        result_q.put(("fatal", bench, None, traceback.format_exc(limit=3)))
+        return
+    result_q.put(("ready", bench, None, None))
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+        task_id, rows, records = task
+        print(f"[{bench}] task {task_id}: rows {rows}")
+        ctx = RunContext(project, plan, UTAS, rpa, _BenchCheckpoint(bench, task_id, records, result_q), tolerance, rows=rows)
+        ctx.report = _NoReport()
+        try:
+            project.strategy.run(ctx)
+        except Exception as e:
+            traceback.print_exc()
+            result_q.put(("failed", bench, task_id, f"{type(e).__name__}: {e}"))
+            try:
+                project.stimulus.start_session(UTAS) # whatever was playing, start the next task from a clean session
+            except Exception:
+                traceback.print_exc()
+            continue
+        result_q.put(("done", bench, task_id, ctx.measurements))
+    UTAS.print_stats()
+    UTAS.close_trace()
+
+
+# ---------------- Coordinator ----------------
+class Coordinator():
+    # benches: one worker per name. backend_factory(bench) -> (UTAS, rpa), see above.
+    # rows_per_task: config rows per task (small = better balance and less to redo when a bench dies).
+    # max_attempts: times a task is tried before it is given up. task_timeout_s: a task running longer is
+    # considered hung, its worker is terminated and the task reassigned (None = no limit).
+    # startup_timeout_s: a worker not ready (backends + simulation started) by then is terminated (None = no limit).
+    # dry_run: time_scale of mock benches, their setup skips the GUI steps (Runner.start_Simulation)
+    def __init__(self, project, plan, benches: Sequence[str], backend_factory: Callable = bench_Backends,
+                 output_path=None, project_path=None, rows_per_task: int = 1, max_attempts: int = 3,
+                 task_timeout_s: Optional[float] = None, startup_timeout_s: Optional[float] = 600.0,
+                 poll_s: float = 0.2, store_results: bool = True, dry_run: Optional[float] = None):
+        if not benches:
+            raise ValueError("Coordinator: at least one bench is needed")
+        if len(set(benches)) != len(benches):
+            raise ValueError(f"Coordinator: bench names must be unique, got {list(benches)}")
+        if getattr(backend_factory, "func", backend_factory) is bench_Backends and len(benches) > 1:
+            raise ValueError(f"Coordinator: {len(benches)} benches on bench_Backends would all drive this PC's uTAS engine "
+                             f"and ARTA window; use one real bench per PC, or a backend_factory that gives each bench its own")
+        self.project, self.plan = project, plan
+        self.output_path = output_path or plan.output_excel_name
+        self.project_path = project_path
+        self.backend_factory = backend_factory
+        self.benches = {name: BenchState(name) for name in benches}
+        self.max_attempts, self.task_timeout_s, self.poll_s = max_attempts, task_timeout_s, poll_s
+        self.startup_timeout_s, self.dry_run = startup_timeout_s, dry_run
+        self.store_results = store_results
+        self.tolerance = plan.tolerance if plan.tolerance is not None else project.tolerance
+        rows = project.sound_rows(plan)
+        self.tasks = [Task(i, rows[s:s + rows_per_task]) for i, s in enumerate(range(0, len(rows), rows_per_task), start=1)]
+        self.failed: List[Task] = []
+        self.events: List[str] = []
+
+    def _log(self, msg):
+        self.events.append(msg)
+        print(f"[coordinator] {msg}")
+
+    def _log_path(self, bench):
+        return os.path.splitext(self.output_path)[0] + f"_{bench}.log"
+
+    # the next pending task for this bench, avoiding the bench a retried task last failed on if possible
+    def _next_task(self, pending: deque, bench: str) -> Optional[Task]:
+        for task in pending:
+            if not task.benches or task.benches[-1] != bench:
+                pending.remove(task)
+                return task
+        return pending.popleft() if pending else None
+
+    def _assign(self, b: BenchState, task: Task):
+        task.attempts += 1
+        task.benches.append(b.name)
+        records = [r for row in task.rows for r in self._records.get(row, [])] # cells already measured, not measured again
+        b.task, b.task_started, b.ready = task, time.monotonic(), False
+        b.task_q.put((task.id, task.rows, records))
+
+    def _requeue(self, task: Task, pending: deque, why: str):
+        task.errors.append(why)
+        if task.attempts >= self.max_attempts:
+            self.failed.append(task)
+            self._log(f"task {task.id} (rows {task.rows}) given up after {task.attempts} attempts: {why}")
+        else:
+            pending.appendleft(task)
+            self.progress.count("retries")
+            self._log(f"task {task.id} (rows {task.rows}) requeued: {why}")
+
+    def _lose(self, b: BenchState, pending: deque, why: str):
+        b.alive, b.ready, b.lost = False, False, why
+        self._log(f"{b.name} lost: {why}")
+        if b.task is not None:
+            self._requeue(b.task, pending, f"{b.name} {why}")
+            b.task = None
+
+    def _handle(self, msg, pending: deque):
+        kind, bench, task_id, payload = msg
+        b = self.benches[bench]
+        if not b.alive:
+            return # late message from a bench already given up, its task is reassigned
+        if kind == "ready":
+            b.ready = b.started = True
+            self._log(f"{bench} ready")
+        elif kind == "fatal":
+            self._lose(b, pending, f"could not start: {payload.strip().splitlines()[-1]}")
+        elif b.task is None or b.task.id != task_id:
+            return
+        elif kind == "result":
+            rec = payload
+            self.checkpoint.record(rec["row"], rec["col"], rec["value"], rec["index"], rec["level"], repeat=rec["repeat"],
+                                   volume=rec["volume"], bold=rec["bold"], bench=bench)
+            rec["bench"] = bench
+            self._records.setdefault(rec["row"], []).append(rec)
+            b.measurements += 1
+            self.progress.measured(rec["row"], rec["col"], rec["index"], rec["level"], rec["value"], rec["bold"] if self.tolerance is not None else None)
+        elif kind == "done":
+            b.tasks_done += 1
+            for row in b.task.rows:
+                self.progress.sound_done(row)
+            b.task, b.ready = None, True
+            self.report.maybe_save()
+        elif kind == "failed":
+            task, b.task, b.ready = b.task, None, True
+            self._requeue(task, pending, f"{bench}: {payload}")
+
+    def _check_benches(self, pending: deque):
+        now = time.monotonic()
+        for b in self.benches.values():
+            if not b.alive:
+                continue
+            if not b.process.is_alive():
+                self._lose(b, pending, f"worker exited (code {b.process.exitcode})")
+            elif not b.started and self.startup_timeout_s is not None and now - self._launched > self.startup_timeout_s:
+                b.process.terminate()
+                self._lose(b, pending, f"not ready after {self.startup_timeout_s:.0f} s, worker terminated")
+            elif b.task is not None and self.task_timeout_s is not None and now - b.task_started > self.task_timeout_s:
+                b.process.terminate()
+                self._lose(b, pending, f"task {b.task.id} hung for more than {self.task_timeout_s:.0f} s, worker terminated")
+
+    def run(self):
+        import multiprocessing
+        from common_modules.Checkpoint import RunCheckpoint
+        from common_modules.Results_journal import ReportCheckpointer, read_journal
+        from common_modules.Progress import progress_For_Run
+        from common_modules.Runner import RunContext
+
+        start = time.perf_counter()
+        project, plan = self.project, self.plan
+        fingerprint = project.fingerprint(plan, self.tolerance)
+        self.checkpoint = RunCheckpoint(self.output_path, fingerprint)
+        self._records: Dict[int, List[dict]] = {}
+        for rec in self.checkpoint.journal.records():
+            self._records.setdefault(rec["row"], []).append(rec)
+        ctx = RunContext(project, plan, None, None, self.checkpoint, self.tolerance)
+        self.report = ReportCheckpointer(self.checkpoint.journal, self.output_path, test_name=plan.simulation_file_path,
+                                         **project.strategy.report_options(ctx))
+        self.progress = progress_For_Run(self.output_path, len(project.sound_rows(plan)), name=f"{project.name} on {len(self.benches)} benches",
+                                         counters={"benches_lost": lambda: sum(not b.alive for b in self.benches.values()),
+                                                   "tasks_given_up": lambda: len(self.failed)})
+
+        mp = multiprocessing.get_context("spawn")
+        result_q = mp.Queue()
+        for b in self.benches.values():
+            b.task_q = mp.Queue()
+            b.process = mp.Process(target=_bench_worker, name=f"bench-{b.name}", daemon=True,
+                                   args=(b.name, project, plan, self.tolerance, self.backend_factory, self.project_path,
+                                         b.task_q, result_q, self._log_path(b.name), self.dry_run))
+            b.process.start()
+        self._launched = time.monotonic()
+        self._log(f"{len(self.tasks)} tasks over {len(self.benches)} benches: {', '.join(self.benches)}")
+
+        pending = deque(self.tasks)
+        try:
+            while pending or any(b.task is not None for b in self.benches.values()):
+                for b in self.benches.values():
+                    if b.alive and b.ready and b.task is None and pending:
+                        self._assign(b, self._next_task(pending, b.name))
+                try:
+                    self._handle(result_q.get(timeout=self.poll_s), pending)
+                    while True: # drain, so a bench's last results are journaled before its death is noticed
+                        self._handle(result_q.get_nowait(), pending)
+                except queue.Empty:
+                    pass
+                self._check_benches(pending)
+                if not any(b.alive for b in self.benches.values()):
+                    self._log(f"no bench left, {len(pending)} tasks not run")
+                    self.failed += list(pending)
+                    pending.clear()
+            if not self.failed:
+                self.checkpoint.finish()
+        finally:
+            self.progress.close("finished" if self.checkpoint.finished else "stopped")
+            for b in self.benches.values():
+                if b.alive and b.process.is_alive():
+                    b.task_q.put(None)
+            for b in self.benches.values():
+                b.process.join(timeout=10)
+                if b.process.is_alive():
+                    b.process.terminate()
+            self.report.finish()
+            records = read_journal(self.checkpoint.journal.path)
+            write_Bench_Provenance(self.output_path, records, self)
+            if self.store_results:
+                from common_modules.File_IO import write_Run_Into_Results_Db
+                write_Run_Into_Results_Db(records, self.checkpoint.run_key, project.name, plan.simulation_file_path, fingerprint,
+                                          complete=self.checkpoint.finished, config_hash=plan.config_hash, device=project.device,
+                                          bench=",".join(self.benches), output=self.output_path)
+        self.elapsed = time.perf_counter() - start
+        print(self.summary())
+        return self
+
+    def summary(self) -> str:
+        lines = [f"Distributed run: {sum(b.measurements for b in self.benches.values())} measurements in "
+                 f"{self.elapsed:.1f} s over {len(self.benches)} benches, "
+                 f"{len(self.tasks) - len(self.failed)}/{len(self.tasks)} tasks done"]
+        for b in self.benches.values():
+            state = "ok" if b.alive else f"lost: {b.lost}"
+            lines.append(f"  {b.name}: {b.tasks_done} tasks, {b.measurements} measurements ({state})")
+        for task in self.failed:
+            lines.append(f"  FAILED task {task.id} rows {task.rows}: {'; '.join(task.errors) or 'not run'}")
+        return "\n".join(lines)
+
+
+# "Benches" sheet in the report: per bench totals, then which bench measured each sound and how many tries it took
+def write_Bench_Provenance(output_path, records, coordinator: Coordinator):
+    from openpyxl import load_workbook
+    if not os.path.exists(output_path):
+        return
+    wb = load_workbook(output_path)
+    if "Benches" in wb.sheetnames:
+        del wb["Benches"]
+    ws = wb.create_sheet("Benches")
+    ws.append(["Bench", "Tasks", "Measurements", "Status"])
+    for b in coordinator.benches.values():
+        ws.append([b.name, b.tasks_done, b.measurements, "ok" if b.alive else b.lost])
+    ws.append([])
+    ws.append(["Row", "Index", "Level", "Measurements", "Benches", "Attempts", "Errors"])
+    tries = {row: t for t in coordinator.tasks for row in t.rows}
+    by_row: Dict[int, List[dict]] = {}
+    for rec in records:
+        by_row.setdefault(rec["row"], []).append(rec)
+    for row in sorted(tries):
+        recs, task = by_row.get(row, []), tries[row]
+        benches = sorted({r.get("bench") or "?" for r in recs})
+        index = recs[0]["index"] if recs else None
+        level = recs[0]["level"] if recs else None
+        ws.append([row, index, level, len(recs), ", ".join(benches), task.attempts, "; ".join(task.errors)])
+    wb.save(output_path)
+
+
+# ---------------- Self-check ----------------
+def demo_Project(order: str = "config"):
+    # Suzuki-shaped project for the mock benches: SoundTune banks, fixed repeats from the plan
+    from common_modules.Plan_compiler import SoundBank
+    from common_modules.Runner import ProjectPlan, Repeats, SoundTuneStimulus
+    return ProjectPlan(name="Distributed demo", stimulus=SoundTuneStimulus(
+        SoundBank("SoundTune_SoundNo", "SoundTune_SoundVolume_new", "SoundTune_PlaySound", "SoundTune_StopSound"),
+        SoundBank("SoundTune_VoiceNo", "SoundTune_VoiceVolume_new", "SoundTune_PlayVoice", "SoundTune_StopVoice")),
+        strategy=Repeats(order=order))
+
+def demo_Plan(n_sounds: int = 12, repeats: int = 3):
+    from common_modules.Test_plan import TestPlan
+    sounds = [(i, 100 + (i * 37) % 156) for i in range(1, n_sounds + 1)]
+    sounds.insert(n_sounds // 2, (-1, 0)) # tone -> voice bank switch
+    return TestPlan(simulation_file_path="demo.cfg", sounds=sounds, repeats=repeats, output_excel_name="Output.xlsx")
+
+# three mock benches: bench-2 dies at its 4th measurement, bench-3 raises at its 2nd. Every cell must still be
+# measured exactly once, by the benches that were alive, with each measurement's bench in the journal. Then a
+# lone bench that never starts: the run must give up on it instead of waiting forever
+def selfcheck_distributed(n_benches: int = 3, n_sounds: int = 12, time_scale: float = 0.002, workdir=None) -> bool:
+    import functools, tempfile
+    from openpyxl import load_workbook
+    from common_modules.Results_journal import read_journal
+    workdir = workdir or tempfile.mkdtemp(prefix="dist_")
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.setdefault("AA_RESULTS_DB", os.path.join(workdir, "results.db"))
+    benches = [f"bench-{i}" for i in range(1, n_benches + 1)]
+    factory = functools.partial(mock_Bench_Backends, time_scale=time_scale,
+                                exit_at={"bench-2": 4}, fail_at={"bench-3": 2})
+    plan = demo_Plan(n_sounds)
+    out = os.path.join(workdir, "Output.xlsx")
+    c = Coordinator(demo_Project(), plan, benches, factory, output_path=out, project_path="p", task_timeout_s=60).run()
+
+    records = read_journal(c.checkpoint.journal.path)
+    keys = [(r["row"], r["col"]) for r in records]
+    expected = {(row, col) for row in c.project.sound_rows(plan) for col in range(1, plan.repeats + 1)}
+    by_bench = {}
+    for r in records:
+        by_bench[r["bench"]] = by_bench.get(r["bench"], 0) + 1
+    ok = set(keys) == expected and len(keys) == len(expected) and not c.failed
+    if n_benches >= 2 and not c.checkpoint.resumed: # a resumed run may have nothing left for bench-2 to die on
+        ok &= not c.benches["bench-2"].alive and c.benches["bench-1"].alive
+    ok &= "Benches" in load_workbook(out).sheetnames
+    print(f"[selfcheck] {len(keys)} measurements for {len(expected)} cells, by bench {by_bench}")
+
+    # a bench stuck starting uTAS must be dropped after startup_timeout_s, and the run must stop with its tasks not run
+    t = time.perf_counter()
+    hung = Coordinator(demo_Project(), demo_Plan(2, repeats=1), ["bench-hung"],
+                       functools.partial(mock_Bench_Backends, hang_at_start=("bench-hung",)),
+                       output_path=os.path.join(workdir, "Output_hung.xlsx"), project_path="p", startup_timeout_s=3,
+                       store_results=False).run()
+    stopped = not hung.benches["bench-hung"].alive and len(hung.failed) == len(hung.tasks) and time.perf_counter() - t < 30
+    ok &= stopped
+    print(f"[selfcheck] bench hanging at start: {hung.benches['bench-hung'].lost or 'not lost'}, "
+          f"{len(hung.failed)}/{len(hung.tasks)} tasks not run{'' if stopped else '  <-- FAILED'}")
+    print(f"[selfcheck] distributed run {'OK' if ok else 'FAILED'} ({out})")
+    return ok
+
+
+__all__ = [
+    "Coordinator",
+    "Task",
+    "BenchState",
+    "bench_Backends",
+    "mock_Bench_Backends",
+    "write_Bench_Provenance",
+    "selfcheck_distributed",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Split a test plan across several benches (default: self-check on mock benches)")
+    p.add_argument("--project", help="Project script defining a ProjectPlan, e.g. ../Projects/Suzuki/Suzuki.py")
+    p.add_argument("--config", default=None, help="config.xlsx of the run (default: the usual config path)")
+    p.add_argument("--bench-names", nargs="+", default=["bench-1"], help="Benches of a --project run")
+    p.add_argument("--mock", action="store_true", help="Run --project on mock benches (mock uTAS + fake audio)")
+    p.add_argument("--output", default=None, help="Output workbook (default: the config's output name)")
+    p.add_argument("--rows-per-task", type=int, default=1)
+    p.add_argument("--task-timeout", type=float, default=None, help="A task running longer is hung (s)")
+    p.add_argument("--startup-timeout", type=float, default=600.0, help="A bench not ready by then is dropped (s)")
+    p.add_argument("--benches", type=int, default=3, help="Self-check: number of local mock benches")
+    p.add_argument("--sounds", type=int, default=12, help="Self-check: sounds in the generated plan")
+    p.add_argument("--time-scale", type=float, default=0.002, help="Fraction of the real recording time the mock benches sleep")
+    p.add_argument("--workdir", default=None, help="Self-check: where the journal, report and bench logs go (default: a temp dir)")
+    args = p.parse_args()
+
+    if not args.project:
+        sys.exit(0 if selfcheck_distributed(args.benches, args.sounds, args.time_scale, args.workdir) else 1)
+    import functools
+    from common_modules.Dry_run import load_Project
+    from common_modules.Test_plan import load_Test_Plan
+    project = load_Project(args.project)
+    plan = load_Test_Plan(args.config, level_range=project.level_range)
+    factory = functools.partial(mock_Bench_Backends, time_scale=args.time_scale) if args.mock else bench_Backends
+    c = Coordinator(project, plan, args.bench_names, factory, output_path=args.output,
+                    project_path="mock" if args.mock else None, rows_per_task=args.rows_per_task,
+                    task_timeout_s=args.task_timeout, startup_timeout_s=args.startup_timeout,
+                    store_results=not args.mock, dry_run=args.time_scale if args.mock else None).run()
+    sys.exit(0 if not c.failed else 1)
@@ -0,0 +1,227 @@
+# Dry_run.py — run a project flow end to end against simulated uTAS and audio
+# run_Project(project, dry_run=<time_scale>) (or AA_DRY_RUN=<time_scale>) swaps the uTAS engine for the mock
+# engine and ARTA for SimulatedAudioRPA. Everything else is the real run: config.xlsx loading, the compiled
+# schedule, the stimulus, scoring, the journal and the Excel report (written as <output>_dryrun.xlsx, never
+# resumed, not stored in results.db). time_scale is the fraction of the real recording / ARTA dialog waits
+# that is actually slept (0 = as fast as possible).
+#
+# SimulatedAudioRPA synthesizes what the microphone would hear: a tone whose frequency depends on the sound
+# index and whose A-weighted level comes from the volume sent (Fake_backends.default_spl_model), over
+# background noise. The capture goes through Audio.compute_metrics and an ARTA-style CSV that is read back
+# by the real RPA.process_CSV. It also times every iteration: whatever is not simulated device time
+# (recording, dialog waits) or simulation cost (synthesis, metrics) is our own orchestration overhead.
+#
+#   python -m common_modules.Dry_run ../Projects/Suzuki/Suzuki.py                   # config.xlsx next to it
+#   python -m common_modules.Dry_run ../Projects/Mitsubishi/Mitsubishi.py --time-scale 0.001 --utas-latency-ms 5
+from __future__ import annotations
+import argparse, csv, os, time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from common_modules.Fake_backends import default_spl_model
+
+REAL_SAVE_S = 12.1     # RPA.save_CSV dialog waits (0.1 + 10 + 2 s)
+BACKGROUND_SPL = 30.0  # dB, noise floor of the simulated cabin
+
+
+def real_measure_s(Rec_duration) -> float:
+    # RPA.measure_Sound records 1 s for short captures, 12 s otherwise
+    return 1.0 if 0 < Rec_duration <= 1 else 12.0
+
+# frequency of the simulated sound for an index, 500 Hz .. 3.4 kHz
+def tone_frequency(index) -> float:
+    return 500.0 + 125.0 * (abs(int(index)) % 24)
+
+
+# what the microphone records while `playing` (as MockExecEngine.playing): the sound from onset_s on, at the
+# A-weighted level spl_model(playing), plus background noise. Level in dB SPL = 20*log10(rms FS) + cal_offset
+def synthesize_Capture(playing, duration_s: float, fs: int = 16000, cal_offset: float = 94.0,
+                       spl_model: Callable = default_spl_model, onset_s: float = 0.3,
+                       rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    from scipy.signal import sosfreqz
+    from common_modules.Audio import a_weighting_sos
+    rng = rng or np.random.default_rng()
+    n = int(duration_s * fs)
+    x = rng.normal(0.0, 10 ** ((BACKGROUND_SPL - cal_offset) / 20.0), n)
+    if playing is not None:
+        f0 = tone_frequency(playing[1])
+        _, h = sosfreqz(a_weighting_sos(fs), worN=[2 * np.pi * f0 / fs])
+        rms = 10 ** ((spl_model(playing) - cal_offset) / 20.0) / abs(h[0]) # so that the A-weighted level is the model's
+        i0 = min(int(onset_s * fs), n // 10)
+        t = np.arange(n - i0) / fs
+        x[i0:] += np.sqrt(2.0) * rms * np.sin(2 * np.pi * f0 * t)
+    return x
+
+
+class SimulatedAudioRPA():
+    # RPA interface (measure_Sound / save_CSV / process_CSV) over synthesized captures of whatever the mock
+    # engine is playing. time_scale: fraction of the real recording and dialog waits to sleep
+    def __init__(self, engine, time_scale: float = 0.0, spl_model: Callable = default_spl_model, fs: int = 16000,
+                 cal_offset: float = 94.0, seed: Optional[int] = 0, workdir: Optional[str] = None):
+        import atexit, shutil, tempfile
+        self.engine, self.time_scale, self.spl_model = engine, time_scale, spl_model
+        self.fs, self.cal_offset = fs, cal_offset
+        self._rng = np.random.default_rng(seed)
+        self.write_base = workdir or tempfile.mkdtemp(prefix="dryrun_csv_")
+        if workdir is None:
+            atexit.register(shutil.rmtree, self.write_base, ignore_errors=True)
+        self.measurements = 0
+        self._capture = None
+        self.created = time.perf_counter()
+        self.first_start: Optional[float] = None
+        self.iterations: List[dict] = []   # per measurement: wall, device, simulation, overhead seconds
+        self._mark = None                  # end of the previous iteration
+        self._device = self._sim = 0.0     # accumulated since _mark
+
+    def _wait(self, real_s, abort=None):
+        slept = real_s * self.time_scale
+        t = time.perf_counter()
+        if slept > 0 and abort is not None:
+            abort.wait(slept)
+        elif slept > 0:
+            time.sleep(slept)
+        self._device += time.perf_counter() - t
+
+    # abort: threading.Event that stops the recording early (a failed sound verification)
+    def measure_Sound(self, Rec_duration, abort=None):
+        now = time.perf_counter()
+        if self._mark is None:
+            self.first_start = self._mark = now
+        self.measurements += 1
+        real_s = real_measure_s(Rec_duration)
+        t = time.perf_counter()
+        self._capture = synthesize_Capture(self.engine.playing, real_s, self.fs, self.cal_offset, self.spl_model, rng=self._rng)
+        self._sim += time.perf_counter() - t
+        self._wait(real_s, abort)
+
+    # the first duration_s of what the microphone hears from now on (Fingerprint verification probe)
+    def probe(self, duration_s: float):
+        playing = self.engine.playing
+        if duration_s * self.time_scale > 0:
+            time.sleep(duration_s * self.time_scale)
+        return synthesize_Capture(playing, duration_s, self.fs, self.cal_offset, self.spl_model,
+                                  rng=np.random.default_rng(self._rng.integers(1 << 32))), self.fs
+
+    def save_CSV(self, iter, Rec_duration):
+        from common_modules.Audio import compute_metrics
+        t = time.perf_counter()
+        m = compute_metrics(self._capture, self.fs, self.cal_offset)
+        with open(os.path.join(self.write_base, f"spl-{Rec_duration}s-log-{iter}.csv"), "w", newline="") as f:
+            w = csv.writer(f) # the rows RPA.process_CSV looks for in an ARTA export
+            w.writerow(["ARTA SPL meter log (dry run)", ""])
+            w.writerow(["Duration", f"{real_measure_s(Rec_duration)} s"])
+            for name in ("LeqA", "LAFmax", "LAFmin", "LApeak"):
+                w.writerow([name, f"{m[name]:.2f} dB"])
+        self._sim += time.perf_counter() - t
+        self._wait(REAL_SAVE_S)
+
+    def process_CSV(self, iter, Rec_duration):
+        from common_modules.RPA import RPA
+        value = RPA.process_CSV(self, iter, Rec_duration) # the real parser
+        now = time.perf_counter()
+        wall = now - self._mark
+        self.iterations.append({"wall": wall, "device": self._device, "simulation": self._sim,
+                                "overhead": max(wall - self._device - self._sim, 0.0)})
+        self._mark, self._device, self._sim = now, 0.0, 0.0
+        return value
+
+    # orchestration overhead per iteration, and what it means for a real run
+    def report(self) -> str:
+        if not self.iterations:
+            return "Dry run: no measurements"
+        over = np.array([it["overhead"] for it in self.iterations]) * 1e3
+        wall = sum(it["wall"] for it in self.iterations)
+        device_real = REAL_SAVE_S + 12.0 # per long measurement on a bench
+        n = len(over)
+        lines = [
+            f"Dry run: {n} measurements in {wall:.2f} s (time_scale {self.time_scale}), "
+            f"setup {self.first_start - self.created:.2f} s before the first measurement",
+            f"  orchestration overhead per iteration: mean {over.mean():.1f} ms, p95 {np.percentile(over, 95):.1f} ms, "
+            f"max {over.max():.1f} ms, total {over.sum() / 1e3:.2f} s",
+            f"  on a bench: ~{n * device_real / 3600:.2f} h of recording and ARTA dialogs, our overhead "
+            f"{100 * over.mean() / 1e3 / (device_real + over.mean() / 1e3):.2f}% of each iteration",
+        ]
+        return "\n".join(lines)
+
+
+# mock uTAS + simulated audio for run_Project(dry_run=...). utas_latency_ms: per-command mock latency, to
+# include typical uTAS round trips in the measured overhead
+def dry_Run_Backends(time_scale: float = 0.0, utas_latency_ms: float = 0.0, seed: Optional[int] = 0):
+    from common_modules.UTAS_mock import MockExecEngine
+    from common_modules.UTAS_wrapper import UtasWrapper
+    engine = MockExecEngine(latency_s=utas_latency_ms / 1000.0, time_scale=time_scale, seed=seed)
+    return UtasWrapper(client=engine), SimulatedAudioRPA(engine, time_scale=time_scale, seed=seed)
+
+def dry_Run_Output_Path(output_path) -> str:
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_dryrun{ext or '.xlsx'}"
+
+# AA_DRY_RUN=<time_scale> turns run_Project into a dry run; None if unset
+def dry_Run_From_Env() -> Optional[float]:
+    value = os.environ.get("AA_DRY_RUN", "").strip()
+    return float(value) if value else None
+
+
+# the ProjectPlan defined in a project script (Suzuki.py, Mitsubishi.py), imported without running it
+def load_Project(script_path):
+    import importlib.util, sys
+    from common_modules.Runner import ProjectPlan
+    script_path = os.path.abspath(script_path)
+    sys.path.insert(0, os.path.dirname(script_path))
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    spec = importlib.util.spec_from_file_location(name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    plans = [v for v in vars(module).values() if isinstance(v, ProjectPlan)]
+    if not plans:
+        raise ValueError(f"{script_path} defines no ProjectPlan")
+    return plans[0]
+
+
+# ---------------- Self-check ----------------
+# the synthesized capture must read back (through compute_metrics) at the model level
+def selfcheck_dry_run(fs: int = 16000) -> bool:
+    from common_modules.Audio import compute_metrics
+    ok = True
+    for playing in (("tone", 3, 100.0), ("tone", 7, 40.0), ("voice", 12, 70.0), ("diag", 5, 128)):
+        x = synthesize_Capture(playing, 12.0, fs, rng=np.random.default_rng(1))
+        got = compute_metrics(x, fs, 94.0)["LAFmax"]
+        want = default_spl_model(playing)
+        ok &= abs(got - want) < 0.5
+        print(f"[selfcheck] {playing}: model {want:.2f} dB, synthesized capture LAFmax {got:.2f} dB")
+    print(f"[selfcheck] simulated audio {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+__all__ = [
+    "SimulatedAudioRPA",
+    "synthesize_Capture",
+    "dry_Run_Backends",
+    "dry_Run_Output_Path",
+    "dry_Run_From_Env",
+    "load_Project",
+    "selfcheck_dry_run",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Dry-run a project script against simulated uTAS and audio")
+    p.add_argument("project", nargs="?", help="Project script, e.g. ../Projects/Suzuki/Suzuki.py (default: self-check only)")
+    p.add_argument("--config", help="config.xlsx (default: next to the project script)")
+    p.add_argument("--output", help="Report path (default: <config output name>_dryrun.xlsx)")
+    p.add_argument("--time-scale", type=float, default=0.0, help="Fraction of the real recording / dialog waits to sleep")
+    p.add_argument("--utas-latency-ms", type=float, default=0.0, help="Mock uTAS round trip per command")
+    args = p.parse_args()
+
+    if not args.project:
+        selfcheck_dry_run()
+    else:
+        from common_modules.Runner import run_Project
+        project = load_Project(args.project)
+        config = args.config or os.path.join(os.path.dirname(os.path.abspath(args.project)), "config.xlsx")
+        UTAS, rpa = dry_Run_Backends(args.time_scale, args.utas_latency_ms)
+        run_Project(project, UTAS=UTAS, rpa=rpa, config_file=config, output_path=args.output, interactive=False,
+                    dry_run=args.time_scale)
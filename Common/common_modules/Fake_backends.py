@@ -0,0 +1,75 @@
+# Fake_backends.py — stand-ins for the bench-only backends, for tests and failure injection
+# FakeRPA has the same measure_Sound / save_CSV / process_CSV interface as RPA (ARTA automation) and
+# reads back a level computed from whatever the mock uTAS engine is currently playing:
+#
+#   engine = MockExecEngine()
+#   UTAS = UtasWrapper(client=engine)
+#   RPA_automation = FakeRPA(engine, fail_at={7})   # 7th measurement "hangs" like an ARTA dialog
+from __future__ import annotations
+import math, os, random, time
+from typing import Callable, Iterable, Optional
+
+
+class InjectedFailure(RuntimeError):
+    pass
+
+
+# default volume -> SPL response: per-index base level, 20*log10 of the volume fraction.
+# playing is ("tone"|"voice", index, volume %) from SoundTune or ("diag", index, volume 0-255) from telegrams
+def default_spl_model(playing) -> float:
+    if playing is None:
+        return 30.0 # background noise
+    bank, index, volume = playing
+    fraction = volume / 100.0 if bank in ("tone", "voice") else volume / 255.0
+    base = 80.0 + (abs(int(index)) % 10) - (4.0 if bank == "voice" else 0.0)
+    return max(30.0, base + 20.0 * math.log10(max(fraction, 1e-3)))
+
+
+class FakeRPA():
+    # spl_model: fn(playing) -> LAFmax dB. noise_db: gaussian reading noise.
+    # fail_at: 1-based measurement numbers that raise InjectedFailure (simulates a hung ARTA dialog)
+    # exit_at: 1-based measurement number at which the whole process exits (simulates a bench PC dying)
+    # time_scale: fraction of the real 1 s / 12 s recording time to actually sleep (0 = instantaneous)
+    def __init__(self, engine, spl_model: Callable = default_spl_model, noise_db: float = 0.0,
+                 fail_at: Optional[Iterable[int]] = None, seed: Optional[int] = 0, time_scale: float = 0.0,
+                 exit_at: Optional[int] = None):
+        self.engine = engine
+        self.spl_model = spl_model
+        self.noise_db = noise_db
+        self.fail_at = set(fail_at or ())
+        self.exit_at = exit_at
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self.measurements = 0
+        self._last = {}       # iter -> level of the last capture saved under that name
+        self._pending = None
+
+    def measure_Sound(self, Rec_duration, abort=None):
+        self.measurements += 1
+        if self.measurements == self.exit_at:
+            os._exit(3)
+        if self.measurements in self.fail_at:
+            raise InjectedFailure(f"Injected failure at measurement {self.measurements}")
+        if self.time_scale > 0 and abort is not None:
+            abort.wait((1 if 0 < Rec_duration <= 1 else 12) * self.time_scale)
+        elif self.time_scale > 0:
+            time.sleep((1 if 0 < Rec_duration <= 1 else 12) * self.time_scale)
+        level = self.spl_model(self.engine.playing)
+        if self.noise_db > 0:
+            level += self._rng.gauss(0.0, self.noise_db)
+        self._pending = level
+
+    def save_CSV(self, iter, Rec_duration):
+        self._last[(iter, Rec_duration)] = self._pending
+
+    def process_CSV(self, iter, Rec_duration):
+        lafmax_db = round(self._last[(iter, Rec_duration)], 2)
+        print(f"{lafmax_db=}")
+        return lafmax_db
+
+
+__all__ = [
+    "FakeRPA",
+    "InjectedFailure",
+    "default_spl_model",
+]
@@ -1,14 +1,14 @@
-from openpyxl import *
-from openpyxl.utils.exceptions import InvalidFileException
-from openpyxl.styles import Font
-import os, sys
+import os
 from datetime import datetime
 from zipfile import BadZipFile
+# openpyxl is imported inside the functions that need it so the executables start faster
 
 # To extract information from config file and write into output file
 
 # to open the excel file to write into. If it does not exist, create it
 def open_Output_Excel(path, test_name=None, only_if_empty=True):
+    from openpyxl import load_workbook, Workbook
+    from openpyxl.utils.exceptions import InvalidFileException
     # Open or create workbook
     try:
         wb = load_workbook(path) if os.path.exists(path) else Workbook()
@@ -33,14 +33,15 @@ def open_Output_Excel(path, test_name=None, only_if_empty=True):
 # only require index and sound level in the config file.
 # The list will contain tuple pairs where the first element is the index of the sound and the second element is the sound level to play the sound at
 def read_Config_File_With_User_Input(config_file):
+    from openpyxl import load_workbook
     if not os.path.exists(config_file):
        raise FileNotFoundError(f"Config file not found: {config_file}")
-    wb = load_workbook(filename = config_file, data_only = True)
+    wb = load_workbook(filename = config_file, read_only = True, data_only = True) # streaming read, rows are only read once
     ws = wb.active
     output = []
 
     for row in ws.iter_rows(min_row = 3, max_col = 2, values_only = True):
-        index, sound_level = row
+        index, sound_level = (tuple(row) + (None, None))[:2]
         if index is None or sound_level is None:
             continue
         output.append((index, sound_level))
@@ -54,81 +55,13 @@ def read_Config_File_With_User_Input(config_file):
 # col 2) Security key (0, 1, 2) for security access in DIAGNOSIS panel. - COMPULSORY IF NOT 0
 # col 3) Number of repeats per sound (1 - 10)
 # col 4) OutputExcelName
-# col 5) Duration (1 or 10 seconds)
+# col 5) Duration (1 or 10 seconds) - currently hardcoded to 12 s
+# col 6) Tolerance in dB - optional, project default if empty
+# The config is parsed and validated by Test_plan.load_Test_Plan (streaming read, cached by file hash).
+# Returns the same tuple as always; use load_Test_Plan directly for the typed plan.
 def read_Config_File_For_HW_Team():
-    results = {
-        "ListOfSoundToPlay" : None,
-        "OutputExcelName" : None,
-        "SimulationFilePath" : None,
-        "Duration" : None,
-        "Repeats" : None,
-        "SecurityAccess" : None
-    }
-    config_file = ""
-
-    if getattr(sys, 'frozen', False):
-        # running as EXE
-        base = os.path.dirname(sys.executable) # temp folder path
-    else:
-        # running as script
-        base = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)) # regular folder path
-
-
-    config_file = os.path.join(base, "config.xlsx")
-
-    if not os.path.exists(config_file):
-       raise FileNotFoundError(f"Config file not found: {config_file}")
-    wb = load_workbook(filename = config_file, data_only = True)
-    ws = wb.active
-
-
-    results["ListOfSoundToPlay"] = []
-    results["SimulationFilePath"] = ws.cell(row = 2, column = 1).value
-    results["SecurityAccess"] = ws.cell(row = 2, column = 2).value
-    results["Repeats"] = ws.cell(row = 2, column = 3).value
-    results["OutputExcelName"] = ws.cell(row = 2, column = 4).value
-    # results["Duration"] = ws.cell(row = 2, column = 5).value  # if we take user input from config excel. Now hardcoded to 10s
-    results["Duration"] = 12
-    # print(
-    #     f"{results['SimulationFilePath']=}, "
-    #     f"{results['Repeats']=}, "
-    #     f"{results['Duration']=}, "
-    #     f"{results['OutputExcelName']=}"
-    # )
-
-    assert results["SimulationFilePath"] is not None
-    
-    if results["SecurityAccess"] is None:
-        results["SecurityAccess"] = 0
-
-    if results["OutputExcelName"] is None:
-        results["OutputExcelName"] = "Output.xlsx"
-
-    if results["Repeats"] is None:
-        results["Repeats"] = 3
-
-    # # For the user to choose the duration. Uncomment to choose between 1 and 10 seconds. Currently hardcoded as 10 seconds
-    # if results["Duration"] != 1 and results["Duration"] > 1:
-    #     results["Duration"] = 10
-    # else:
-    #     results["Duration"] = 10
-
-    # to extract sounds to play (index and sound levels)
-    for row in ws.iter_rows(min_row = 3, max_col = 2, values_only = True):
-        index, sound_level = row
-        if index is None or sound_level is None:
-            continue
-        results["ListOfSoundToPlay"].append((index, sound_level))
-
-    wb.close()
-    return (
-        results["ListOfSoundToPlay"],
-        results["OutputExcelName"],
-        results["SimulationFilePath"],
-        results["Duration"],
-        results["Repeats"],
-        results["SecurityAccess"]
-    )
+    from common_modules.Test_plan import load_Test_Plan
+    return load_Test_Plan().as_tuple()
 
 # write into a cell based of a wb some data with the identifying row and col
 def write_Into_Cell(wb, row, col, data):
@@ -146,8 +79,28 @@ def calculate_And_Write_Average(wb, row, number_of_repeats):
     write_Into_Cell(wb, row = row, col = number_of_repeats + 1, data = avg)
 
 
+# bulk store the measurements of a run into the results database (Results_db), e.g. the journal records of
+# a campaign. The run is keyed by run_key so storing a resumed campaign again replaces its measurements.
+# Never raises: a locked or unwritable database must not lose the run, the journal and Excel still have it
+def write_Run_Into_Results_Db(records, run_key, project, simulation_file_path, fingerprint=None, complete=True,
+                              db_path=None, **run_info):
+    import sqlite3
+    from common_modules.Results_db import ResultsDB
+    try:
+        with ResultsDB(db_path) as db:
+            run_id = db.start_run(run_key, project=project, simulation=simulation_file_path, fingerprint=fingerprint, **run_info)
+            n = db.insert_measurements(run_id, records, replace=True)
+            db.finish_run(run_id, complete=complete)
+        print(f"Stored {n} measurements as run {run_id} in {db.path}")
+        return run_id
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not store results in the results database: {e}")
+        return None
+
+
 # simple function to bold text of selected cell
 def bold_text(wb, row, col):
+    from openpyxl.styles import Font
     bold = Font(bold=True)
     ws = wb.active
     cell = ws.cell(row = row, column = col)
@@ -0,0 +1,349 @@
+# Fingerprint.py — check that the right sound is playing from the first few hundred ms of audio, abort early
+# A wrong index, or an ECU that silently stops playing, used to cost a full recording and CSV export (or go
+# unnoticed). With AA_VERIFY set, RunContext.measure starts a probe right after the play commands: a short
+# capture (probe_s, 0.4 s) runs in a background thread while the recording starts. Its fingerprint is
+# compared with the stored reference of that sound; on silence or a mismatch the recording is stopped
+# there, the sound is stopped and played again (at most `retriggers` times; the last attempt is always
+# measured in full and counted as unverified in the progress counters).
+#
+# Fingerprint: the spectrum of the loud part of the probe (frames within 20 dB of the loudest) on 1/12-octave
+# bands, 100 Hz .. 7 kHz, in dB and floored 40 dB below its peak. Comparison is the correlation of two such
+# shapes, so it does not depend on the volume or on when in the probe the sound starts. Silence is a probe
+# that is not margin_db above the background measured when the run starts.
+#
+# The reference database (<project>_fingerprints.json) is built once: the first clean play of a sound is
+# enrolled (unless it sounds like another sound already in the database) and later runs reuse it.
+#
+#   AA_VERIFY=1 | <db path>     verify every play (default db: <project name>_fingerprints.json)
+#   AA_VERIFY_DEVICE=UR22       input device of the probe (a shared-mode device next to ARTA's)
+#
+#   python -m common_modules.Fingerprint Suzuki_fingerprints.json              # list the references
+#   python -m common_modules.Fingerprint Suzuki_fingerprints.json --add SoundTune_PlaySound:7 m7.wav
+#   python -m common_modules.Fingerprint                                       # self-check
+from __future__ import annotations
+import argparse, json, os, re, threading, time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+VERIFY_ENV_VAR = "AA_VERIFY"
+VERIFY_DEVICE_ENV_VAR = "AA_VERIFY_DEVICE"
+
+BANDS_HZ = 100.0 * 2.0 ** (np.arange(0, 74) / 12.0)   # 1/12-octave centres, 100 Hz .. 7 kHz
+FLOOR_DB = 40.0      # fingerprints are floored this far below their peak
+ACTIVE_DB = 20.0     # frames within this of the loudest frame make the fingerprint
+
+
+# ---------------- Fingerprint ----------------
+@dataclass
+class Fingerprint:
+    bands: np.ndarray    # dB per BANDS_HZ band, relative to the peak band (0), floored at -FLOOR_DB
+    level_dbfs: float    # mean level of the loud frames
+    peak_dbfs: float     # loudest frame
+
+    def to_dict(self) -> dict:
+        return {"bands": [round(float(v), 2) for v in self.bands], "level_dbfs": round(self.level_dbfs, 2),
+                "peak_dbfs": round(self.peak_dbfs, 2)}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Fingerprint":
+        return Fingerprint(np.asarray(d["bands"], dtype=float), float(d["level_dbfs"]), float(d["peak_dbfs"]))
+
+
+def fingerprint(x: np.ndarray, fs: int, frame_s: float = 0.04) -> Fingerprint:
+    x = np.asarray(x, dtype=np.float64)
+    n = max(int(frame_s * fs), 16)
+    frames = np.lib.stride_tricks.sliding_window_view(x, n)[::n // 2] if len(x) >= n else x[None, :]
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-30)
+    active = energy_db >= energy_db.max() - ACTIVE_DB
+    power = np.mean(np.abs(np.fft.rfft(frames[active] * np.hanning(frames.shape[1]), axis=1)) ** 2, axis=0)
+    f = np.fft.rfftfreq(frames.shape[1], 1.0 / fs)
+    # band power = sum of its bins; bands narrower than a bin take the spectrum at their centre
+    edges = np.searchsorted(f, BANDS_HZ * 2 ** (-1 / 24)), np.searchsorted(f, BANDS_HZ * 2 ** (1 / 24))
+    csum = np.concatenate([[0.0], np.cumsum(power)])
+    band = np.where(edges[1] > edges[0], csum[edges[1]] - csum[edges[0]], np.interp(BANDS_HZ, f, power))
+    db = 10 * np.log10(band + 1e-30)
+    db = np.maximum(db - db.max(), -FLOOR_DB)
+    return Fingerprint(db, float(10 * np.log10(np.mean(10 ** (energy_db[active] / 10)))), float(energy_db.max()))
+
+# correlation of two fingerprint shapes, 1 = same spectrum
+def similarity(a: Fingerprint, b: Fingerprint) -> float:
+    u, v = a.bands - a.bands.mean(), b.bands - b.bands.mean()
+    den = float(np.sqrt(np.sum(u * u) * np.sum(v * v)))
+    return float(np.sum(u * v) / den) if den > 0 else 0.0
+
+
+# ---------------- Reference database ----------------
+class FingerprintDB():
+    # {key: fingerprint} in a JSON file, written atomically on every change
+    def __init__(self, path):
+        self.path = str(path)
+        self.sounds: Dict[str, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.sounds = json.load(f).get("sounds", {})
+        self._refs = {key: Fingerprint.from_dict(d) for key, d in self.sounds.items()}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self._refs
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def get(self, key) -> Optional[Fingerprint]:
+        return self._refs.get(key)
+
+    def add(self, key: str, fp: Fingerprint, **info):
+        with self._lock:
+            self._refs[key] = fp
+            self.sounds[key] = {**fp.to_dict(), "added": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **info}
+            self.save()
+
+    def forget(self, key: str):
+        with self._lock:
+            self._refs.pop(key, None)
+            self.sounds.pop(key, None)
+            self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "bands_hz": [round(float(b), 1) for b in BANDS_HZ], "sounds": self.sounds}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    # (key, score) of the best matching reference, optionally leaving one key out
+    def best(self, fp: Fingerprint, exclude: Optional[str] = None) -> Tuple[Optional[str], float]:
+        scores = [(similarity(fp, ref), key) for key, ref in self._refs.items() if key != exclude]
+        if not scores:
+            return None, 0.0
+        score, key = max(scores)
+        return key, score
+
+
+# ---------------- Verification ----------------
+@dataclass
+class Verdict:
+    key: str
+    status: str                       # "match" | "enrolled" | "mismatch" | "silent"
+    score: Optional[float] = None     # similarity with the reference of key
+    best_key: Optional[str] = None    # closest other reference, for a mismatch
+    best_score: Optional[float] = None
+    level_dbfs: Optional[float] = None
+    probe_s: float = 0.0              # capture + analysis time
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("match", "enrolled")
+
+    def describe(self) -> str:
+        if self.status == "silent":
+            return f"{self.key}: silent (peak {self.level_dbfs:.1f} dBFS)"
+        s = f"{self.key}: {self.status}"
+        if self.score is not None:
+            s += f", similarity {self.score:.2f}"
+        if self.best_key is not None and self.best_score is not None:
+            s += f", closest other {self.best_key} ({self.best_score:.2f})"
+        return s
+
+
+class VerifyCheck():
+    # one probe in flight; failed is set as soon as the verdict is a failure (aborts the recording)
+    def __init__(self, verifier: "SoundVerifier", key: str):
+        self.key = key
+        self.failed = threading.Event()
+        self._verdict: Optional[Verdict] = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, args=(verifier,), name="verify-probe", daemon=True)
+        self._thread.start()
+
+    def _run(self, verifier):
+        try:
+            self._verdict = verifier.verify(self.key)
+            if not self._verdict.ok:
+                self.failed.set()
+        except BaseException as e: # a broken probe must not stop the run
+            self._error = e
+
+    def result(self, timeout: Optional[float] = None) -> Verdict:
+        self._thread.join(timeout)
+        if self._verdict is None:
+            reason = f"probe failed: {self._error!r}" if self._error is not None else "probe timed out"
+            print(f"Verification of {self.key} skipped, {reason}")
+            return Verdict(self.key, "match") # unverified, but never worse than before the verifier existed
+        return self._verdict
+
+
+class SoundVerifier():
+    # capture(duration_s) -> (samples, fs) records what the microphone hears from now on.
+    # min_score: similarity needed to pass; margin_db: how far above the background a sound has to be;
+    # retriggers: plays after the first that may be aborted; enrol: add unknown sounds on their first clean play
+    def __init__(self, db: FingerprintDB, capture: Callable[[float], Tuple[np.ndarray, int]], probe_s: float = 0.4,
+                 min_score: float = 0.7, margin_db: float = 6.0, silence_dbfs: float = -70.0, retriggers: int = 2,
+                 enrol: bool = True):
+        self.db, self.capture, self.probe_s = db, capture, probe_s
+        self.min_score, self.margin_db, self.silence_dbfs = min_score, margin_db, silence_dbfs
+        self.retriggers, self.enrol = retriggers, enrol
+        self.background_dbfs: Optional[float] = None
+        self.counts = {"match": 0, "enrolled": 0, "mismatch": 0, "silent": 0}
+
+    # ambient level while nothing plays; silence is judged against it (else against silence_dbfs)
+    def measure_background(self) -> float:
+        x, fs = self.capture(self.probe_s)
+        self.background_dbfs = fingerprint(x, fs).level_dbfs
+        print(f"Verification: background {self.background_dbfs:.1f} dBFS, {len(self.db)} reference sounds in {self.db.path}")
+        return self.background_dbfs
+
+    def judge(self, key: str, fp: Fingerprint) -> Verdict:
+        floor = self.silence_dbfs if self.background_dbfs is None else self.background_dbfs + self.margin_db
+        if fp.peak_dbfs < floor:
+            return Verdict(key, "silent", level_dbfs=fp.peak_dbfs)
+        ref = self.db.get(key)
+        other, other_score = self.db.best(fp, exclude=key)
+        if ref is None:
+            if other is not None and other_score >= self.min_score: # a wrong sound must not become a reference
+                return Verdict(key, "mismatch", best_key=other, best_score=other_score, level_dbfs=fp.level_dbfs)
+            if self.enrol:
+                self.db.add(key, fp)
+            return Verdict(key, "enrolled", level_dbfs=fp.level_dbfs)
+        score = similarity(fp, ref)
+        if score < self.min_score or (other is not None and other_score > score + 0.05):
+            return Verdict(key, "mismatch", score, other, other_score, fp.level_dbfs)
+        return Verdict(key, "match", score, other, other_score, fp.level_dbfs)
+
+    def verify(self, key: str) -> Verdict:
+        t = time.perf_counter()
+        x, fs = self.capture(self.probe_s)
+        verdict = self.judge(key, fingerprint(x, fs))
+        verdict.probe_s = time.perf_counter() - t
+        self.counts[verdict.status] += 1
+        return verdict
+
+    # probe in the background, started right after the play commands
+    def start(self, cell) -> VerifyCheck:
+        return VerifyCheck(self, sound_key(cell))
+
+
+# reference key of a cell: the play button it toggles (tone / voice bank, diag telegram) and the index
+def sound_key(cell) -> str:
+    play = [c.params[0] for c in cell.before if c.command == "toggle_env" and c.params]
+    return f"{play[-1] if play else 'play'}:{cell.index}"
+
+
+# ---------------- Capture sources ----------------
+# probe from a sounddevice input (shared mode, next to ARTA's capture)
+def sounddevice_capture(device_hint: Optional[str] = None, fs: int = 48000) -> Callable[[float], Tuple[np.ndarray, int]]:
+    from common_modules.Audio import CaptureConfig, find_input_device_id, record_raw
+    dev_id = find_input_device_id(device_hint)
+    def capture(duration_s: float):
+        cfg = CaptureConfig(device_name_hint=device_hint, samplerate=fs, duration_s=duration_s, pre_roll_ms=0)
+        return record_raw(cfg, dev_id), fs
+    return capture
+
+def default_db_path(project_name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", project_name).strip("_") + "_fingerprints.json"
+
+# verifier for a run from AA_VERIFY / AA_VERIFY_DEVICE; None when verification is off. The dry run's simulated
+# audio has its own probe (rpa.probe)
+def verifier_For_Run(project_name: str, rpa=None) -> Optional[SoundVerifier]:
+    target = os.environ.get(VERIFY_ENV_VAR, "").strip()
+    if target in ("", "0"):
+        return None
+    path = default_db_path(project_name) if target == "1" else target
+    capture = getattr(rpa, "probe", None) or sounddevice_capture(os.environ.get(VERIFY_DEVICE_ENV_VAR) or None)
+    return SoundVerifier(FingerprintDB(path), capture)
+
+
+# ---------------- Self-check ----------------
+# a dry run with verification: the mock ECU plays a wrong tone once and nothing once; both plays must be
+# aborted and retriggered and every cell still measured. The first run enrols each sound once, a second run
+# reuses the database and matches every play (nothing enrolled, nothing retriggered)
+def selfcheck_fingerprint(n_sounds: int = 6, workdir=None) -> bool:
+    import contextlib, io, tempfile
+    from common_modules.Coordinator import demo_Plan, demo_Project
+    from common_modules.Dry_run import dry_Run_Backends
+    from common_modules.Results_journal import read_journal
+    from common_modules.Runner import run_Project
+    workdir = workdir or tempfile.mkdtemp(prefix="verify_")
+    db_path = os.path.join(workdir, "fingerprints.json")
+    os.environ[VERIFY_ENV_VAR] = db_path
+    ok = True
+    for run in (1, 2):
+        UTAS, rpa = dry_Run_Backends(0.0, seed=run)
+        plays = {"n": 0}
+        def faulty_play(e, plays=plays, faulty=(run == 1)):
+            plays["n"] += 1
+            e._script_play("tone")
+            if faulty and plays["n"] == 2:
+                bank, index, volume = e.playing
+                e.playing = (bank, index + 5, volume) # wrong sound
+            elif faulty and plays["n"] == 5:
+                e.playing = None # the ECU did not play
+        rpa.engine.script("SoundTune_PlaySound", faulty_play)
+        out = os.path.join(workdir, f"Output_{run}.xlsx")
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            ctx = run_Project(demo_Project(), plan=demo_Plan(n_sounds, repeats=2), UTAS=UTAS, rpa=rpa, output_path=out,
+                              project_path="p", interactive=False, dry_run=0.0)
+        wall = time.perf_counter() - t
+        counts = ctx.verifier.counts
+        records = read_journal(ctx.checkpoint.journal.path)
+        retriggers = ctx.progress.counts.get("retriggers", 0)
+        good = len(records) == 2 * n_sounds and ctx.progress.counts.get("unverified", 0) == 0
+        if run == 1:
+            good &= retriggers == 2 and counts["mismatch"] == 1 and counts["silent"] == 1 and counts["enrolled"] == n_sounds
+        else:
+            good &= retriggers == 0 and counts["enrolled"] == 0 and counts["match"] == 2 * n_sounds
+        ok &= good
+        lines = [l for l in log.getvalue().splitlines() if l.startswith("Verification")]
+        for line in lines[1:]:
+            print(f"[selfcheck]   {line}")
+        print(f"[selfcheck] run {run}: {len(records)} measurements, verdicts {counts}, {retriggers} retriggers, "
+              f"{wall:.2f} s{'' if good else '  <-- FAILED'}")
+    os.environ.pop(VERIFY_ENV_VAR, None)
+    print(f"[selfcheck] fingerprint verification {'OK' if ok else 'FAILED'} ({db_path}, {len(FingerprintDB(db_path))} references)")
+    return ok
+
+
+__all__ = [
+    "Fingerprint",
+    "fingerprint",
+    "similarity",
+    "FingerprintDB",
+    "Verdict",
+    "SoundVerifier",
+    "sound_key",
+    "sounddevice_capture",
+    "verifier_For_Run",
+    "selfcheck_fingerprint",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Reference fingerprints of the sounds of a project (default: self-check)")
+    p.add_argument("db", nargs="?", help="Fingerprint database, e.g. Suzuki_fingerprints.json")
+    p.add_argument("--add", nargs=2, metavar=("KEY", "WAV"), help="Add or replace a reference from a capture")
+    p.add_argument("--forget", metavar="KEY", help="Remove a reference (re-enrolled on its next clean play)")
+    p.add_argument("--probe-s", type=float, default=0.4, help="Length used from the start of a --add capture")
+    args = p.parse_args()
+
+    if not args.db:
+        selfcheck_fingerprint()
+    else:
+        db = FingerprintDB(args.db)
+        if args.add:
+            from common_modules.Alignment import load_capture
+            x, fs = load_capture(args.add[1])
+            db.add(args.add[0], fingerprint(x[:int(args.probe_s * fs)], fs), source=os.path.basename(args.add[1]))
+        if args.forget:
+            db.forget(args.forget)
+        for key in sorted(db.sounds):
+            fp, d = db.get(key), db.sounds[key]
+            other, score = db.best(fp, exclude=key)
+            near = f", closest {other} ({score:.2f})" if other else ""
+            print(f"{key:<32} peak {BANDS_HZ[int(np.argmax(fp.bands))]:7.1f} Hz, {fp.level_dbfs:6.1f} dBFS, "
+                  f"added {d.get('added', '?')}{near}")
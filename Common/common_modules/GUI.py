@@ -1,11 +1,11 @@
 import os
-from tkinter import Tk, Label, Button, filedialog
-from tkinter.ttk import Combobox
 
-# Currently not being used. 
+# Currently not being used. tkinter is only imported when one of the GUIs is actually opened.
 
 # Use only if user is using this. If HW team is using this, not needed
 def GUI_For_User():
+    from tkinter import Tk, Label, Button, filedialog
+    from tkinter.ttk import Combobox
     # storage for results
     results = {
         "output_excel": None,
@@ -100,6 +100,7 @@ def GUI_For_User():
 
 # only ask for config file. May be needed(?) 
 def GUI_For_HW_Team():
+    from tkinter import Tk, Label, Button, filedialog
     # storage for results
     result = {"config_excel": None}
 
@@ -1,7 +1,5 @@
-from pywinauto import Desktop
-import os, time, winreg, shutil
-from pywinauto.timings import *
-from pywinauto import Desktop, timings
+import os, time, shutil
+# pywinauto and winreg are imported inside the functions that use them to keep start up fast
 
 # find the UTAS execution engine path on the machine. Default install path is D: drive. However, not all computers have :D drives so
 # this code attempts to find the executable using the uninstall path as uTAS registers in windows registry on download
@@ -9,6 +7,7 @@ def _try(path):
     return path if path and os.path.exists(path) else None
 
 def find_UTAS_Execution_Engine_Path() -> str | None:
+    import winreg
     uninstall_keys = [
         (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall\uTAS5",       winreg.KEY_WOW64_64KEY),
         (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall\uTAS5", winreg.KEY_WOW64_32KEY),
@@ -70,6 +69,17 @@ def find_UTAS_Execution_Engine_Path() -> str | None:
 
     return None
 
+# connect to the uTAS execution engine if it is already running, otherwise launch it. Returns the pywinauto Application
+def start_UTAS_Execution_Engine(UTAS_Execution_Engine_Path):
+    from pywinauto import Application
+    from pywinauto.application import ProcessNotFoundError
+    app = Application()
+    try:
+        app.connect(path=UTAS_Execution_Engine_Path) # try to find execution engine if already running
+    except(ProcessNotFoundError, RuntimeError):
+        app = app.start(UTAS_Execution_Engine_Path, wait_for_idle=False) # if not running, launch
+    return app
+
 # Check for the OTC window login window if it exist and block until it closes either by cancelling or actually logging in
 def wait_for_OTC_Login(appear_timeout=30, close_timeout=300, fail_if_not_closed=True):
     """
@@ -80,6 +90,7 @@ def wait_for_OTC_Login(appear_timeout=30, close_timeout=300, fail_if_not_closed=
     Raises:
         RuntimeError -> dialog appeared but did not close within close_timeout and fail_if_not_closed=True
     """
+    from pywinauto import Desktop, timings
     desktop = Desktop(backend="uia")
 
     # Match title loosely (case-insensitive, extra spaces ok)
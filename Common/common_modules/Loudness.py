@@ -0,0 +1,432 @@
+# Loudness.py — Zwicker loudness (ISO 532-1 / DIN 45631) in sone and phon, stationary and time-varying
+# Built on a third-octave path (28 bands, 25 Hz .. 12.5 kHz): each band is filtered, squared and smoothed
+# (tau = 2/(3 fc), at most 2/3 ms) and sampled every 0.5 ms, as in ISO 532-1 clause 6. From the band levels:
+#   stationary     band levels averaged over the analysis window -> core loudness -> N (sone), LN (phon)
+#   time-varying   every 0.5 ms frame -> core loudness -> nonlinear decay -> N(t) -> temporal weighting,
+#                  reported at 2 ms like the standard; Nmax and N5 (exceeded 5 % of the time)
+# The analysis is vectorized over frames: the core loudness is array arithmetic on (frames, bands), the upper
+# slopes come from a closed form of the Bark descent (np.interp on its breakpoints) with the 21 critical bands
+# as the only loop, and the nonlinear decay, the one genuinely sequential step, runs the time axis as
+# overlapping chunks side by side (its state is forgotten long before the 1 s warm-up ends). The bank is
+# multirate (low bands are filtered at 24, 8 or 2 kHz), so 10 s at 48 kHz take ~0.2 s. Other rates are
+# resampled to 48 kHz first, as the standard prescribes.
+#
+#   python -m common_modules.Loudness capture.wav --cal 110.0 [--diffuse]   # N, LN, Nmax, N5 of a capture
+#   python -m common_modules.Loudness                                        # self-check (ISO 532-1 reference values) + timing
+from __future__ import annotations
+import argparse, time
+from functools import lru_cache
+from math import gcd
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.signal import butter, cheby1, lfilter, resample_poly, sosfilt
+
+from common_modules.Audio import _window_bounds
+
+FS = 48000                                            # rate of the standard's filter bank
+FRAME_RATE = 2000                                     # band levels / core loudness every 0.5 ms
+OUT_DECIMATION = 4                                    # N(t) reported every 2 ms
+BAND_FC = 1000.0 * 10.0 ** (np.arange(-16, 12) / 10.0) # 25 Hz .. 12.5 kHz (exact base-10 centres)
+BARK = np.round(np.arange(1, 241) * 0.1, 1)            # specific loudness grid, 0.1 .. 24 Bark
+FIELDS = ("free", "diffuse")
+
+
+# ---------------- ISO 532-1 tables ----------------
+# ranges of third-octave levels and their reductions for the 11 bands up to 250 Hz (equal loudness contours)
+RAP = np.array([45, 55, 65, 71, 80, 90, 100, 120], dtype=float)
+DLL = np.array([[-32, -24, -16, -10, -5, 0, -7, -3, 0, -2, 0],
+                [-29, -22, -15, -10, -4, 0, -7, -2, 0, -2, 0],
+                [-27, -19, -14, -9, -4, 0, -6, -2, 0, -2, 0],
+                [-25, -17, -12, -9, -3, 0, -5, -2, 0, -2, 0],
+                [-23, -16, -11, -7, -3, 0, -4, -1, 0, -1, 0],
+                [-20, -14, -10, -6, -3, 0, -4, -1, 0, -1, 0],
+                [-18, -12, -9, -6, -2, 0, -3, -1, 0, -1, 0],
+                [-15, -10, -8, -4, -2, 0, -3, -1, 0, -1, 0]], dtype=float)
+# critical band level at threshold, ear transmission, diffuse - free field, third-octave -> critical band
+LTQ = np.array([30, 18, 12, 8, 7, 6, 5, 4, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3], dtype=float)
+A0 = np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -0.5, -1.6, -3.2, -5.4, -5.6, -4, -1.5, 2, 5, 12])
+DDF = np.array([0, 0, 0.5, 0.9, 1.2, 1.6, 2.3, 2.8, 3, 2, 0, -1.4, -2, -1.9, -1, 0.5, 3, 4, 4.3, 4])
+DCB = np.array([-0.25, -0.6, -0.8, -0.8, -0.5, 0, 0.5, 1.1, 1.5, 1.7, 1.8, 1.8, 1.7, 1.6, 1.4, 1.2, 0.8, 0.5, 0, -0.5])
+# upper limits of the approximated critical bands (Bark), specific loudness ranges and upper slopes in them
+ZUP = np.array([0.9, 1.8, 2.8, 3.5, 4.4, 5.4, 6.6, 7.9, 9.2, 10.6, 12.3, 13.8, 15.2, 16.7, 18.1, 19.3, 20.6,
+                21.8, 22.7, 23.6, 24.0])
+RNS = np.array([21.5, 18, 15.1, 11.5, 9, 6.1, 4.4, 3.1, 2.13, 1.36, 0.82, 0.42, 0.30, 0.22, 0.15, 0.10, 0.035, 0])
+USL = np.array([[13, 8.2, 6.3, 5.5, 5.5, 5.5, 5.5, 5.5],
+                [9, 7.5, 6, 5.1, 4.5, 4.5, 4.5, 4.5],
+                [7.8, 6.7, 5.6, 4.9, 4.4, 3.9, 3.9, 3.9],
+                [6.2, 5.4, 4.6, 4.0, 3.5, 3.2, 3.2, 3.2],
+                [4.5, 3.8, 3.6, 3.2, 2.9, 2.7, 2.7, 2.7],
+                [3.7, 3.0, 2.8, 2.35, 2.2, 2.2, 2.2, 2.2],
+                [2.9, 2.3, 2.1, 1.9, 1.8, 1.7, 1.7, 1.7],
+                [2.4, 1.7, 1.5, 1.35, 1.3, 1.3, 1.3, 1.3],
+                [1.95, 1.45, 1.3, 1.15, 1.1, 1.1, 1.1, 1.1],
+                [1.5, 1.2, 0.94, 0.86, 0.82, 0.82, 0.82, 0.82],
+                [0.72, 0.67, 0.64, 0.63, 0.62, 0.62, 0.62, 0.62],
+                [0.59, 0.53, 0.51, 0.50, 0.42, 0.42, 0.42, 0.42],
+                [0.40, 0.33, 0.26, 0.24, 0.24, 0.22, 0.22, 0.22],
+                [0.27, 0.21, 0.20, 0.18, 0.17, 0.17, 0.17, 0.17],
+                [0.16, 0.15, 0.14, 0.12, 0.11, 0.11, 0.11, 0.11],
+                [0.12, 0.11, 0.10, 0.08, 0.08, 0.08, 0.08, 0.08],
+                [0.09, 0.08, 0.07, 0.06, 0.06, 0.06, 0.06, 0.05],
+                [0.06, 0.05, 0.03, 0.02, 0.02, 0.02, 0.02, 0.02]])
+
+
+# ---------------- Third-octave levels ----------------
+# a band is filtered at the lowest rate that is at least 4x its upper edge (48 -> 24 -> 8 -> 2 kHz); the
+# squared-and-smoothed output is sampled down to FRAME_RATE
+_RATES = (48000, 24000, 8000, 2000)
+
+@lru_cache(maxsize=None)
+def _filter_bank():
+    groups = []
+    upper = BAND_FC * 2 ** (1 / 6)
+    lowest = [min((r for r in _RATES if r >= 4 * f), default=_RATES[0]) for f in upper]
+    for rate in _RATES:
+        bands = [k for k in range(len(BAND_FC)) if lowest[k] == rate]
+        filters = []
+        for k in bands:
+            fc = BAND_FC[k]
+            band = butter(3, [fc * 2 ** (-1 / 6), fc * 2 ** (1 / 6)], btype="bandpass", fs=rate, output="sos")
+            a1 = np.exp(-1.0 / (rate * (2.0 / (3.0 * min(fc, 1000.0)))))
+            smooth = np.tile([1.0 - a1, 0.0, 0.0, 1.0, -a1, 0.0], (3, 1)) # three one-pole low-passes
+            filters.append((k, band, smooth))
+        groups.append((rate, filters))
+    # anti-alias filters between the rates
+    decimators = [cheby1(8, 0.05, 0.8 / (hi // lo), output="sos") for hi, lo in zip(_RATES, _RATES[1:])]
+    return groups, decimators
+
+# mean square of every band, (frames, 28) at FRAME_RATE, in full-scale units
+def third_octave_ms(x: np.ndarray, fs: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    if fs != FS:
+        g = gcd(int(fs), FS)
+        x = resample_poly(x, FS // g, int(fs) // g)
+    n_frames = len(x) // (FS // FRAME_RATE)
+    groups, decimators = _filter_bank()
+    out = np.empty((n_frames, len(BAND_FC)))
+    for i, (rate, filters) in enumerate(groups):
+        step = rate // FRAME_RATE
+        for k, band, smooth in filters:
+            out[:, k] = sosfilt(smooth, sosfilt(band, x) ** 2)[step - 1::step][:n_frames]
+        if i < len(decimators):
+            x = sosfilt(decimators[i], x)[::rate // _RATES[i + 1]]
+    return out
+
+def third_octave_levels(x: np.ndarray, fs: int, dbfs_to_dbspl: float) -> np.ndarray:
+    return 10 * np.log10(third_octave_ms(x, fs) + 1e-30) + dbfs_to_dbspl
+
+
+# ---------------- Core loudness ----------------
+# (..., 28) third-octave levels in dB SPL -> (..., 21) core loudness per critical band (sone/Bark); also
+# whether the levels are inside the standard's range (bands up to 250 Hz at most 120 dB)
+def core_loudness(levels: np.ndarray, field: str = "free") -> Tuple[np.ndarray, bool]:
+    if field not in FIELDS:
+        raise ValueError(f"field must be one of {FIELDS}, not {field!r}")
+    levels = np.asarray(levels, dtype=np.float64)
+    low = levels[..., :11]
+    valid = bool(np.all(low <= 120.0))
+    # correction of the low bands: the first range RAP[j] - DLL[j] the level is not above (the last one above)
+    j = np.minimum(np.sum(low[..., None, :] > RAP[:, None] - DLL, axis=-2), len(RAP) - 1)
+    ti = 10.0 ** ((low + DLL[j, np.arange(11)]) / 10)
+    lcb = 10 * np.log10(np.stack([ti[..., 0:6].sum(-1), ti[..., 6:9].sum(-1), ti[..., 9:11].sum(-1)], axis=-1))
+    le = np.concatenate([lcb, levels[..., 11:]], axis=-1) - A0
+    if field == "diffuse":
+        le = le + DDF
+    above = le > LTQ
+    le = np.where(above, le - DCB, le)
+    nm = 0.0635 * 10.0 ** (0.025 * LTQ) * ((0.75 + 0.25 * 10.0 ** (0.1 * (le - LTQ))) ** 0.25 - 1.0)
+    nm = np.where(above, np.maximum(nm, 0.0), 0.0)
+    # lowest critical band: dependence of the threshold within it
+    korry = 0.4 + 0.32 * nm[..., 0] ** 0.2
+    nm[..., 0] = np.where(korry <= 1.0, nm[..., 0] * korry, nm[..., 0])
+    return np.concatenate([nm, np.zeros(nm.shape[:-1] + (1,))], axis=-1), valid
+
+
+# ---------------- Upper slopes ----------------
+# Coming down from a louder band, specific loudness falls with slope USL[j, ig] while it is in the range
+# (RNS[j], RNS[j-1]]. For one slope column that is a fixed descent: D(N) is the Bark distance needed to fall
+# from N to 0, E(N) the area under the curve meanwhile; both are tabulated at the RNS breakpoints, so a
+# descent from N1 over dz ends at D^-1(D(N1) - dz) and covers E(N1) - E(N2) sone
+@lru_cache(maxsize=None)
+def _descent_tables():
+    b = np.append(RNS[::-1], 1e4)             # ascending breakpoints, the top range open-ended
+    tables = []
+    for ig in range(USL.shape[1]):
+        s = USL[::-1, ig]                     # slope of the range [b[k], b[k+1]]
+        d = np.concatenate([[0.0], np.cumsum(np.diff(b) / s)])
+        e = np.concatenate([[0.0], np.cumsum(np.diff(b ** 2) / (2 * s))])
+        tables.append((d, e, s))
+    return b, tables
+
+def _area(n: np.ndarray, b: np.ndarray, e: np.ndarray, s: np.ndarray) -> np.ndarray:
+    k = np.clip(np.searchsorted(b, n, side="right") - 1, 0, len(s) - 1)
+    return e[k] + (n ** 2 - b[k] ** 2) / (2 * s[k])
+
+# (..., 21) core loudness -> total loudness N (...,) in sone and, if specific, N'(z) (..., 240) in sone/Bark
+def specific_loudness(core: np.ndarray, specific: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    core = np.asarray(core, dtype=np.float64)
+    b, tables = _descent_tables()
+    total = np.zeros(core.shape[:-1])
+    grid = np.empty(core.shape[:-1] + (len(BARK),)) if specific else None
+    band_of = np.searchsorted(ZUP + 1e-4, BARK)
+    n1 = np.zeros(core.shape[:-1])           # specific loudness at the upper edge of the band below
+    z1 = 0.0
+    for i in range(len(ZUP)):
+        nm, width = core[..., i], ZUP[i] - z1
+        d, e, s = tables[min(max(i - 1, 0), 7)]
+        falling = n1 > nm
+        d1 = np.interp(n1, b, d)
+        reach = d1 - np.interp(nm, b, d)     # Bark needed to come down to the core loudness
+        n2 = np.where(reach >= width, np.interp(d1 - width, d, b), nm)
+        down = _area(n1, b, e, s) - _area(n2, b, e, s) + nm * np.maximum(width - reach, 0.0)
+        total += np.where(falling, down, nm * width)
+        if specific:
+            dz = BARK[band_of == i] - z1
+            curve = np.interp(d1[..., None] - dz, d, b)
+            grid[..., band_of == i] = np.where(falling[..., None], np.maximum(curve, nm[..., None]), nm[..., None])
+        n1 = np.where(falling, n2, nm)
+        z1 = ZUP[i]
+    return total, grid
+
+def loudness_level(n) -> np.ndarray:
+    n = np.asarray(n, dtype=np.float64)
+    return np.where(n >= 1.0, 40.0 + 10.0 * np.log2(np.maximum(n, 1.0)), 40.0 * (n + 0.0005) ** 0.35)
+
+
+# ---------------- Time-varying ----------------
+# ISO 532-1 nonlinear decay of the core loudness: instant attack; the release is fast after short sounds and
+# slow after long ones (u2 remembers how long the band was loud). Exact discretization at FRAME_RATE
+def _decay_coefficients(dt: float, t_short: float = 0.005, t_long: float = 0.015, t_var: float = 0.075):
+    p = (t_var + t_long) / (t_var * t_short)
+    q = 1.0 / (t_short * t_var)
+    l1, l2 = -p / 2 + np.sqrt(p * p / 4 - q), -p / 2 - np.sqrt(p * p / 4 - q)
+    den = t_var * (l1 - l2)
+    e1, e2 = np.exp(l1 * dt), np.exp(l2 * dt)
+    return ((e1 - e2) / den,
+            ((t_var * l2 + 1) * e1 - (t_var * l1 + 1) * e2) / den,
+            ((t_var * l1 + 1) * e1 - (t_var * l2 + 1) * e2) / den,
+            (t_var * l1 + 1) * (t_var * l2 + 1) * (e1 - e2) / den,
+            np.exp(-dt / t_long),
+            np.exp(-dt / t_var))
+
+# The recursion is sequential in time, so the time axis is cut into chunks that run side by side as extra
+# lanes, each started warm_s early from silence; the state forgets its start within ~1 s (slowest pole
+# ~85 ms), and the first chunk starts from real silence, so it is exact
+def nonlinear_decay(core: np.ndarray, rate: int = FRAME_RATE, chunk_s: float = 0.5, warm_s: float = 1.0) -> np.ndarray:
+    n, bands = core.shape
+    chunk, warm = max(1, int(chunk_s * rate)), int(warm_s * rate)
+    chunks = -(-n // chunk)
+    padded = np.concatenate([np.zeros((warm, bands)), core, np.zeros((chunks * chunk - n, bands))])
+    idx = np.arange(chunks)[:, None] * chunk + np.arange(warm + chunk)[None, :]
+    lanes = padded[idx].transpose(1, 0, 2).reshape(warm + chunk, chunks * bands)
+    b0, b1, b2, b3, b4, b5 = _decay_coefficients(1.0 / rate)
+    uo, u2 = np.zeros(lanes.shape[1]), np.zeros(lanes.shape[1])
+    out = np.empty((chunk, lanes.shape[1]))
+    for t, ui in enumerate(lanes):
+        second = uo > u2
+        released = np.maximum(np.where(second, uo * b2 - u2 * b3, uo * b4), ui)
+        u2 = np.where(ui >= uo, (u2 - ui) * b5 + ui, np.where(second, np.minimum(uo * b0 - u2 * b1, released), released))
+        uo = released
+        if t >= warm:
+            out[t - warm] = uo
+    return out.reshape(chunk, chunks, bands).transpose(1, 0, 2).reshape(chunks * chunk, bands)[:n]
+
+# first-order low-pass with the input linear between frames (the standard's interpolated sub-steps, exactly)
+def _lowpass_interp(x: np.ndarray, tau: float, rate: int) -> np.ndarray:
+    a = np.exp(-1.0 / (rate * tau))
+    c = tau * rate * (1.0 - a)
+    return lfilter([1.0 - c, c - a], [1.0, -a], x)
+
+# duration dependence of short impulses: 0.47 LP(3.5 ms) + 0.53 LP(70 ms) on the total loudness
+def temporal_weighting(n: np.ndarray, rate: int = FRAME_RATE) -> np.ndarray:
+    return 0.47 * _lowpass_interp(n, 0.0035, rate) + 0.53 * _lowpass_interp(n, 0.070, rate)
+
+
+# ---------------- Public API ----------------
+def _frames(n: int, start_offset_ms: int, window_sec: Optional[float]) -> slice:
+    return slice(*_window_bounds(n, FRAME_RATE, start_offset_ms, window_sec))
+
+# ISO 532-1 stationary loudness of the analysis window: N (sone), LN (phon), N'(z) and the band levels
+def loudness_stationary(x: np.ndarray, fs: int, dbfs_to_dbspl: float, field: str = "free",
+                        start_offset_ms: int = 0, window_sec: Optional[float] = None,
+                        ms: Optional[np.ndarray] = None) -> Dict[str, object]:
+    ms = third_octave_ms(x, fs) if ms is None else ms
+    levels = 10 * np.log10(np.mean(ms[_frames(len(ms), start_offset_ms, window_sec)], axis=0) + 1e-30) + dbfs_to_dbspl
+    core, valid = core_loudness(levels, field)
+    n, spec = specific_loudness(core)
+    return {"N": float(n), "LN": float(loudness_level(n)), "N_specific": spec, "bark": BARK,
+            "band_levels": levels, "band_fc": BAND_FC, "valid": valid}
+
+# ISO 532-1 time-varying loudness: N(t) every 2 ms over the analysis window, its maximum and N5
+def loudness_time_varying(x: np.ndarray, fs: int, dbfs_to_dbspl: float, field: str = "free",
+                          start_offset_ms: int = 0, window_sec: Optional[float] = None, specific: bool = False,
+                          ms: Optional[np.ndarray] = None) -> Dict[str, object]:
+    ms = third_octave_ms(x, fs) if ms is None else ms
+    core, valid = core_loudness(10 * np.log10(ms + 1e-30) + dbfs_to_dbspl, field)
+    core = nonlinear_decay(core)
+    n, _ = specific_loudness(core, specific=False)
+    win = _frames(len(n), start_offset_ms, window_sec)
+    n_t = temporal_weighting(n)[win][::OUT_DECIMATION]
+    t = (np.arange(len(ms))[win][::OUT_DECIMATION] + 1) / FRAME_RATE
+    n5 = float(np.percentile(n_t, 95)) if len(n_t) else 0.0
+    out = {"t": t, "N_t": n_t, "Nmax": float(np.max(n_t, initial=0.0)), "N5": n5,
+           "LN5": float(loudness_level(n5)), "valid": valid}
+    if specific:
+        out["N_specific_t"] = specific_loudness(core[win][::OUT_DECIMATION])[1]
+        out["bark"] = BARK
+    return out
+
+# the scalars for compute_metrics / result rows; one pass of the filter bank for both methods
+def loudness_metrics(x: np.ndarray, fs: int, dbfs_to_dbspl: float, field: str = "free",
+                     start_offset_ms: int = 0, window_sec: Optional[float] = None) -> Dict[str, float]:
+    ms = third_octave_ms(x, fs)
+    st = loudness_stationary(x, fs, dbfs_to_dbspl, field, start_offset_ms, window_sec, ms=ms)
+    tv = loudness_time_varying(x, fs, dbfs_to_dbspl, field, start_offset_ms, window_sec, ms=ms)
+    return {"N_sone": st["N"], "LN_phon": st["LN"], "Nmax_sone": tv["Nmax"], "N5_sone": tv["N5"],
+            "LN5_phon": tv["LN5"]}
+
+
+# ---------------- Self-check ----------------
+# ISO 532-1:2017 Annex B.2, test signal 1: third-octave levels 25 Hz .. 12.5 kHz, N = 83.296 sone in a free field
+ISO_B2_LEVELS = np.array([-60, -60, 78, 79, 89, 72, 80, 89, 75, 87, 85, 79, 86, 80, 71, 70, 72, 71, 72, 74, 69, 65,
+                          67, 77, 68, 58, 45, 30], dtype=float)
+ISO_B2_N = 83.296
+ISO_B3_1K60_N = 4.019 # Annex B.3, test signal 3: 1 kHz tone at 60 dB
+
+# the same inputs through MoSQITo 1.2.1 (loudness_zwst / loudness_zwtv, free field unless noted), an independent
+# implementation of the standard: name -> (stationary N) or (Nmax, N5), in sone
+MOSQITO_REF = {
+    "B.2 test signal 1, diffuse": 85.57,
+    "1 kHz 60 dB": 4.067,
+    "250 Hz 80 dB": 14.788,
+    "4 kHz 40 dB": 1.563,
+    "1 kHz 70 dB pulse 10 ms": (5.8288, None), # N5 depends on the silence around the pulse, not compared
+    "1 kHz 70 dB pulse 100 ms": (7.8384, 6.4948),
+    "1 kHz 70 dB, 100 % AM at 4 Hz": (9.4036, 9.3622),
+    "1 kHz 70 dB, 100 ms on / off": (8.1339, 7.4391),
+}
+
+# against the standard's reference values and the independent implementation: the core loudness and slopes of
+# the Annex B.2 levels within 1e-4 (they are table arithmetic, the same in every implementation), signals through
+# the filter bank within 1.5 % (the standard allows 5 %). Signals are 48 kHz, in Pa (cal = 93.98 dB)
+def selfcheck_iso_reference(fs: int = FS) -> bool:
+    cal = 20 * np.log10(1 / 2e-5)
+    def tone(f, spl, dur):
+        t = np.arange(int(dur * fs)) / fs
+        return np.sqrt(2) * 2e-5 * 10 ** (spl / 20) * np.sin(2 * np.pi * f * t)
+    def pulse(dur):
+        x = np.zeros(fs)
+        i0 = int(0.2 * fs)
+        x[i0:i0 + int(dur * fs)] = tone(1000, 70, dur)
+        return x
+    def report(name, got, want, rel):
+        good = abs(got / want - 1) <= rel
+        print(f"[selfcheck] {name}: {got:.4f} sone, reference {want:g} ({100 * (got / want - 1):+.2f} %)"
+              f"{'' if good else '  <-- FAILED'}")
+        return good
+
+    ok = True
+    for field, want, source in (("free", ISO_B2_N, "ISO 532-1"), ("diffuse", MOSQITO_REF["B.2 test signal 1, diffuse"], "MoSQITo")):
+        n, _ = specific_loudness(core_loudness(ISO_B2_LEVELS, field)[0])
+        ok &= report(f"Annex B.2 test signal 1, {field} field ({source})", float(n), want, 1e-4)
+    x = tone(1000, 60, 2.0)
+    ok &= report("1 kHz 60 dB (ISO 532-1 B.3)", loudness_stationary(x, fs, cal)["N"], ISO_B3_1K60_N, 0.05)
+    for name, x in (("1 kHz 60 dB", x), ("250 Hz 80 dB", tone(250, 80, 2.0)), ("4 kHz 40 dB", tone(4000, 40, 2.0))):
+        ok &= report(f"{name} (MoSQITo)", loudness_stationary(x, fs, cal)["N"], MOSQITO_REF[name], 0.015)
+    t = np.arange(2 * fs) / fs
+    varying = {"1 kHz 70 dB pulse 10 ms": pulse(0.010), "1 kHz 70 dB pulse 100 ms": pulse(0.100),
+               "1 kHz 70 dB, 100 % AM at 4 Hz": tone(1000, 70, 2.0) * (1 + np.sin(2 * np.pi * 4 * t)) / np.sqrt(1.5),
+               "1 kHz 70 dB, 100 ms on / off": np.concatenate([tone(1000, 70, 0.1) * (i % 2) for i in range(20)])}
+    for name, x in varying.items():
+        tv = loudness_time_varying(x, fs, cal)
+        nmax, n5 = MOSQITO_REF[name]
+        ok &= report(f"{name}, Nmax (MoSQITo)", tv["Nmax"], nmax, 0.015)
+        if n5 is not None:
+            ok &= report(f"{name}, N5 (MoSQITo)", tv["N5"], n5, 0.015)
+    return ok
+
+# the phon is defined on the 1 kHz tone, so a 1 kHz tone at 40 / 60 / 80 dB must read 40 / 60 / 80 phon
+# (1 / 4 / 16 sone) within 0.5 phon; the time-varying N5 of a steady sound (tones, pink noise) equals the
+# stationary N, a 10 ms burst reads below a 500 ms one (temporal integration), and 10 s at 48 kHz must take
+# well under a second
+def selfcheck_loudness(fs: int = FS) -> bool:
+    ok = selfcheck_iso_reference()
+    t = np.arange(int(2.0 * fs)) / fs
+    cal = 100.0 # dBFS -> dB SPL
+    def tone(spl, f=1000.0):
+        return np.sqrt(2) * 10 ** ((spl - cal) / 20) * np.sin(2 * np.pi * f * t)
+    rng = np.random.default_rng(4)
+    spec = np.fft.rfft(rng.normal(size=len(t)))
+    f = np.fft.rfftfreq(len(t), 1 / fs)
+    spec[1:] /= np.sqrt(f[1:])
+    spec[(f < 22.4) | (f > 14100)] = 0.0
+    pink = np.fft.irfft(spec, len(t))
+    pink *= 10 ** ((60.0 - cal) / 20) / np.sqrt(np.mean(pink ** 2)) # 60 dB over 22 Hz .. 14 kHz
+    cases = [("1 kHz 40 dB", tone(40.0), 40.0), ("1 kHz 60 dB", tone(60.0), 60.0), ("1 kHz 80 dB", tone(80.0), 80.0),
+             ("pink noise 60 dB", pink, None)]
+    for name, x, want in cases:
+        st = loudness_stationary(x, fs, cal, start_offset_ms=500)
+        tv = loudness_time_varying(x, fs, cal, start_offset_ms=500)
+        good = (want is None or abs(st["LN"] - want) < 0.5) and abs(tv["N5"] / st["N"] - 1) < 0.03
+        ok &= good
+        print(f"[selfcheck] {name}: N {st['N']:.3f} sone, LN {st['LN']:.1f} phon{'' if want is None else f' (want {want:g})'}; "
+              f"time-varying N5 {tv['N5']:.3f} sone{'' if good else '  <-- FAILED'}")
+    bursts = {}
+    for dur in (0.010, 0.500):
+        x = tone(70.0) * ((t >= 0.5) & (t < 0.5 + dur))
+        bursts[dur] = loudness_time_varying(x, fs, cal)["Nmax"]
+    good = bursts[0.010] < 0.8 * bursts[0.500]
+    ok &= good
+    print(f"[selfcheck] 1 kHz 70 dB burst: Nmax {bursts[0.010]:.2f} sone for 10 ms, {bursts[0.500]:.2f} sone for "
+          f"500 ms{'' if good else '  <-- FAILED'}")
+    x = np.concatenate([pink] * 5)
+    t0 = time.perf_counter()
+    m = loudness_metrics(x, fs, cal)
+    dt = time.perf_counter() - t0
+    good = dt < 1.0
+    ok &= good
+    print(f"[selfcheck] loudness of 10 s at {fs} Hz: {1e3 * dt:.0f} ms ({m['N_sone']:.2f} sone, N5 {m['N5_sone']:.2f})"
+          f"{'' if good else '  <-- FAILED'}")
+    print(f"[selfcheck] loudness {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+__all__ = [
+    "BAND_FC",
+    "BARK",
+    "third_octave_ms",
+    "third_octave_levels",
+    "core_loudness",
+    "specific_loudness",
+    "loudness_level",
+    "nonlinear_decay",
+    "temporal_weighting",
+    "loudness_stationary",
+    "loudness_time_varying",
+    "loudness_metrics",
+    "selfcheck_iso_reference",
+    "selfcheck_loudness",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="ISO 532-1 Zwicker loudness of a capture (default: self-check)")
+    p.add_argument("wav", nargs="?", help="Capture (WAV); the louder channel is analysed")
+    p.add_argument("--cal", type=float, default=94.0, help="dBFS -> dB SPL offset of the capture")
+    p.add_argument("--diffuse", action="store_true", help="Diffuse field instead of free field")
+    p.add_argument("--start-offset-ms", type=int, default=0)
+    p.add_argument("--window-sec", type=float, default=None)
+    args = p.parse_args()
+
+    if not args.wav:
+        selfcheck_loudness()
+    else:
+        from common_modules.Alignment import load_capture
+        x, fs = load_capture(args.wav)
+        field = "diffuse" if args.diffuse else "free"
+        st = loudness_stationary(x, fs, args.cal, field, args.start_offset_ms, args.window_sec)
+        tv = loudness_time_varying(x, fs, args.cal, field, args.start_offset_ms, args.window_sec)
+        print(f"N {st['N']:.2f} sone, LN {st['LN']:.1f} phon, Nmax {tv['Nmax']:.2f} sone, N5 {tv['N5']:.2f} sone "
+              f"({tv['LN5']:.1f} phon), {field} field{'' if st['valid'] else ', levels above the valid range'}")
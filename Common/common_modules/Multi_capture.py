@@ -0,0 +1,300 @@
+# Multi_capture.py — one playback, several microphones: synchronized capture on several input devices
+# Opens every device at once (one PortAudio stream each, all started before any is read), aligns the streams
+# and computes Audio.compute_metrics for every position in parallel, so driver and passenger (or any other
+# positions) are measured by the same playback instead of separate runs.
+#
+# Alignment:
+#   "timestamp"  trim each stream so that sample 0 is the same instant, from the ADC time of its first sample
+#                (PortAudio stream time). Exact when the devices share a clock (same host API), the default
+#   "xcorr"      estimate each stream's lag against the first device by FFT cross-correlation (for devices on
+#                different host APIs / unreliable timestamps). Aligns acoustic arrival, so the path difference
+#                between the positions (a few ms in a cabin) is absorbed too
+#   "none"       keep the streams as started
+# The devices are not resampled: they are expected to run at the same nominal rate, and clock drift over one
+# capture (tens of ppm, < 1 ms in 10 s) is far below the LAF time constant.
+# The pre-roll (cfg.pre_roll_ms) is discarded on every device as in Audio.record_raw, and cfg.loudness is
+# computed per device. Not supported on this path: capture health (cfg.max_xruns / max_jitter_ms /
+# health_retries) and archiving (cfg.archive_path), which stay with Audio.measure_once.
+#
+#   python -m common_modules.Multi_capture --devices UR22 "USB Audio" --dur 10
+#   python -m common_modules.Multi_capture                 # self-check on fake devices with known offsets
+from __future__ import annotations
+import argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from common_modules.Audio import (CaptureConfig, _pick_channel, compute_metrics, device_name_from_id,
+                                  find_input_device_id, load_calibration)
+
+ALIGN_METHODS = ("timestamp", "xcorr", "none")
+
+
+# ---------------- Sources ----------------
+class SoundDeviceInput():
+    # one input device as a callback stream. start() opens it; discard() drops what arrived so far (pre-roll);
+    # read(frames) waits for that many frames and returns them with the ADC time of the first one, or raises
+    # if the stream stalls; close() stops and closes it (also after a failure)
+    def __init__(self, device_id: Optional[int], cfg: CaptureConfig):
+        self.device_id = device_id
+        self.name = device_name_from_id(device_id)
+        self.cfg = cfg
+        self._blocks: List[np.ndarray] = []
+        self._frames = 0
+        self._needed = None
+        self._t0: Optional[float] = None
+        self._enough = threading.Event()
+        self._lock = threading.Lock()
+        self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        with self._lock:
+            if self._t0 is None:
+                self._t0 = float(time_info.inputBufferAdcTime)
+            self._blocks.append(indata.copy())
+            self._frames += frames
+            if self._needed is not None and self._frames >= self._needed:
+                self._enough.set()
+
+    def start(self):
+        import sounddevice as sd
+        channels = max(1, self.cfg.open_channels)
+        sd.check_input_settings(device=self.device_id, channels=channels, samplerate=self.cfg.samplerate)
+        self.stream = sd.InputStream(device=self.device_id, channels=channels, samplerate=self.cfg.samplerate,
+                                     dtype="float32", latency=self.cfg.latency, callback=self._callback)
+        try:
+            self.stream.start()
+        except Exception:
+            self.close()
+            raise
+
+    def discard(self):
+        with self._lock: # the next block sets _t0 again, so the timestamps stay those of the kept samples
+            self._blocks, self._frames, self._t0 = [], 0, None
+
+    def read(self, frames: int) -> Tuple[np.ndarray, float]:
+        with self._lock:
+            self._needed = frames
+            if self._frames >= frames:
+                self._enough.set()
+        self._enough.wait(timeout=frames / self.cfg.samplerate + 5.0)
+        self.close()
+        if self._t0 is None:
+            raise RuntimeError(f"{self.name}: no audio received")
+        if self._frames < frames:
+            raise RuntimeError(f"{self.name}: capture stalled: {self._frames}/{frames} frames received")
+        data = np.concatenate(self._blocks, axis=0)[:frames]
+        return data, self._t0
+
+    def close(self):
+        if self.stream is not None:
+            stream, self.stream = self.stream, None
+            try:
+                stream.stop()
+            finally:
+                stream.close()
+
+
+class FakeInputDevice():
+    # a device listening to `scene` (a signal on a common time axis at fs) that starts offset_s into it, at
+    # gain_db, with its own noise. clock_error_s is added to the timestamp it reports (a device on another
+    # clock), so "timestamp" alignment is exact only when it is 0 and "xcorr" has to recover it
+    def __init__(self, name: str, scene: np.ndarray, fs: int, offset_s: float, gain_db: float = 0.0,
+                 clock_error_s: float = 0.0, noise_rms: float = 1e-4, channels: int = 1, seed: int = 0):
+        self.name, self.device_id = name, None
+        self.scene, self.fs = scene, fs
+        self.offset_s, self.gain_db, self.clock_error_s = offset_s, gain_db, clock_error_s
+        self.noise_rms, self.channels = noise_rms, channels
+        self._rng = np.random.default_rng(seed)
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass # nothing is buffered before read()
+
+    def read(self, frames: int) -> Tuple[np.ndarray, float]:
+        i0 = int(round(self.offset_s * self.fs))
+        x = np.zeros(frames)
+        part = self.scene[i0:i0 + frames]
+        x[:len(part)] = part * 10 ** (self.gain_db / 20.0)
+        data = np.repeat(x[:, None], self.channels, axis=1) + self._rng.normal(0.0, self.noise_rms, (frames, self.channels))
+        return data.astype(np.float32), i0 / self.fs + self.clock_error_s
+
+
+# ---------------- Alignment ----------------
+# lag of x behind ref in samples (x[n + lag] ~ ref[n]), from the FFT cross-correlation within +-max_lag
+def estimate_lag(ref: np.ndarray, x: np.ndarray, max_lag: int) -> int:
+    from scipy.signal import correlate
+    ref = ref - ref.mean()
+    x = x - x.mean()
+    c = correlate(x, ref, mode="full", method="fft")
+    zero = len(ref) - 1
+    lo, hi = max(zero - max_lag, 0), min(zero + max_lag + 1, len(c))
+    return int(np.argmax(c[lo:hi]) + lo - zero)
+
+# start index into each stream so that all of them begin at the same instant (all >= 0)
+def align_starts(streams: Sequence[np.ndarray], t0s: Sequence[float], fs: int, method: str = "timestamp",
+                 max_lag: Optional[int] = None) -> List[int]:
+    if method not in ALIGN_METHODS:
+        raise ValueError(f"align must be one of {ALIGN_METHODS}, not {method!r}")
+    if method == "none":
+        return [0] * len(streams)
+    if method == "timestamp":
+        latest = max(t0s)
+        return [int(round((latest - t0) * fs)) for t0 in t0s]
+    max_lag = max_lag if max_lag is not None else int(0.5 * fs)
+    lags = [0] + [estimate_lag(streams[0], x, max_lag) for x in streams[1:]]
+    base = -min(lags)
+    return [lag + base for lag in lags]
+
+
+# ---------------- Capture ----------------
+@dataclass
+class DeviceCapture:
+    device_name: str
+    device_id: Optional[int]
+    raw: np.ndarray             # aligned capture, picked / averaged channel
+    start_s: float              # seconds trimmed from the start of this stream by the alignment
+    dbfs_to_dbspl: float
+    metrics: Optional[Dict[str, float]] = None
+
+
+def open_sources(cfg: CaptureConfig, device_hints: Sequence[str]) -> List[SoundDeviceInput]:
+    ids = []
+    for hint in device_hints:
+        dev_id = find_input_device_id(hint)
+        if dev_id is None:
+            raise RuntimeError(f"No input device matches {hint!r}")
+        if dev_id in ids:
+            raise RuntimeError(f"{hint!r} matches the same device as an earlier hint ({device_name_from_id(dev_id)})")
+        ids.append(dev_id)
+    return [SoundDeviceInput(dev_id, cfg) for dev_id in ids]
+
+# capture cfg.duration_s from every source, aligned. max_skew_s: most the streams may be apart (extra frames
+# are read so that the aligned captures still have the full duration)
+def record_multi(cfg: CaptureConfig, sources: Sequence, align: str = "timestamp",
+                 max_skew_s: float = 0.5) -> Tuple[List[np.ndarray], List[int]]:
+    import time
+    fs = cfg.samplerate
+    frames = int(cfg.duration_s * fs)
+    margin = int(max_skew_s * fs)
+    started = []
+    try:
+        for s in sources: # all running before any is read
+            s.start()
+            started.append(s)
+        if cfg.pre_roll_ms > 0:
+            time.sleep(cfg.pre_roll_ms / 1000.0)
+            for s in sources: # the pre-roll is discarded, as in Audio.record_raw
+                s.discard()
+        captured = [s.read(frames + margin) for s in sources]
+    finally:
+        for s in started: # a failed start or read must not leave the other devices open
+            s.close()
+    streams = [_pick_channel(data, auto=cfg.auto_channel, average=cfg.average_lr) for data, _ in captured]
+    starts = align_starts(streams, [t0 for _, t0 in captured], fs, align, max_lag=margin)
+    if max(starts) > margin:
+        raise RuntimeError(f"Streams are {max(starts) / fs:.3f} s apart, more than max_skew_s={max_skew_s}")
+    n = min(frames, min(len(x) - i for x, i in zip(streams, starts)))
+    return [x[i:i + n] for x, i in zip(streams, starts)], starts
+
+# one playback measured at every device: {"fs", "align", "devices": [DeviceCapture], "metrics": {name: metrics}}
+# no capture health checks, health retries or archiving here (see the header): a stalled device raises
+# dbfs_to_dbspl: per device offsets (default: each device's calibration, else cfg.dbfs_to_dbspl, else 94 dB)
+def measure_multi(cfg: CaptureConfig, device_hints: Sequence[str] = (), sources: Optional[Sequence] = None,
+                  align: str = "timestamp", max_skew_s: float = 0.5,
+                  dbfs_to_dbspl: Optional[Sequence[float]] = None) -> Dict[str, object]:
+    sources = list(sources) if sources is not None else open_sources(cfg, device_hints)
+    streams, starts = record_multi(cfg, sources, align=align, max_skew_s=max_skew_s)
+    captures = []
+    for k, (s, x, i) in enumerate(zip(sources, streams, starts)):
+        if dbfs_to_dbspl is not None:
+            offset = float(dbfs_to_dbspl[k])
+        else:
+            loaded = load_calibration(cfg, s.name)
+            offset = float(loaded) if loaded is not None else (cfg.dbfs_to_dbspl if cfg.dbfs_to_dbspl is not None else 94.0)
+        captures.append(DeviceCapture(s.name, s.device_id, x, i / cfg.samplerate, offset))
+
+    def metrics(c: DeviceCapture):
+        c.metrics = compute_metrics(c.raw, cfg.samplerate, c.dbfs_to_dbspl, start_offset_ms=cfg.start_offset_ms,
+                                    window_sec=cfg.window_sec, loudness=cfg.loudness)
+    with ThreadPoolExecutor(max_workers=len(captures)) as pool: # the filters release the GIL
+        list(pool.map(metrics, captures))
+    if cfg.debug:
+        for c in captures:
+            print(f"[debug] {c.device_name}: trimmed {c.start_s * 1e3:.1f} ms, offset {c.dbfs_to_dbspl:.2f} dB")
+    return {"fs": cfg.samplerate, "align": align, "devices": captures,
+            "metrics": {c.device_name: c.metrics for c in captures}}
+
+
+# ---------------- Self-check (fake devices) ----------------
+# a scene of noise bursts heard by three fake devices started at known offsets and gains: after alignment
+# every capture must start at the same scene sample and read the same level minus its gain
+def selfcheck_multi(fs: int = 48000, duration_s: float = 4.0) -> bool:
+    rng = np.random.default_rng(7)
+    n = int((duration_s + 2.0) * fs)
+    env = np.repeat(rng.uniform(0.05, 1.0, n // int(0.05 * fs) + 1), int(0.05 * fs))[:n]
+    scene = 0.05 * env * rng.normal(0.0, 1.0, n)
+    devices = [("driver", 0.000, 0.0), ("passenger", 0.137, -6.0), ("rear", 0.0421, -3.0)]
+    cfg = CaptureConfig(samplerate=fs, duration_s=duration_s, pre_roll_ms=0, open_channels=1)
+    ok = True
+    for align, clock_error in (("timestamp", 0.0), ("xcorr", 0.25)):
+        sources = [FakeInputDevice(name, scene, fs, offset, gain, clock_error_s=clock_error * k, seed=k)
+                   for k, (name, offset, gain) in enumerate(devices)]
+        res = measure_multi(cfg, sources=sources, align=align, dbfs_to_dbspl=[94.0] * len(devices))
+        caps = res["devices"]
+        ref = caps[0].metrics["LeqA"]
+        latest = max(offset for _, offset, _ in devices)
+        for (name, offset, gain), c in zip(devices, caps):
+            residual = estimate_lag(caps[0].raw, c.raw, int(0.1 * fs))
+            level_err = c.metrics["LeqA"] - gain - ref
+            good = residual == 0 and abs(c.start_s - (latest - offset)) < 1.0 / fs and abs(level_err) < 0.05 and len(c.raw) == int(duration_s * fs)
+            ok &= good
+            print(f"[selfcheck] {align:<9} {name:<10} offset {offset * 1e3:6.1f} ms, trimmed {c.start_s * 1e3:6.1f} ms, "
+                  f"residual lag {residual} samples, LeqA {c.metrics['LeqA']:.2f} dB (gain error {level_err:+.3f} dB)"
+                  f"{'' if good else '  <-- FAILED'}")
+    print(f"[selfcheck] multi-device capture {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+__all__ = [
+    "SoundDeviceInput",
+    "FakeInputDevice",
+    "DeviceCapture",
+    "estimate_lag",
+    "align_starts",
+    "open_sources",
+    "record_multi",
+    "measure_multi",
+    "selfcheck_multi",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Synchronized capture and metrics on several input devices")
+    p.add_argument("--devices", nargs="+", help="Device name hints, one per position (default: self-check)")
+    p.add_argument("--align", choices=ALIGN_METHODS, default="timestamp")
+    p.add_argument("--fs", type=int, default=48000)
+    p.add_argument("--open-ch", type=int, default=2, help="Channels to open per device")
+    p.add_argument("--dur", type=float, default=10.0, help="Capture length (s)")
+    p.add_argument("--start-offset-ms", type=int, default=0)
+    p.add_argument("--window-sec", type=float, default=None)
+    p.add_argument("--max-skew", type=float, default=0.5, help="Most the streams may be apart (s)")
+    p.add_argument("--debug", action="store_true")
+    args = p.parse_args()
+
+    if not args.devices:
+        selfcheck_multi()
+    else:
+        cfg = CaptureConfig(samplerate=args.fs, open_channels=args.open_ch, duration_s=args.dur,
+                            start_offset_ms=args.start_offset_ms, window_sec=args.window_sec, debug=args.debug)
+        res = measure_multi(cfg, args.devices, align=args.align, max_skew_s=args.max_skew)
+        for c in res["devices"]:
+            print(f"{c.device_name}: " + ", ".join(f"{k} {v:.2f} dB" for k, v in c.metrics.items()))
@@ -0,0 +1,222 @@
+# Plan_compiler.py — compile a test plan into a precomputed schedule of uTAS commands
+# The project loops used to format volume percentages / diag telegrams and resend every set_env on each
+# iteration. The compiler walks the plan once up front: the tone/voice bank switch (negative index rows) is
+# resolved, every percentage and telegram is formatted once, and a set_env whose env already holds that
+# value (e.g. index and volume on repeats 2..n of a sound) is dropped. The loop then only replays commands.
+#
+# order="grouped" also reorders the work to cut transitions: sounds are grouped by bank, then by index and
+# level, so consecutive measurements share as many env values as possible. Every cell keeps its config row,
+# so the report layout does not depend on the order the sounds were played in.
+#
+# Cells already measured (checkpoint.is_done) are left out at compile time, so dropping is decided on the
+# commands that are actually sent. Leaving out trailing cells of a row at run time is also safe: the sets
+# for a sound are always on its first sent cell.
+#
+#   python -m common_modules.Plan_compiler config.xlsx --project suzuki   # round trips saved for a config
+from __future__ import annotations
+import argparse
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+TOGGLE_MS = "200" # toggle_env pulse used for every panel button
+
+
+class SoundBank(NamedTuple):
+    # env names of one SoundTune bank (tones or voices)
+    index: str
+    volume: str
+    play: str
+    stop: str
+
+
+@dataclass
+class Command:
+    command: str
+    params: Tuple[str, ...] = ()
+
+    def send(self, UTAS):
+        return UTAS.send_command(self.command, list(self.params))
+
+
+@dataclass
+class Cell:
+    # one measurement: the commands before it (start the sound) and after it (stop the sound)
+    row: int
+    col: int
+    index: int
+    level: float
+    repeat: int = 1
+    volume: Optional[int] = None
+    sent_level: str = ""   # level as sent to the ECU (SoundTune percentage / diag telegram)
+    before: List[Command] = field(default_factory=list)
+    after: List[Command] = field(default_factory=list)
+    last_in_row: bool = False
+
+    def play(self, UTAS):
+        for c in self.before:
+            c.send(UTAS)
+
+    def stop(self, UTAS):
+        for c in self.after:
+            c.send(UTAS)
+
+
+@dataclass
+class Schedule:
+    cells: List[Cell] = field(default_factory=list)
+    naive: int = 0     # commands the per-iteration loop would have sent
+    dropped: int = 0   # redundant set_env left out
+
+    @property
+    def sent(self) -> int:
+        return self.naive - self.dropped
+
+    def _finish(self):
+        for i, cell in enumerate(self.cells):
+            cell.last_in_row = i == len(self.cells) - 1 or self.cells[i + 1].row != cell.row
+        return self
+
+    # set_rtt_ms: measured set_env round trip (e.g. UTAS.stats) to estimate the time saved
+    def report(self, set_rtt_ms: Optional[float] = None) -> str:
+        pct = 100.0 * self.dropped / self.naive if self.naive else 0.0
+        s = (f"Compiled schedule: {len(self.cells)} measurements, {self.sent} uTAS commands "
+             f"({self.dropped} redundant set_env dropped of {self.naive}, {pct:.1f}% fewer round trips)")
+        if set_rtt_ms is not None:
+            s += f", ~{self.dropped * set_rtt_ms / 1000.0:.1f} s saved"
+        return s
+
+
+class _EnvState():
+    # last value this schedule wrote to each env; set() says whether the command is needed
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+
+    def set(self, schedule: Schedule, out: List[Command], env: str, value: str):
+        schedule.naive += 1
+        if self.values.get(env) == value:
+            schedule.dropped += 1
+            return
+        self.values[env] = value
+        out.append(Command("set_env", (env, value)))
+
+
+# (row, index, level, bank) for every sound to measure. bank_switch: a negative index row switches to bank 1
+# for the rows after it (the row itself is not measured, its row number is kept)
+def resolve_Sound_Rows(sounds: Sequence[Tuple[int, float]], bank_switch: bool = True) -> List[Tuple[int, int, float, int]]:
+    bank, out = 0, []
+    for row, (index, level) in enumerate(sounds, start=1):
+        if bank_switch and index < 0:
+            bank = 1
+            continue
+        out.append((row, index, level, bank))
+    return out
+
+# order the work: "config" keeps the config order, "grouped" groups by bank, index and level
+def order_Sound_Rows(rows, order: str = "config"):
+    if order == "grouped":
+        return sorted(rows, key=lambda r: (r[3], r[1], r[2], r[0]))
+    if order != "config":
+        raise ValueError(f"Unknown order {order!r}, expected 'config' or 'grouped'")
+    return list(rows)
+
+
+# Suzuki: SoundTune panel, each sound repeated. banks: (tone bank, voice bank); a row with a negative index
+# switches to the voice bank for the rows after it (the row itself is not measured, its row number is kept)
+def compile_Sound_Tune_Schedule(sounds: Sequence[Tuple[int, float]], repeats: int, banks: Tuple[SoundBank, SoundBank],
+                                is_done: Optional[Callable] = None, order: str = "config") -> Schedule:
+    from common_modules.HelperFunc import to_Percentage_Of_255
+    schedule, state = Schedule(), _EnvState()
+    for row, index, level, bank_no in order_Sound_Rows(resolve_Sound_Rows(sounds), order):
+        bank = banks[bank_no]
+        index_str = str(index)
+        percent = to_Percentage_Of_255(value=level, as_str=True)
+        for col in range(1, repeats + 1):
+            if is_done is not None and is_done(row, index, level, col):
+                continue
+            cell = Cell(row=row, col=col, index=index, level=level, repeat=col, sent_level=percent)
+            state.set(schedule, cell.before, bank.index, index_str)
+            state.set(schedule, cell.before, bank.volume, percent)
+            cell.before.append(Command("toggle_env", (bank.play, TOGGLE_MS)))
+            cell.after.append(Command("toggle_env", (bank.stop, TOGGLE_MS)))
+            schedule.naive += 2
+            schedule.cells.append(cell)
+    return schedule._finish()
+
+
+# play telegram for a sound index at a volume (0-255), e.g. "31 01 fe 23 " + "c" + " " + "5a"
+def telegram_for(play_prefix: str, index: int, volume: int) -> str:
+    return f"{play_prefix}{index:x} {volume:x}"
+
+
+# one free diag telegram measurement with all four commands, e.g. for volumes chosen at run time (Volume_search)
+def make_Telegram_Cell(row: int, col: int, index: int, level: float, volume: int, play_prefix: str, stop_msg: str,
+                       data_env: str = "Diag_FreeDiagTelegram_Data", button_env: str = "Diag_FreeDiagTelegram_Btn") -> Cell:
+    cell = Cell(row=row, col=col, index=index, level=level, volume=volume, sent_level=telegram_for(play_prefix, index, volume))
+    cell.before += [Command("set_env", (data_env, cell.sent_level)), Command("toggle_env", (button_env, TOGGLE_MS))]
+    cell.after += [Command("set_env", (data_env, stop_msg)), Command("toggle_env", (button_env, TOGGLE_MS))]
+    return cell
+
+
+# Mitsubishi: free diag telegram per (sound, volume). One cell per volume step in col order.
+# The data env alternates play / stop telegrams, so nothing is dropped here; the telegrams are formatted once
+def compile_Telegram_Sweep_Schedule(sounds: Sequence[Tuple[int, float]], volumes: Sequence[int], play_prefix: str,
+                                    stop_msg: str, data_env: str = "Diag_FreeDiagTelegram_Data",
+                                    button_env: str = "Diag_FreeDiagTelegram_Btn",
+                                    is_done: Optional[Callable] = None, order: str = "config") -> Schedule:
+    schedule, state = Schedule(), _EnvState()
+    volume_hex = {v: f"{v:x}" for v in volumes}
+    for row, index, level, _ in order_Sound_Rows(resolve_Sound_Rows(sounds, bank_switch=False), order):
+        prefix = f"{play_prefix}{index:x} "
+        for col, volume in enumerate(volumes, start=1):
+            if is_done is not None and is_done(row, index, volume):
+                continue
+            cell = Cell(row=row, col=col, index=index, level=level, volume=volume, sent_level=prefix + volume_hex[volume])
+            state.set(schedule, cell.before, data_env, cell.sent_level)
+            cell.before.append(Command("toggle_env", (button_env, TOGGLE_MS)))
+            state.set(schedule, cell.after, data_env, stop_msg)
+            cell.after.append(Command("toggle_env", (button_env, TOGGLE_MS)))
+            schedule.naive += 2
+            schedule.cells.append(cell)
+    return schedule._finish()
+
+
+__all__ = [
+    "SoundBank",
+    "Command",
+    "Cell",
+    "Schedule",
+    "compile_Sound_Tune_Schedule",
+    "compile_Telegram_Sweep_Schedule",
+    "resolve_Sound_Rows",
+    "order_Sound_Rows",
+    "telegram_for",
+    "make_Telegram_Cell",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Compile a config into its uTAS command schedule and report round trips saved")
+    p.add_argument("config", nargs="?", help="config.xlsx (default: next to the executable)")
+    p.add_argument("--project", choices=["suzuki", "mitsubishi"], default="suzuki")
+    p.add_argument("--rtt-ms", type=float, default=None, help="set_env round trip in ms, to estimate time saved")
+    p.add_argument("--order", choices=["config", "grouped"], default="config", help="Order of the work")
+    p.add_argument("--dump", action="store_true", help="Print every scheduled command")
+    args = p.parse_args()
+
+    from common_modules.Test_plan import load_Test_Plan
+    if args.project == "suzuki":
+        plan = load_Test_Plan(args.config, level_range=(0, 255))
+        schedule = compile_Sound_Tune_Schedule(plan.sounds, plan.repeats, banks=(
+            SoundBank("SoundTune_SoundNo", "SoundTune_SoundVolume_new", "SoundTune_PlaySound", "SoundTune_StopSound"),
+            SoundBank("SoundTune_VoiceNo", "SoundTune_VoiceVolume_new", "SoundTune_PlayVoice", "SoundTune_StopVoice")),
+            order=args.order)
+    else:
+        plan = load_Test_Plan(args.config)
+        schedule = compile_Telegram_Sweep_Schedule(plan.sounds, list(range(10, 255, 10)), "31 01 fe 23 ", "31 02 fe 23",
+                                                   order=args.order)
+    if args.dump:
+        for cell in schedule.cells:
+            print(f"row {cell.row} col {cell.col}: " + "; ".join(f"{c.command} {' '.join(c.params)}" for c in cell.before)
+                  + " | measure | " + "; ".join(f"{c.command} {' '.join(c.params)}" for c in cell.after))
+    print(schedule.report(args.rtt_ms))
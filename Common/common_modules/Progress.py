@@ -0,0 +1,250 @@
+# Progress.py — live progress, throughput and ETA of a run, as a status file and an optional HTTP endpoint
+# The console banners scroll away during multi-hour runs. The runner keeps a ProgressTracker that is told
+# about every measurement and every finished sound, and rewrites <output>_status.json (at most every
+# every_s seconds, atomically) with: sounds done / total, measurements per hour (whole run and rolling),
+# rolling per-iteration and per-sound duration, ETA, error / retry counters and the last measured values.
+# An update is a few deque appends; the file write is throttled, so it is safe to call every iteration.
+#
+#   AA_STATUS=0 | <path>     no status file | status file somewhere else (default: next to the output)
+#   AA_STATUS_PORT=8765      also serve the status as JSON on http://127.0.0.1:8765/ (0 = any free port)
+#
+#   python -m common_modules.Progress Output_status.json --watch 5     # follow a run from another console
+#   python -m common_modules.Progress http://127.0.0.1:8765/
+from __future__ import annotations
+import argparse, json, os, threading, time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+STATUS_ENV_VAR = "AA_STATUS"
+STATUS_PORT_ENV_VAR = "AA_STATUS_PORT"
+
+
+def status_path_for(output_path_name):
+    return os.path.splitext(output_path_name)[0] + "_status.json"
+
+
+class ProgressTracker():
+    # total_sounds: sounds in the plan; to_do: sounds this run still has to measure (the rest were done
+    # before a resume), settable later with expect(). counters: {name: fn() -> int} read on every snapshot,
+    # e.g. uTAS errors or diag session re-inits. window: iterations / sounds in the rolling averages
+    def __init__(self, total_sounds: int, path=None, port: Optional[int] = None, every_s: float = 2.0,
+                 window: int = 20, last_n: int = 10, counters: Optional[Dict[str, Callable[[], int]]] = None,
+                 name: str = ""):
+        self.name, self.total_sounds, self.to_do = name, total_sounds, total_sounds
+        self.path, self.every_s = path, every_s
+        self.counters = dict(counters or {})
+        self.counts: Dict[str, int] = {}   # events counted by the runner itself (failures, retries, ...)
+        self.started = time.time()
+        self._t0 = self._last_mark = self._sound_mark = time.perf_counter()
+        self.measurements = 0
+        self.sounds_done = 0
+        self.iter_s = deque(maxlen=window)
+        self.sound_s = deque(maxlen=window)
+        self.last = deque(maxlen=last_n)
+        self.state = "running"
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        self.server = None
+        if port is not None:
+            self.serve(port)
+
+    # sounds this run has to measure (strategies know once the schedule is compiled)
+    def expect(self, to_do: int):
+        self.to_do = to_do
+
+    def measured(self, row, col, index, level, value, in_tolerance=None):
+        now = time.perf_counter()
+        with self._lock:
+            self.iter_s.append(now - self._last_mark)
+            self._last_mark = now
+            self.measurements += 1
+            self.last.append({"row": row, "col": col, "index": index, "level": level, "value": value,
+                              "in_tolerance": in_tolerance, "time": datetime.now().strftime("%H:%M:%S")})
+        self.maybe_write()
+
+    def sound_done(self, row=None):
+        now = time.perf_counter()
+        with self._lock:
+            self.sound_s.append(now - self._sound_mark)
+            self._sound_mark = now
+            self.sounds_done += 1
+        self.maybe_write()
+
+    def count(self, event: str, n: int = 1):
+        with self._lock:
+            self.counts[event] = self.counts.get(event, 0) + n
+
+    @staticmethod
+    def _mean(values):
+        return sum(values) / len(values) if values else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self._t0
+            iter_mean, sound_mean = self._mean(self.iter_s), self._mean(self.sound_s)
+            remaining = max(self.to_do - self.sounds_done, 0)
+            eta_s = remaining * sound_mean if sound_mean is not None else None
+            counts = dict(self.counts)
+            snap = {
+                "name": self.name,
+                "state": self.state,
+                "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "started": datetime.fromtimestamp(self.started).strftime("%Y-%m-%d %H:%M:%S"),
+                "elapsed_s": round(elapsed, 1),
+                "sounds": {"total": self.total_sounds, "done_before": self.total_sounds - self.to_do,
+                           "done": self.sounds_done, "remaining": remaining},
+                "measurements": self.measurements,
+                "measurements_per_hour": round(3600.0 * self.measurements / elapsed, 1) if elapsed > 0 else None,
+                "rolling_measurements_per_hour": round(3600.0 / iter_mean, 1) if iter_mean else None,
+                "rolling_iteration_s": round(iter_mean, 3) if iter_mean is not None else None,
+                "rolling_sound_s": round(sound_mean, 3) if sound_mean is not None else None,
+                "eta_s": round(eta_s) if eta_s is not None else None,
+                "eta": (datetime.now() + timedelta(seconds=eta_s)).strftime("%Y-%m-%d %H:%M:%S") if eta_s is not None else None,
+                "last": list(self.last),
+            }
+        for key, fn in self.counters.items():
+            try:
+                counts[key] = int(fn())
+            except Exception:
+                counts[key] = None
+        snap["counters"] = counts
+        return snap
+
+    def write(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=1, default=str)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass # status is best effort, never stop the run for it
+        self._last_write = time.monotonic()
+
+    def maybe_write(self):
+        if self.path and time.monotonic() - self._last_write >= self.every_s:
+            self.write()
+
+    # one line for the console after each sound
+    def line(self) -> str:
+        s = self.snapshot()
+        eta = f", ETA {timedelta(seconds=s['eta_s'])} ({s['eta']})" if s["eta_s"] is not None else ""
+        rate = f", {s['rolling_measurements_per_hour']:.0f} measurements/h" if s["rolling_measurements_per_hour"] else ""
+        return f"Progress: {s['sounds']['done']}/{s['sounds']['total'] - s['sounds']['done_before']} sounds{rate}{eta}"
+
+    # GET / (or /status) returns the snapshot as JSON; port 0 picks a free port (self.port)
+    def serve(self, port: int = 0, host: str = "127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/status"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(tracker.snapshot(), default=str).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): # keep the run console clean
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="status-http", daemon=True).start()
+        print(f"Status: http://{host}:{self.port}/")
+        return self.port
+
+    def close(self, state: str = "finished"):
+        self.state = state
+        self.write()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# tracker for a run writing next to output_path, configured from AA_STATUS / AA_STATUS_PORT
+def progress_For_Run(output_path, total_sounds: int, counters=None, name: str = "") -> ProgressTracker:
+    target = os.environ.get(STATUS_ENV_VAR, "").strip()
+    path = None if target == "0" else (target if target and target != "1" else status_path_for(output_path))
+    port = os.environ.get(STATUS_PORT_ENV_VAR, "").strip()
+    return ProgressTracker(total_sounds, path=path, port=int(port) if port else None, counters=counters, name=name)
+
+
+def read_Status(source) -> dict:
+    if str(source).startswith("http"):
+        from urllib.request import urlopen
+        with urlopen(source, timeout=5) as r:
+            return json.loads(r.read().decode("utf-8"))
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def format_Status(s: dict) -> str:
+    snd = s["sounds"]
+    lines = [f"{s['name'] or 'run'} [{s['state']}] updated {s['updated']}, started {s['started']}, elapsed {timedelta(seconds=int(s['elapsed_s']))}",
+             f"  sounds {snd['done']}/{snd['total'] - snd['done_before']} this run ({snd['done_before']} done before), "
+             f"{s['measurements']} measurements, {s['measurements_per_hour'] or 0:.0f}/h "
+             f"(rolling {s['rolling_measurements_per_hour'] or 0:.0f}/h, {s['rolling_iteration_s'] or 0:.2f} s per iteration)",
+             f"  ETA {s['eta'] or 'unknown'}" + (f" (in {timedelta(seconds=s['eta_s'])})" if s["eta_s"] is not None else ""),
+             "  counters: " + (", ".join(f"{k} {v}" for k, v in s["counters"].items()) or "none")]
+    for m in s["last"][-5:]:
+        flag = "" if m["in_tolerance"] is None else (" in tolerance" if m["in_tolerance"] else " out of tolerance")
+        lines.append(f"  {m['time']} row {m['row']} col {m['col']} index {m['index']}: {m['value']} dB (level {m['level']}){flag}")
+    return "\n".join(lines)
+
+
+# ---------------- Self-check ----------------
+# cost of one update, status file contents and the HTTP endpoint
+def selfcheck_progress(n: int = 2000) -> bool:
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(prefix="status_"), "Output_status.json")
+    tracker = ProgressTracker(total_sounds=n // 4, path=path, port=0, counters={"utas_errors": lambda: 0}, name="selfcheck")
+    t = time.perf_counter()
+    for i in range(n):
+        tracker.measured(i // 4 + 1, i % 4 + 1, i // 4, 128, 80.0 + (i % 7) * 0.1, in_tolerance=True)
+        if i % 4 == 3:
+            tracker.sound_done(i // 4 + 1)
+    per_update_us = (time.perf_counter() - t) / n * 1e6
+    tracker.count("retries", 2)
+    tracker.write()
+    from_file = read_Status(path)
+    from_http = read_Status(f"http://127.0.0.1:{tracker.port}/")
+    tracker.close()
+    ok = from_file["measurements"] == n and from_http["sounds"]["done"] == n // 4 and from_http["counters"]["retries"] == 2
+    print(format_Status(from_http))
+    print(f"[selfcheck] progress {'OK' if ok else 'FAILED'}: {per_update_us:.1f} us per update including throttled file writes")
+    return ok
+
+
+__all__ = [
+    "ProgressTracker",
+    "progress_For_Run",
+    "status_path_for",
+    "read_Status",
+    "format_Status",
+    "selfcheck_progress",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Show the status of a running campaign (default: self-check)")
+    p.add_argument("source", nargs="?", help="<output>_status.json or http://127.0.0.1:<port>/")
+    p.add_argument("--watch", type=float, default=None, metavar="S", help="Refresh every S seconds")
+    args = p.parse_args()
+    if not args.source:
+        selfcheck_progress()
+    else:
+        while True:
+            print(format_Status(read_Status(args.source)))
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
@@ -1,9 +1,9 @@
-from pywinauto import Application, Desktop
-import os, time, sys, winreg
-import pandas as pd
-import numpy as np
+import os, time, sys
 import tempfile, atexit, shutil
 
+# pywinauto, pandas and numpy are imported where they are first needed, so importing this module
+# (and starting the executable) stays cheap
+
 # variables for ARTA
 ARTA_config_file = r"audioconfig"
 arta_exe_loc = r"C:\Program Files (x86)\ArtaSoftware\Arta.exe"
@@ -41,6 +41,7 @@ def printMenuItems(menu_item, mainWindow, menuName, spacing):
 class RPA():
     # constructor, also initialises arta and sets it up for sound measurement
     def __init__(self):
+        from pywinauto import Application, Desktop
         arta_exe_loc = self.__find_arta_via_registry()
         assert os.path.exists(arta_exe_loc)  # check if executable exist, if not exit.
 
@@ -146,6 +147,7 @@ class RPA():
 
     # find the registry 
     def __find_arta_via_registry(self):
+        import winreg
         uninstall_subpath = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
         # Try both hives × both registry views
         combos = [
@@ -205,6 +207,8 @@ class RPA():
 
     # to extract peak measured dB in saved CSV file recorded
     def process_CSV(self, iter, Rec_duration):
+        import pandas as pd
+        import numpy as np
         # read from runtime temp folder (auto-cleaned at exit)
         CSV_loc = os.path.join(self.write_base, f"spl-{Rec_duration}s-log-{iter}.csv")
         CSV_path = os.path.normpath(CSV_loc)
@@ -231,6 +235,7 @@ class RPA():
 
     # To save CSV file from ARTA. Rec_duration is 0.1, 1, or 10 seconds accordingly
     def save_CSV(self, iter, Rec_duration):
+        from pywinauto import Desktop
         # write into runtime temp folder (auto-cleaned at exit)
         CSV_loc = os.path.join(self.write_base, f"spl-{Rec_duration}s-log-{iter}.csv")
         CSV_path = os.path.normpath(CSV_loc)
@@ -264,11 +269,13 @@ class RPA():
         save_dlg.type_keys("%S")  # Alt+S (Save)
         time.sleep(2)  # tune if UI is slow
 
-    # measure the sound for a duration then stop recording once the time has elapsed
-    def measure_Sound(self, Rec_duration):
+    # measure the sound for a duration then stop recording once the time has elapsed.
+    # abort: threading.Event that stops the recording early (the sound verification failed, it is retriggered)
+    def measure_Sound(self, Rec_duration, abort=None):
         self.IPL_subwin.child_window(title="Record/Reset", control_type="Button").wrapper_object().invoke()
-        if 0 < Rec_duration <= 1:
-            time.sleep(1)
+        wait_s = 1 if 0 < Rec_duration <= 1 else 12
+        if abort is not None:
+            abort.wait(wait_s)
         else:
-            time.sleep(12)
+            time.sleep(wait_s)
         self.IPL_subwin.child_window(title="Stop", control_type="Button").wrapper_object().invoke()
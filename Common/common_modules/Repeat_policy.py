@@ -0,0 +1,108 @@
+# Repeat_policy.py — sequential stopping rule for the repeats of one sound
+# Instead of always measuring a sound `repeats` times, keep measuring until its LAFmax readings agree:
+# stop once the range (max - min) or the half width of the confidence interval of the mean is under a
+# threshold, never before min_repeats and never after max_repeats. Stable sounds stop at min_repeats,
+# noisy ones get extra repeats, and decide() says why it stopped so the log shows it. max_repeats=None takes
+# the most repeats from the config's Repeats column (Runner.Repeats resolves it with for_repeats).
+#
+#   python -m common_modules.Repeat_policy     # repeats used on simulated stable vs noisy sounds
+from __future__ import annotations
+import math
+from dataclasses import dataclass, replace
+from typing import Optional, Sequence, Tuple
+
+
+@dataclass
+class RepeatPolicy:
+    min_repeats: int = 2
+    max_repeats: Optional[int] = None         # None: the config's Repeats
+    max_range_db: Optional[float] = 0.5       # stop when max - min of the readings is at most this
+    max_ci_half_db: Optional[float] = None    # stop when the CI of the mean is at most +-this
+    confidence: float = 0.95
+
+    def __post_init__(self):
+        if self.min_repeats < 1 or (self.max_repeats is not None and self.min_repeats > self.max_repeats):
+            raise ValueError(f"RepeatPolicy: need 1 <= min_repeats ({self.min_repeats}) <= max_repeats ({self.max_repeats})")
+
+    # this policy with max_repeats taken from the config's Repeats when it does not set one
+    def for_repeats(self, repeats: int) -> "RepeatPolicy":
+        if self.max_repeats is not None:
+            return self
+        return replace(self, min_repeats=min(self.min_repeats, repeats), max_repeats=repeats)
+
+    # half width of the t confidence interval of the mean (inf below 2 readings)
+    def ci_half_width(self, values: Sequence[float]) -> float:
+        n = len(values)
+        if n < 2:
+            return math.inf
+        from scipy.stats import t
+        mean = sum(values) / n
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+        return float(t.ppf(0.5 + self.confidence / 2.0, n - 1)) * std / math.sqrt(n)
+
+    # (stop, reason) for the readings so far of one sound
+    def decide(self, values: Sequence[float]) -> Tuple[bool, str]:
+        if self.max_repeats is None:
+            raise ValueError("RepeatPolicy: max_repeats is unresolved, use for_repeats(<config repeats>) first")
+        values = [float(v) for v in values if v is not None and not math.isnan(v)]
+        n = len(values)
+        if n < self.min_repeats:
+            return False, f"{n}/{self.min_repeats} minimum repeats"
+        spread = max(values) - min(values)
+        half = self.ci_half_width(values) if self.max_ci_half_db is not None else None
+        if self.max_range_db is not None and spread <= self.max_range_db:
+            return True, f"stable after {n} repeats: range {spread:.2f} dB <= {self.max_range_db} dB"
+        if half is not None and half <= self.max_ci_half_db:
+            return True, f"stable after {n} repeats: {self.confidence:.0%} CI +-{half:.2f} dB <= {self.max_ci_half_db} dB"
+        ci = f", CI +-{half:.2f} dB" if half is not None else ""
+        if n >= self.max_repeats:
+            return True, f"max {self.max_repeats} repeats reached, still noisy: range {spread:.2f} dB{ci}"
+        return False, f"noisy after {n} repeats: range {spread:.2f} dB{ci}"
+
+    def satisfied(self, values: Sequence[float]) -> bool:
+        return self.decide(values)[0]
+
+
+# ---------------- Self-check ----------------
+# simulated sounds with different reading noise, against a config asking for `repeats` per sound: stable ones
+# must stop at min_repeats (the campaign time saved), noisy ones must get more repeats than stable ones, and
+# nothing may exceed the config's repeats. An unresolved policy must refuse to decide
+def selfcheck_repeats(seed: int = 0, repeats: int = 5) -> bool:
+    import random
+    rng = random.Random(seed)
+    policy = RepeatPolicy(min_repeats=2, max_range_db=0.5, max_ci_half_db=0.4).for_repeats(repeats)
+    ok, used = True, {}
+    for noise in (0.02, 0.05, 0.5, 1.0):
+        counts = []
+        for _ in range(50):
+            values, stop, reason = [], False, ""
+            while not stop:
+                values.append(80.0 + rng.gauss(0.0, noise))
+                stop, reason = policy.decide(values)
+            counts.append(len(values))
+        used[noise] = sum(counts) / len(counts)
+        ok &= max(counts) <= repeats
+        print(f"[selfcheck] reading noise {noise:.2f} dB: {used[noise]:.1f} repeats on average (last: {reason})")
+    ok &= used[0.02] == policy.min_repeats and used[1.0] > used[0.05]
+    for kind, noises in (("stable", (0.02, 0.05)), ("noisy", (0.5, 1.0))):
+        n = sum(used[v] for v in noises) * 50
+        fixed = len(noises) * 50 * repeats
+        print(f"[selfcheck] {kind} sounds: {n:.0f} measurements vs {fixed} at the config's {repeats} repeats "
+              f"({100 * (1 - n / fixed):.0f}% saved)")
+    try:
+        RepeatPolicy().decide([80.0, 81.1])
+        ok = False
+    except ValueError:
+        pass
+    print(f"[selfcheck] adaptive repeats {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+__all__ = [
+    "RepeatPolicy",
+    "selfcheck_repeats",
+]
+
+
+if __name__ == "__main__":
+    selfcheck_repeats()
@@ -0,0 +1,234 @@
+# Results_db.py — local SQLite database of runs and measurements, for comparing sounds across runs
+# Every run (simulation .cfg, config fingerprint, device, bench, calibration offset, timestamps) and every
+# measurement (index, level, volume, repeat, value and any extra metrics) goes into one results.db, so the
+# level of a sound across software builds, benches or weeks is a single indexed query instead of dozens of
+# Output.xlsx files. The database lives next to the executable (or Common/ when run as a script), or
+# wherever AA_RESULTS_DB points.
+#
+#   python -m common_modules.Results_db runs                 # latest runs
+#   python -m common_modules.Results_db sound 12 --level 200 # sound index 12 across runs
+#   python -m common_modules.Results_db --bench 1000000      # insert / query timing at 1M measurements
+from __future__ import annotations
+import argparse, os, platform, sqlite3, sys, time
+from typing import Dict, Iterable, List
+
+RESULTS_DB_ENV = "AA_RESULTS_DB"
+PRIMARY_METRIC = "LAFmax" # the value the projects record per measurement (ARTA LAFmax)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,       -- stable across resumes of the same campaign
+    project TEXT,
+    simulation TEXT,
+    fingerprint TEXT,
+    config_hash TEXT,
+    device TEXT,
+    bench TEXT,
+    calibration_offset REAL,
+    output TEXT,
+    started REAL NOT NULL,
+    finished REAL,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS runs_fingerprint ON runs(fingerprint);
+
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    sound_index INTEGER,
+    level REAL,
+    volume REAL,
+    repeat INTEGER,
+    time REAL,
+    value REAL,
+    bench TEXT                          -- bench that measured it, for runs split across benches
+);
+CREATE INDEX IF NOT EXISTS measurements_sound ON measurements(sound_index, level, run_id);
+CREATE INDEX IF NOT EXISTS measurements_run ON measurements(run_id, row, col);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    measurement_id INTEGER NOT NULL REFERENCES measurements(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (measurement_id, name)
+) WITHOUT ROWID;
+"""
+
+
+# results.db next to the executable (frozen) or in Common/ (script), like config.xlsx
+def default_Results_Db_Path():
+    env = os.environ.get(RESULTS_DB_ENV)
+    if env:
+        return env
+    if getattr(sys, 'frozen', False):
+        base = os.path.dirname(sys.executable) # running as EXE
+    else:
+        base = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)) # running as script
+    return os.path.join(base, "results.db")
+
+
+class ResultsDB():
+    def __init__(self, path=None):
+        self.path = path or default_Results_Db_Path()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")   # readers (trend queries) do not block a running campaign
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        if "bench" not in [c[1] for c in self.conn.execute("PRAGMA table_info(measurements)")]:
+            self.conn.execute("ALTER TABLE measurements ADD COLUMN bench TEXT") # databases created before distributed runs
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # create the run (or return the existing one for run_key, e.g. when a campaign is resumed)
+    def start_run(self, run_key, project=None, simulation=None, fingerprint=None, config_hash=None, device=None,
+                  bench=None, calibration_offset=None, output=None, started=None) -> int:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_key, project, simulation, fingerprint, config_hash, device, bench,"
+                " calibration_offset, output, started) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (run_key, project, simulation, fingerprint, config_hash, device, bench or platform.node(),
+                 calibration_offset, output, started or time.time()))
+        return self.conn.execute("SELECT id FROM runs WHERE run_key = ?", (run_key,)).fetchone()[0]
+
+    def finish_run(self, run_id, complete=True):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished = ?, complete = ? WHERE id = ?",
+                              (time.time(), 1 if complete else 0, run_id))
+
+    # Bulk insert measurements in one transaction. records: dicts with row, col, index, level, volume, repeat,
+    # time, value (the journal record layout) and optionally "metrics" {name: value} for extra metrics.
+    # replace=True drops the run's previous measurements first (re-storing a resumed campaign from its journal)
+    def insert_measurements(self, run_id, records: Iterable[Dict[str, object]], replace=False) -> int:
+        rows, metric_rows = [], []
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM measurements WHERE run_id = ?", (run_id,))
+            next_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM measurements").fetchone()[0]
+            for rec in records:
+                mid = next_id + len(rows)
+                rows.append((mid, run_id, rec["row"], rec["col"], rec.get("index"), rec.get("level"),
+                             rec.get("volume"), rec.get("repeat"), rec.get("time"), rec.get("value"), rec.get("bench")))
+                for name, value in (rec.get("metrics") or {}).items():
+                    metric_rows.append((mid, name, None if value is None else float(value)))
+            self.conn.executemany("INSERT INTO measurements (id, run_id, row, col, sound_index, level, volume,"
+                                  " repeat, time, value, bench) VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+            if metric_rows:
+                self.conn.executemany("INSERT OR REPLACE INTO metrics (measurement_id, name, value) VALUES (?,?,?)",
+                                      metric_rows)
+        return len(rows)
+
+    def runs(self, limit=20, project=None) -> List[sqlite3.Row]:
+        sql = "SELECT r.*, (SELECT COUNT(*) FROM measurements m WHERE m.run_id = r.id) AS n FROM runs r"
+        args = []
+        if project:
+            sql += " WHERE r.project = ?"
+            args.append(project)
+        sql += " ORDER BY r.started DESC LIMIT ?"
+        return self.conn.execute(sql, args + [limit]).fetchall()
+
+    def _sound_query(self, select, index, level, metric, project, since, group_by=""):
+        value = "m.value" if metric == PRIMARY_METRIC else "x.value"
+        join = "" if metric == PRIMARY_METRIC else " JOIN metrics x ON x.measurement_id = m.id AND x.name = ?"
+        sql = f"SELECT {select.format(value=value)} FROM measurements m{join} JOIN runs r ON r.id = m.run_id" \
+              " WHERE m.sound_index = ?"
+        args = ([] if metric == PRIMARY_METRIC else [metric]) + [index]
+        if level is not None:
+            sql += " AND m.level = ?"
+            args.append(level)
+        if project:
+            sql += " AND r.project = ?"
+            args.append(project)
+        if since is not None:
+            sql += " AND r.started >= ?"
+            args.append(since)
+        return self.conn.execute(sql + group_by + " ORDER BY r.started, m.row, m.col", args).fetchall()
+
+    # every measurement of one sound across runs (oldest run first)
+    def sound_history(self, index, level=None, metric=PRIMARY_METRIC, project=None, since=None) -> List[sqlite3.Row]:
+        return self._sound_query("r.id AS run_id, r.started, r.simulation, r.device, COALESCE(m.bench, r.bench) AS bench,"
+                                 " m.level, m.volume, m.repeat, {value} AS value", index, level, metric, project, since)
+
+    # one line per run for a sound: count, mean, min and max of the metric
+    def sound_trend(self, index, level=None, metric=PRIMARY_METRIC, project=None, since=None) -> List[sqlite3.Row]:
+        return self._sound_query("r.id AS run_id, r.started, r.simulation, r.device, r.bench, m.level,"
+                                 " COUNT({value}) AS n, AVG({value}) AS mean, MIN({value}) AS min, MAX({value}) AS max",
+                                 index, level, metric, project, since, group_by=" GROUP BY r.id, m.level")
+
+
+# ---------------- Benchmark ----------------
+# bulk insert n measurements spread over runs, then time a per-sound query across all of them
+def benchmark(n=1_000_000, path=None, sounds=500, repeats=3):
+    import tempfile
+    path = path or os.path.join(tempfile.mkdtemp(prefix="resultsdb_bench_"), "results.db")
+    per_run = sounds * repeats
+    with ResultsDB(path) as db:
+        t = time.perf_counter()
+        done = 0
+        while done < n:
+            run_id = db.start_run(f"bench-{done}", project="bench", simulation="bench.cfg", started=time.time() + done)
+            count = min(per_run, n - done)
+            db.insert_measurements(run_id, ({"row": i // repeats + 1, "col": i % repeats + 1, "index": i // repeats,
+                                             "level": 128, "repeat": i % repeats + 1, "time": 0.0,
+                                             "value": 80.0 + (i % 7) * 0.1} for i in range(count)))
+            done += count
+        insert_s = time.perf_counter() - t
+        t = time.perf_counter()
+        trend = db.sound_trend(sounds // 2, level=128)
+        query_s = time.perf_counter() - t
+    return insert_s, query_s, len(trend)
+
+
+__all__ = [
+    "ResultsDB",
+    "default_Results_Db_Path",
+    "PRIMARY_METRIC",
+    "benchmark",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Query the results database, or benchmark it")
+    p.add_argument("what", nargs="?", choices=["runs", "sound"], help="List runs, or one sound across runs")
+    p.add_argument("index", nargs="?", type=int, help="Sound index (for 'sound')")
+    p.add_argument("--level", type=float, default=None)
+    p.add_argument("--metric", default=PRIMARY_METRIC)
+    p.add_argument("--project", default=None)
+    p.add_argument("--all", action="store_true", help="Every measurement instead of one line per run")
+    p.add_argument("--db", default=None, help=f"Database (default: {default_Results_Db_Path()})")
+    p.add_argument("--bench", type=int, metavar="N", help="Insert N measurements into a temp db and time a sound query")
+    args = p.parse_args()
+
+    if args.bench:
+        insert_s, query_s, n_runs = benchmark(args.bench)
+        print(f"{args.bench} measurements inserted in {insert_s:.2f} s ({args.bench / insert_s:,.0f}/s); "
+              f"one sound across {n_runs} runs in {query_s * 1e3:.1f} ms")
+    elif args.what == "runs":
+        with ResultsDB(args.db) as db:
+            for r in db.runs(project=args.project):
+                print(f"{r['id']:>5} {time.strftime('%Y-%m-%d %H:%M', time.localtime(r['started']))} "
+                      f"{r['project'] or '':<10} {r['n']:>6} {'done' if r['complete'] else 'partial':<8} {r['simulation']}")
+    elif args.what == "sound" and args.index is not None:
+        with ResultsDB(args.db) as db:
+            if args.all:
+                for r in db.sound_history(args.index, args.level, args.metric, args.project):
+                    print(f"run {r['run_id']:>5}  level {r['level']}  repeat {r['repeat']}  {r['value']:.2f}")
+            else:
+                for r in db.sound_trend(args.index, args.level, args.metric, args.project):
+                    print(f"run {r['run_id']:>5} {time.strftime('%Y-%m-%d %H:%M', time.localtime(r['started']))} "
+                          f"level {r['level']}  n={r['n']}  mean {r['mean']:.2f}  min {r['min']:.2f}  max {r['max']:.2f}")
+    else:
+        p.print_help()
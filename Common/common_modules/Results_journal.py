@@ -0,0 +1,230 @@
+# Results_journal.py — append-only results journal and Excel report rebuilt from it
+# Every measurement is appended (and fsync'ed) to a CSV journal next to the output workbook as soon as
+# it is taken, which costs the same at row 1 and row 5000. The Excel report in the usual File_IO layout
+# (value per cell, averages after the repeats, bolded in-tolerance cells, plus a Summary sheet) is rebuilt from the journal
+# only at checkpoints and at the end of the run, instead of re-saving the whole workbook per cell.
+#
+# Rebuild a report by hand, e.g. after a crash:
+#   python -m common_modules.Results_journal Output_journal.csv Output.xlsx --repeats 3
+# Benchmark per-measurement write cost as the campaign grows:
+#   python -m common_modules.Results_journal --bench
+from __future__ import annotations
+import argparse, csv, os, time
+from typing import Dict, List
+
+from common_modules.Timeline import timeline
+
+JOURNAL_FIELDS = ["time", "row", "col", "index", "level", "volume", "repeat", "value", "bold", "bench"]
+
+
+# journal file used for an output workbook, e.g. Output.xlsx -> Output_journal.csv
+def journal_path_for(output_path_name):
+    return os.path.splitext(output_path_name)[0] + "_journal.csv"
+
+
+class ResultsJournal():
+    # fresh=True starts a new journal (an old one is kept as <name>.<timestamp>.bak)
+    def __init__(self, path, fresh=True, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        if fresh and os.path.exists(path) and os.path.getsize(path) > 0:
+            os.replace(path, f"{path}.{time.strftime('%Y%m%d-%H%M%S')}.bak")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.fields = JOURNAL_FIELDS
+        if not new_file:
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                self.fields = next(csv.reader(f), JOURNAL_FIELDS) # keep appending in the layout the journal was started with
+        self._f = open(path, "a", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        if new_file:
+            self._w.writerow(JOURNAL_FIELDS)
+            self._flush()
+
+    def _flush(self):
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    # record one measurement durably; row/col are the cell it belongs to in the Excel report.
+    # bench: which test bench measured it (distributed runs, see Coordinator)
+    def append(self, row, col, value, index=None, level=None, volume=None, repeat=None, bold=False, bench=None):
+        rec = {"time": f"{time.time():.3f}", "row": row, "col": col,
+               "index": "" if index is None else index,
+               "level": "" if level is None else level,
+               "volume": "" if volume is None else volume,
+               "repeat": "" if repeat is None else repeat,
+               "value": repr(float(value)) if value is not None else "",
+               "bold": 1 if bold else 0,
+               "bench": bench or ""}
+        self._w.writerow([rec.get(f, "") for f in self.fields])
+        self._flush()
+
+    def records(self) -> List[Dict[str, object]]:
+        self._f.flush()
+        return read_journal(self.path)
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _num(s):
+    if s is None or s == "":
+        return None
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+# read a journal back; a torn last line (crash mid-write) is ignored
+def read_journal(path) -> List[Dict[str, object]]:
+    out = []
+    if not os.path.exists(path):
+        return out
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for rec in csv.DictReader(f):
+            try:
+                out.append({
+                    "time": float(rec["time"]),
+                    "row": int(rec["row"]),
+                    "col": int(rec["col"]),
+                    "index": _num(rec["index"]),
+                    "level": _num(rec["level"]),
+                    "volume": _num(rec["volume"]),
+                    "repeat": _num(rec["repeat"]),
+                    "value": float(rec["value"]) if rec["value"] else None,
+                    "bold": rec["bold"] == "1",
+                    "bench": rec.get("bench") or None,
+                })
+            except (KeyError, TypeError, ValueError):
+                continue
+    return out
+
+
+# write journal records into a workbook in the File_IO layout, via a ResultsMatrix so averages, statistics
+# and tolerance flags are computed for all rows at once.
+# average_repeats: if set, write the mean of each complete row after its repeats (Suzuki layout)
+# min_repeats: a row counts as complete with this many repeats (adaptive repeats); default average_repeats
+# tolerance: if set, bold cells within +-tolerance of their row's level (Mitsubishi target dB)
+def write_Journal_Into_Workbook(wb, records, average_repeats=None, tolerance=None, min_repeats=None):
+    from common_modules.Results_matrix import ResultsMatrix, write_Matrix_Into_Workbook
+    return write_Matrix_Into_Workbook(wb, ResultsMatrix.from_records(records), average_repeats=average_repeats,
+                                      tolerance=tolerance, min_repeats=min_repeats)
+
+# (re)build the output workbook from the journal and save it
+def build_Output_Excel_From_Journal(journal_path, output_path, test_name=None, average_repeats=None, tolerance=None, min_repeats=None):
+    from common_modules.File_IO import open_Output_Excel
+    wb = open_Output_Excel(path=output_path, test_name=test_name)
+    write_Journal_Into_Workbook(wb, read_journal(journal_path), average_repeats=average_repeats, tolerance=tolerance, min_repeats=min_repeats)
+    wb.save(output_path)
+    return wb
+
+
+class ReportCheckpointer():
+    # Rebuilds the Excel report from the journal at most every every_s seconds (and always on finish()).
+    # The journal already holds every result durably, so the report only has to be "recent enough".
+    def __init__(self, journal: ResultsJournal, output_path, test_name=None, average_repeats=None, every_s=300.0, tolerance=None, min_repeats=None):
+        self.journal = journal
+        self.output_path = output_path
+        self.test_name = test_name
+        self.average_repeats = average_repeats
+        self.tolerance = tolerance
+        self.min_repeats = min_repeats
+        self.every_s = every_s
+        self._last = time.monotonic()
+
+    def save(self):
+        with timeline.span("report save"):
+            self._build()
+        self._last = time.monotonic()
+
+    def _build(self):
+        build_Output_Excel_From_Journal(self.journal.path, self.output_path, self.test_name, self.average_repeats, self.tolerance, self.min_repeats)
+
+    def maybe_save(self):
+        if time.monotonic() - self._last >= self.every_s:
+            self.save()
+            return True
+        return False
+
+    def finish(self):
+        self.save()
+        self.journal.close()
+
+
+# ---------------- Benchmark ----------------
+# per-measurement write cost for the old "write cell + save workbook" pattern vs a journal append,
+# sampled at increasing campaign sizes
+def benchmark(sizes=(50, 200, 500, 1000, 2000), repeats=3, workdir=None):
+    import tempfile
+    from openpyxl import Workbook
+    from common_modules.File_IO import write_Into_Cell
+
+    workdir = workdir or tempfile.mkdtemp(prefix="journal_bench_")
+    xlsx = os.path.join(workdir, "bench.xlsx")
+    jpath = os.path.join(workdir, "bench_journal.csv")
+    results = []
+    wb = Workbook()
+    journal = ResultsJournal(jpath, fresh=True)
+    n = 0
+    for size in sizes:
+        # fill the workbook up to size rows without timing
+        while n < size * repeats:
+            row, col = n // repeats + 1, n % repeats + 1
+            write_Into_Cell(wb, row=row, col=col, data=90.0 + (n % 7))
+            journal.append(row=row, col=col, value=90.0 + (n % 7), index=row, level=128, repeat=col)
+            n += 1
+        t = time.perf_counter()
+        write_Into_Cell(wb, row=size + 1, col=1, data=91.0)
+        wb.save(xlsx)
+        xlsx_ms = (time.perf_counter() - t) * 1e3
+        t = time.perf_counter()
+        journal.append(row=size + 1, col=1, value=91.0, index=size + 1, level=128, repeat=1)
+        journal_ms = (time.perf_counter() - t) * 1e3
+        results.append((size, xlsx_ms, journal_ms))
+    journal.close()
+    t = time.perf_counter()
+    build_Output_Excel_From_Journal(jpath, os.path.join(workdir, "rebuilt.xlsx"), average_repeats=repeats)
+    rebuild_ms = (time.perf_counter() - t) * 1e3
+    return results, rebuild_ms
+
+
+__all__ = [
+    "ResultsJournal",
+    "ReportCheckpointer",
+    "journal_path_for",
+    "read_journal",
+    "write_Journal_Into_Workbook",
+    "build_Output_Excel_From_Journal",
+    "benchmark",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Rebuild an output workbook from a results journal, or benchmark write cost")
+    p.add_argument("journal", nargs="?", help="Journal CSV (e.g. Output_journal.csv)")
+    p.add_argument("output", nargs="?", help="Workbook to (re)build (e.g. Output.xlsx)")
+    p.add_argument("--repeats", type=int, default=None, help="Write row averages after this many repeats (Suzuki layout)")
+    p.add_argument("--tolerance", type=float, default=None, help="Bold cells within +-tolerance dB of the row level (Mitsubishi layout)")
+    p.add_argument("--test-name", default=None, help="Value for cell A1 if empty")
+    p.add_argument("--bench", action="store_true", help="Benchmark per-measurement write cost vs rows")
+    args = p.parse_args()
+
+    if args.bench:
+        res, rebuild_ms = benchmark()
+        print(f"{'rows':>6}{'xlsx save ms':>15}{'journal ms':>13}")
+        for size, xlsx_ms, journal_ms in res:
+            print(f"{size:>6}{xlsx_ms:>15.1f}{journal_ms:>13.3f}")
+        print(f"Full report rebuild at the last size: {rebuild_ms:.1f} ms")
+    elif args.journal and args.output:
+        build_Output_Excel_From_Journal(args.journal, args.output, args.test_name, args.repeats, args.tolerance)
+        print(f"Rebuilt {args.output} from {args.journal}")
+    else:
+        p.print_help()
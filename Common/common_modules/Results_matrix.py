@@ -0,0 +1,175 @@
+# Results_matrix.py — in-memory results matrix with vectorized per-sound summary statistics
+# Rows are report rows (sounds), columns are repeats (Suzuki) or volume steps (Mitsubishi), both 1-based
+# like the Excel layout. Missing cells are NaN so every statistic is one NumPy call over the whole matrix.
+from __future__ import annotations
+from typing import Dict, Optional
+
+import numpy as np
+
+SUMMARY_SHEET = "Summary"
+SUMMARY_HEADER = ["Row", "Index", "Level", "N", "Mean", "Std", "Min", "Max", "Range", "CI low", "CI high",
+                  "In tolerance", "Closest col", "Closest value"]
+
+
+class ResultsMatrix():
+    def __init__(self, n_rows: int = 16, n_cols: int = 4):
+        self.values = np.full((max(n_rows, 1), max(n_cols, 1)), np.nan)
+        self.index = np.full(self.values.shape[0], np.nan)    # sound index per row
+        self.level = np.full(self.values.shape[0], np.nan)    # config level per row (target dB for Mitsubishi)
+        self.n_rows = 0   # highest row used
+        self.n_cols = 0   # highest col used
+
+    def _grow(self, row: int, col: int):
+        r, c = self.values.shape
+        if row <= r and col <= c:
+            return
+        nr, nc = max(r, row * 2 if row > r else r), max(c, col * 2 if col > c else c)
+        values = np.full((nr, nc), np.nan)
+        values[:r, :c] = self.values
+        self.values = values
+        for name in ("index", "level"):
+            old = getattr(self, name)
+            new = np.full(nr, np.nan)
+            new[:r] = old
+            setattr(self, name, new)
+
+    def set(self, row: int, col: int, value, index=None, level=None):
+        self._grow(row, col)
+        self.values[row - 1, col - 1] = np.nan if value is None else float(value)
+        if index is not None:
+            self.index[row - 1] = float(index)
+        if level is not None:
+            self.level[row - 1] = float(level)
+        self.n_rows = max(self.n_rows, row)
+        self.n_cols = max(self.n_cols, col)
+
+    @classmethod
+    def from_records(cls, records) -> "ResultsMatrix":
+        records = list(records)
+        m = cls(max((r["row"] for r in records), default=1), max((r["col"] for r in records), default=1))
+        for r in records:
+            m.set(r["row"], r["col"], r["value"], r.get("index"), r.get("level"))
+        return m
+
+    @property
+    def used(self) -> np.ndarray:
+        return self.values[:self.n_rows, :self.n_cols]
+
+    # per-row statistics over the first n_cols columns (all used columns if None); rows with no data are NaN
+    def summary(self, n_cols: Optional[int] = None, confidence: float = 0.95) -> Dict[str, np.ndarray]:
+        v = self.values[:self.n_rows, :max(n_cols or self.n_cols, 1)] # at least one (NaN) column, e.g. nothing measured yet
+        n = np.sum(~np.isnan(v), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"), _quiet_nan_warnings():
+            mean = np.nanmean(v, axis=1)
+            std = np.where(n > 1, np.nanstd(v, axis=1, ddof=1), np.nan) if v.shape[1] > 1 else np.full(len(n), np.nan)
+            vmin = np.nanmin(v, axis=1)
+            vmax = np.nanmax(v, axis=1)
+            half = _t_quantile(confidence, n - 1) * std / np.sqrt(n)
+        return {"n": n, "mean": mean, "std": std, "min": vmin, "max": vmax, "range": vmax - vmin,
+                "ci_low": mean - half, "ci_high": mean + half}
+
+    # the measured values of one row (NaN cells left out), in column order
+    def row_values(self, row: int) -> np.ndarray:
+        if row > self.n_rows:
+            return np.empty(0)
+        v = self.values[row - 1, :self.n_cols]
+        return v[~np.isnan(v)]
+
+    def row_summary(self, row: int, n_cols: Optional[int] = None) -> Dict[str, float]:
+        s = self.summary(n_cols)
+        return {k: float(a[row - 1]) for k, a in s.items()}
+
+    # boolean matrix: cell within +-tolerance of its row's level (targets), computed for all cells at once
+    def tolerance_mask(self, tolerance: float, targets: Optional[np.ndarray] = None) -> np.ndarray:
+        t = (self.level[:self.n_rows] if targets is None else np.asarray(targets, dtype=float))[:, None]
+        with np.errstate(invalid="ignore"):
+            return np.abs(self.used - t) <= tolerance
+
+    # column (1-based) whose value is closest to the row's target, and that value; 0/NaN for empty rows
+    def closest_to_target(self, targets: Optional[np.ndarray] = None):
+        t = (self.level[:self.n_rows] if targets is None else np.asarray(targets, dtype=float))[:, None]
+        dist = np.abs(self.used - t)
+        has = ~np.all(np.isnan(dist), axis=1)
+        col = np.zeros(self.n_rows, dtype=int)
+        val = np.full(self.n_rows, np.nan)
+        if np.any(has):
+            best = np.nanargmin(dist[has], axis=1)
+            col[has] = best + 1
+            val[has] = self.used[has, best]
+        return col, val
+
+
+class _quiet_nan_warnings():
+    # nanmean & co. warn on all-NaN rows (sounds not measured yet); that is expected here
+    def __enter__(self):
+        import warnings
+        self._ctx = warnings.catch_warnings()
+        self._ctx.__enter__()
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+    def __exit__(self, *exc):
+        return self._ctx.__exit__(*exc)
+
+def _t_quantile(confidence: float, dof: np.ndarray) -> np.ndarray:
+    dof = np.asarray(dof, dtype=float)
+    out = np.full(dof.shape, np.nan)
+    ok = dof >= 1
+    if np.any(ok):
+        from scipy.stats import t
+        out[ok] = t.ppf(0.5 + confidence / 2.0, dof[ok])
+    return out
+
+def _cell(v):
+    if isinstance(v, (float, np.floating)):
+        return None if np.isnan(v) else round(float(v), 3)
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    return v
+
+
+# Write the matrix into the workbook in one pass: values, the row mean after the repeats (complete rows
+# only, as calculate_And_Write_Average did), in-tolerance cells in bold, and a Summary sheet with the
+# per-row statistics. tolerance=None skips the pass/fail columns. min_repeats: rows with at least this many
+# values count as complete (adaptive repeats stop early), default all average_repeats
+def write_Matrix_Into_Workbook(wb, matrix: ResultsMatrix, average_repeats: Optional[int] = None,
+                               tolerance: Optional[float] = None, confidence: float = 0.95, min_repeats: Optional[int] = None):
+    from openpyxl.styles import Font
+    ws = wb.active
+    bold = Font(bold=True)
+    v = matrix.used
+    mask = matrix.tolerance_mask(tolerance) if tolerance is not None else np.zeros(v.shape, dtype=bool)
+    for r, c in zip(*np.nonzero(~np.isnan(v))):
+        cell = ws.cell(row=int(r) + 1, column=int(c) + 1)
+        cell.value = float(v[r, c])
+        if mask[r, c]:
+            cell.font = bold
+
+    stats = matrix.summary(average_repeats, confidence)
+    if average_repeats:
+        complete = stats["n"] >= (min_repeats or average_repeats)
+        for r in np.nonzero(complete)[0]:
+            ws.cell(row=int(r) + 1, column=average_repeats + 1).value = float(stats["mean"][r])
+
+    if SUMMARY_SHEET in wb.sheetnames:
+        del wb[SUMMARY_SHEET]
+    ss = wb.create_sheet(SUMMARY_SHEET)
+    ss.append(SUMMARY_HEADER)
+    if tolerance is not None:
+        in_tol = mask.sum(axis=1)
+        closest_col, closest_val = matrix.closest_to_target()
+    for r in range(matrix.n_rows):
+        if stats["n"][r] == 0:
+            continue
+        row = [r + 1, matrix.index[r], matrix.level[r], stats["n"][r], stats["mean"][r], stats["std"][r],
+               stats["min"][r], stats["max"][r], stats["range"][r], stats["ci_low"][r], stats["ci_high"][r]]
+        if tolerance is not None:
+            row += [in_tol[r], closest_col[r], closest_val[r]]
+        ss.append([_cell(x) for x in row])
+    return wb
+
+
+__all__ = [
+    "ResultsMatrix",
+    "write_Matrix_Into_Workbook",
+    "SUMMARY_SHEET",
+]
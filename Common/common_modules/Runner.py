@@ -0,0 +1,439 @@
+# Runner.py — shared runner for declarative project plans
+# A project (Suzuki, Mitsubishi, ...) is a ProjectPlan: setup steps run after the simulation is started,
+# a stimulus recipe (how a sound is played: SoundTune env variables or free diag telegrams), a measurement
+# strategy (repeats per sound, a volume sweep or a volume search) and its scoring (tolerance). The runner
+# does everything the project scripts used to copy: start/connect uTAS, load the config, checkpoint/resume,
+# load settings, open and start the simulation, the measurement loop, the report and the results database.
+#
+#   suzuki = ProjectPlan(name="Suzuki", setup=[...], stimulus=SoundTuneStimulus(tone_bank, voice_bank),
+#                        strategy=Repeats(policy=RepeatPolicy()))
+#   run_Project(suzuki)
+#
+# The work is ordered by the plan compiler (order="grouped" groups sounds by bank / index / level), and a
+# telegram stimulus only re-initializes the diag session when the ECU stopped answering OK. A RunContext can
+# be limited to some config rows, which is how the Coordinator splits one plan across several benches.
+# run_Project(project, dry_run=<time_scale>) or AA_DRY_RUN=<time_scale> runs the same flow on simulated uTAS
+# and audio (Dry_run) and reports our orchestration overhead per iteration. AA_TIMELINE records every phase
+# of every iteration (Timeline); progress, throughput and ETA go to <output>_status.json (Progress).
+# AA_VERIFY checks the first few hundred ms of every play against the sound's reference fingerprint and
+# retriggers a wrong or silent play before it is recorded in full (Fingerprint).
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from common_modules.Plan_compiler import (Cell, Command, Schedule, SoundBank, TOGGLE_MS, compile_Sound_Tune_Schedule,
+                                          compile_Telegram_Sweep_Schedule, make_Telegram_Cell)
+from common_modules.Repeat_policy import RepeatPolicy
+from common_modules.Timeline import timeline
+
+
+# ---------------- Setup steps ----------------
+@dataclass
+class Sleep:
+    seconds: float
+
+@dataclass
+class Call:
+    # fn(UTAS) for setup that is not a plain command, e.g. waiting for the OTC login
+    fn: Callable
+    description: str = ""
+
+SetupStep = Union[Command, Sleep, Call]
+
+
+# ---------------- Stimulus recipes ----------------
+class SoundTuneStimulus():
+    # SoundTune panel env variables; tones until a negative index row in the config, voices after it
+    def __init__(self, tone_bank: SoundBank, voice_bank: SoundBank):
+        self.banks = (tone_bank, voice_bank)
+
+    def start_session(self, UTAS):
+        pass
+
+    def before_measurement(self, UTAS):
+        pass
+
+    def compile_repeats(self, sounds, repeats, is_done=None, order="config") -> Schedule:
+        return compile_Sound_Tune_Schedule(sounds, repeats, banks=self.banks, is_done=is_done, order=order)
+
+
+class TelegramStimulus():
+    # free diag telegrams: "<play_prefix><index hex> <volume hex>" to play, stop_msg to stop. init_msg opens
+    # the diag session; it is only resent when Diag_LastResp_Text is no longer "OK"
+    def __init__(self, play_prefix: str = "31 01 fe 23 ", stop_msg: str = "31 02 fe 23", init_msg: str = "10 60",
+                 data_env: str = "Diag_FreeDiagTelegram_Data", button_env: str = "Diag_FreeDiagTelegram_Btn",
+                 response_env: str = "Diag_LastResp_Text", response_ok: str = "OK", init_timeout_s: float = 2.0):
+        self.play_prefix, self.stop_msg, self.init_msg = play_prefix, stop_msg, init_msg
+        self.data_env, self.button_env = data_env, button_env
+        self.response_env, self.response_ok, self.init_timeout_s = response_env, response_ok, init_timeout_s
+        self.reinits = 0
+
+    def _send_init(self, UTAS):
+        UTAS.send_command("set_env", [self.data_env, self.init_msg]) # open the diagnostic session
+        UTAS.send_command("toggle_env", [self.button_env, TOGGLE_MS])
+
+    def start_session(self, UTAS):
+        self._send_init(UTAS)
+        self.before_measurement(UTAS)
+
+    # known issue: the sound stops with an error and the session needs "10 60" again
+    def before_measurement(self, UTAS):
+        resp = UTAS.get_env(self.response_env, "str")
+        while resp != self.response_ok:
+            self.reinits += 1
+            self._send_init(UTAS)
+            _, resp = UTAS.wait_for_env(self.response_env, self.response_ok, timeout=self.init_timeout_s) # returns as soon as the ECU answers OK, else retry
+
+    def compile_sweep(self, sounds, volumes, is_done=None, order="config") -> Schedule:
+        return compile_Telegram_Sweep_Schedule(sounds, volumes, self.play_prefix, self.stop_msg, data_env=self.data_env,
+                                               button_env=self.button_env, is_done=is_done, order=order)
+
+    def cell_at(self, row, col, index, level, volume) -> Cell:
+        return make_Telegram_Cell(row, col, index, level, volume, self.play_prefix, self.stop_msg,
+                                  data_env=self.data_env, button_env=self.button_env)
+
+
+# ---------------- Measurement strategies ----------------
+@dataclass
+class Repeats:
+    # each sound `repeats` times (from the config), or adaptively with a RepeatPolicy, up to the config's
+    # repeats unless the policy sets its own max_repeats
+    policy: Optional[RepeatPolicy] = None
+    order: str = "config"
+
+    def policy_for(self, ctx) -> Optional[RepeatPolicy]:
+        return self.policy.for_repeats(ctx.plan.repeats) if self.policy else None
+
+    def columns(self, ctx) -> int:
+        policy = self.policy_for(ctx)
+        return policy.max_repeats if policy else ctx.plan.repeats
+
+    def report_options(self, ctx) -> dict:
+        policy = self.policy_for(ctx)
+        return {"average_repeats": self.columns(ctx), "min_repeats": policy.min_repeats if policy else None}
+
+    def run(self, ctx: "RunContext"):
+        policy, checkpoint = self.policy_for(ctx), ctx.checkpoint
+        n_cols = self.columns(ctx)
+        if policy is not None and policy.max_repeats != ctx.plan.repeats:
+            print(f"WARNING: the repeat policy measures each sound {policy.min_repeats} - {policy.max_repeats} times; "
+                  f"Repeats = {ctx.plan.repeats} in the config is not used")
+        def is_done(row, index, level, col): # measured before the previous run stopped, or that sound already had enough repeats
+            return (not ctx.wants(row) or checkpoint.is_done(row, index, level, col)
+                    or (policy is not None and policy.satisfied(checkpoint.matrix.row_values(row))))
+        schedule = ctx.stimulus.compile_repeats(ctx.plan.sounds, n_cols, is_done=is_done, order=self.order)
+        print(schedule.report())
+        ctx.expect_sounds(len({cell.row for cell in schedule.cells}))
+        stopped_row = None # sound whose remaining repeats are skipped by the repeat policy
+        for cell in schedule.cells:
+            if cell.row == stopped_row:
+                continue
+            ctx.measure(cell, f"Repeated: {cell.col}/{n_cols}")
+            values = checkpoint.matrix.row_values(cell.row)
+            stop, reason = policy.decide(values) if policy else (cell.last_in_row, f"{ctx.plan.repeats} repeats done")
+            if stop or cell.last_in_row:
+                stopped_row = cell.row
+                stats = checkpoint.matrix.row_summary(cell.row, n_cols=n_cols) # mean/spread of this sound's repeats, computed in memory
+                print(f"Sound index {cell.index}: {reason}. Mean {stats['mean']:.2f} dB, std {stats['std']:.2f} dB, range {stats['range']:.2f} dB, "
+                      f"95% CI [{stats['ci_low']:.2f}, {stats['ci_high']:.2f}]")
+                ctx.sound_finished(cell.row)
+
+
+@dataclass
+class VolumeSweep:
+    # every sound at each volume, one column per volume (characterization)
+    volumes: Sequence[int] = tuple(range(10, 255, 10))
+    order: str = "config"
+
+    def report_options(self, ctx) -> dict:
+        return {"tolerance": ctx.tolerance}
+
+    def run(self, ctx: "RunContext"):
+        def is_done(row, index, volume):
+            return not ctx.wants(row) or ctx.checkpoint.is_done(row, index, volume)
+        schedule = ctx.stimulus.compile_sweep(ctx.plan.sounds, list(self.volumes), is_done=is_done, order=self.order)
+        print(schedule.report())
+        ctx.expect_sounds(len({cell.row for cell in schedule.cells}))
+        for cell in schedule.cells:
+            ctx.measure(cell)
+            if cell.last_in_row:
+                ctx.sound_finished(cell.row)
+
+
+@dataclass
+class VolumeSearch:
+    # search each sound's volume for its level +-tolerance (Volume_search), excel column = volume
+    lo: int = 10
+    hi: int = 255
+    max_measurements: int = 8
+
+    def report_options(self, ctx) -> dict:
+        return {"tolerance": ctx.tolerance}
+
+    def run(self, ctx: "RunContext"):
+        from common_modules.Volume_search import search_Volume
+        checkpoint = ctx.checkpoint
+        ctx.expect_sounds(sum(1 for row in range(1, len(ctx.plan.sounds) + 1) if ctx.wants(row)))
+        for row, (index, level) in enumerate(ctx.plan.sounds, start=1):
+            if not ctx.wants(row):
+                continue
+            def measure_volume(volume):
+                if checkpoint.is_done(row, index, volume):
+                    return checkpoint.value(row, index, volume) # measured before the previous run stopped, the search replays it
+                return ctx.measure(ctx.stimulus.cell_at(row, volume, index, level, volume))
+            result = search_Volume(measure_volume, level, ctx.tolerance, lo=self.lo, hi=self.hi, max_measurements=self.max_measurements)
+            print(f"Sound index {index}: {result.describe()}")
+            ctx.sound_finished(row)
+
+
+Strategy = Union[Repeats, VolumeSweep, VolumeSearch]
+
+
+# ---------------- Project plan ----------------
+@dataclass
+class ProjectPlan:
+    name: str
+    stimulus: Union[SoundTuneStimulus, TelegramStimulus]
+    strategy: Strategy
+    setup: List[SetupStep] = field(default_factory=list)       # after the simulation is started
+    tolerance: Optional[float] = None                          # dB, scored against the level; config col 6 overrides
+    level_range: Optional[Tuple[float, float]] = None          # validation of the config level column
+    device: str = "ARTA"
+
+    # identifies a campaign of this project for a given test plan (checkpoint / results db)
+    def fingerprint(self, plan, tolerance) -> str:
+        return plan.fingerprint(self.name, repr(self.strategy), tolerance)
+
+    # config rows this project measures (bank switch rows left out), in the order the strategy works through them
+    def sound_rows(self, plan) -> List[int]:
+        from common_modules.Plan_compiler import order_Sound_Rows, resolve_Sound_Rows
+        rows = resolve_Sound_Rows(plan.sounds, bank_switch=isinstance(self.stimulus, SoundTuneStimulus))
+        return [r[0] for r in order_Sound_Rows(rows, getattr(self.strategy, "order", "config"))]
+
+
+class RunContext():
+    # what a strategy needs while it runs: the backends, the checkpoint and one measure() per cell.
+    # rows: only these config rows are measured (None = all)
+    def __init__(self, project: ProjectPlan, plan, UTAS, rpa, checkpoint, tolerance, rows=None):
+        self.project, self.plan, self.UTAS, self.rpa = project, plan, UTAS, rpa
+        self.stimulus = project.stimulus
+        self.checkpoint, self.tolerance = checkpoint, tolerance
+        self.rows = None if rows is None else set(rows)
+        self.report = None
+        self.progress = None # ProgressTracker, if the run has one
+        self.verifier = None # Fingerprint.SoundVerifier, if plays are verified
+        self.measurements = 0
+
+    def wants(self, row) -> bool:
+        return self.rows is None or row in self.rows
+
+    # sounds the strategy still has to measure in this run (the others were done before a resume)
+    def expect_sounds(self, n: int):
+        if self.progress is not None:
+            self.progress.expect(n)
+
+    # a sound's measurements are all taken: report checkpoint and progress
+    def sound_finished(self, row):
+        self.report.maybe_save()
+        if self.progress is not None:
+            self.progress.sound_done(row)
+            print(self.progress.line())
+
+    def _count(self, event: str):
+        if self.progress is not None:
+            self.progress.count(event)
+
+    # play the cell, measure, record (and score if there is a tolerance); returns the highest measured dB.
+    # With a verifier, a play that is silent or the wrong sound is stopped and played again
+    def measure(self, cell: Cell, note: str = "") -> float:
+        UTAS, rpa, duration = self.UTAS, self.rpa, self.plan.duration
+        level_text = cell.sent_level if cell.volume is None else cell.volume
+        print(f"********************{cell.row}/{len(self.plan.sounds)} sounds played. Playing sound index {cell.index} at sound level {level_text}. {note} ********************")
+        timeline.iteration = self.measurements + 1
+        with timeline.span(f"row {cell.row} col {cell.col}", "iteration"):
+            with timeline.span("before_measurement"):
+                self.stimulus.before_measurement(UTAS)
+            attempts = 1 + (self.verifier.retriggers if self.verifier is not None else 0)
+            for attempt in range(1, attempts + 1):
+                with timeline.span("play"):
+                    cell.play(UTAS) # send the sound and start playing it
+                if self.verifier is None:
+                    with timeline.span("measure_Sound"):
+                        rpa.measure_Sound(Rec_duration=duration) # start measurement, let the duration elapse before stopping
+                    break
+                check = self.verifier.start(cell) # probe the first few hundred ms while the recording starts
+                with timeline.span("measure_Sound"):
+                    if attempt < attempts:
+                        rpa.measure_Sound(Rec_duration=duration, abort=check.failed) # stopped early if the probe fails
+                    else:
+                        rpa.measure_Sound(Rec_duration=duration) # last attempt, recorded in full whatever the probe says
+                with timeline.span("verify"):
+                    verdict = check.result()
+                if verdict.ok:
+                    break
+                print(f"Verification failed ({attempt}/{attempts}): {verdict.describe()}")
+                if attempt == attempts:
+                    self._count("unverified")
+                    break
+                self._count("retriggers")
+                with timeline.span("stop"):
+                    cell.stop(UTAS)
+                with timeline.span("before_measurement"):
+                    self.stimulus.before_measurement(UTAS)
+            with timeline.span("stop"):
+                cell.stop(UTAS) # stop sound playing
+            with timeline.span("save_CSV"):
+                rpa.save_CSV(iter=cell.col, Rec_duration=duration) # save the recorded CSV
+            with timeline.span("process_CSV"):
+                value = rpa.process_CSV(iter=cell.col, Rec_duration=duration) # get the highest measured dB for sound played
+            with timeline.span("record"):
+                in_tolerance = self.tolerance is not None and (cell.level - self.tolerance) <= value <= (cell.level + self.tolerance)
+                self.checkpoint.record(row=cell.row, col=cell.col, value=value, index=cell.index, level=cell.level,
+                                       repeat=cell.repeat, volume=cell.volume, bold=in_tolerance) # record the result and mark the cell done
+        self.measurements += 1
+        if self.progress is not None:
+            self.progress.measured(cell.row, cell.col, cell.index, cell.level, value, in_tolerance if self.tolerance is not None else None)
+        return value
+
+
+# ---------------- Runner ----------------
+# dry_run: time_scale of a dry run, sleeps are scaled and Call steps (GUI automation) are skipped
+def _run_setup(UTAS, steps: Sequence[SetupStep], plan, dry_run=None):
+    fields = {"security_key": plan.security_key, "simulation_file_path": plan.simulation_file_path}
+    for step in steps:
+        if isinstance(step, Command):
+            UTAS.send_command(step.command, [str(p).format(**fields) for p in step.params])
+        elif isinstance(step, Sleep):
+            time.sleep(step.seconds if dry_run is None else step.seconds * dry_run)
+        elif isinstance(step, Call):
+            if dry_run is not None:
+                print(f"Dry run: skipped setup step {step.description or step.fn.__name__}")
+                continue
+            step.fn(UTAS)
+        else:
+            raise TypeError(f"Unknown setup step {step!r}")
+
+
+# load the uTAS project settings, open and start the simulation, then the project setup and stimulus session
+def start_Simulation(UTAS, project: ProjectPlan, plan, project_path=None, dry_run=None):
+    from common_modules.Startup_profile import startup_profile
+    if project_path is None:
+        from common_modules import UTAS_wrapper
+        project_path = UTAS_wrapper.UTAS_PROJECT_PATH
+    UTAS.load_project_settings(project_path) # load the initial proj. May change based on requirement
+    startup_profile.finish("first uTAS command") # print the import/startup profile if enabled
+    UTAS.send_command("save_setting", ['"CANoe.cfg_set.cfg_group.SimulationConfigPath.value"', plan.simulation_file_path]) # set the simulation file path in the prj setting dynamically.
+    UTAS.send_command("open_simulation") # open the simulation file (.cfg)
+    UTAS.send_command("delay", ["1000"]) # wait for the simulation file to open
+    UTAS.send_command("start_simulation") # start the simulation
+    _run_setup(UTAS, project.setup, plan, dry_run)
+    project.stimulus.start_session(UTAS)
+
+
+# Run a project end to end. UTAS / rpa / plan can be passed in (mock engine, fake or simulated audio, a
+# generated plan); otherwise the uTAS engine is found and started, ARTA is driven and config.xlsx is loaded.
+# interactive=False skips the final "Press ENTER" prompt. dry_run: time_scale of a dry run (default $AA_DRY_RUN),
+# simulated backends unless UTAS / rpa are given, output <name>_dryrun.xlsx, no resume, no results database
+def run_Project(project: ProjectPlan, plan=None, UTAS=None, rpa=None, config_file=None, output_path=None,
+                project_path=None, interactive=True, store_results=True, dry_run=None):
+    from common_modules.Test_plan import load_Test_Plan
+    from common_modules.Checkpoint import RunCheckpoint
+    from common_modules.Results_journal import ReportCheckpointer, read_journal
+    from common_modules.File_IO import write_Run_Into_Results_Db
+    from common_modules.Dry_run import dry_Run_Backends, dry_Run_From_Env, dry_Run_Output_Path
+    from common_modules.Progress import progress_For_Run
+    from common_modules.Fingerprint import verifier_For_Run
+
+    dry_run = dry_Run_From_Env() if dry_run is None else dry_run
+    if dry_run is not None:
+        print(f"DRY RUN: simulated uTAS and audio, time_scale={dry_run}")
+        if UTAS is None:
+            UTAS, rpa = dry_Run_Backends(dry_run)
+        project_path = project_path or "dry-run"
+        store_results = False
+    timeline.begin() # per-phase timeline, only if AA_TIMELINE is set
+    start_time = datetime.now()
+    start = time.perf_counter()
+    print(f"Start:   {start_time:%Y-%m-%d %H:%M:%S}")
+    if UTAS is None:
+        from common_modules.HelperFunc import find_UTAS_Execution_Engine_Path, start_UTAS_Execution_Engine
+        from common_modules.UTAS_wrapper import UtasWrapper
+        UTAS_Execution_Engine_Path = find_UTAS_Execution_Engine_Path() # find the path on the machine for UTAS execution engine
+        print("UTAS_Execution_Engine_Path =", UTAS_Execution_Engine_Path)
+        assert UTAS_Execution_Engine_Path is not None
+        start_UTAS_Execution_Engine(UTAS_Execution_Engine_Path) # connect to execution engine if already running, else launch
+
+    if plan is None:
+        plan = load_Test_Plan(config_file, level_range=project.level_range) # read and validate config.xlsx (cached while the file is unchanged)
+    output_path = output_path or (plan.output_excel_name if dry_run is None else dry_Run_Output_Path(plan.output_excel_name))
+    tolerance = plan.tolerance if plan.tolerance is not None else project.tolerance # tolerance given in the config overrides the project default
+    print(f"{output_path=}, simulation_file_path={plan.simulation_file_path!r}, duration={plan.duration}, repeats={plan.repeats}, "
+          f"security_Key={plan.security_key}, {tolerance=}")
+
+    if UTAS is None:
+        UTAS = UtasWrapper()
+    if rpa is None:
+        from common_modules.RPA import RPA
+        rpa = RPA()
+
+    fingerprint = project.fingerprint(plan, tolerance) # identifies this campaign
+    checkpoint = RunCheckpoint(output_path, fingerprint, resume=dry_run is None) # journal of every measurement, durably appended as it is taken. Resumes an interrupted run with the same config
+    ctx = RunContext(project, plan, UTAS, rpa, checkpoint, tolerance)
+    report = ReportCheckpointer(checkpoint.journal, output_path, test_name=plan.simulation_file_path,
+                                **project.strategy.report_options(ctx)) # excel file result is rebuilt from the journal at checkpoints
+    ctx.report = report
+    ctx.progress = progress_For_Run(output_path, len(project.sound_rows(plan)), name=f"{project.name} {plan.simulation_file_path}",
+                                    counters={"utas_errors": lambda: UTAS.stats.total_errors,
+                                              "diag_reinits": lambda: getattr(project.stimulus, "reinits", 0)}) # <output>_status.json, live progress / ETA
+
+    ctx.verifier = verifier_For_Run(project.name, rpa) # AA_VERIFY: fingerprint check of every play
+
+    start_Simulation(UTAS, project, plan, project_path, dry_run)
+    if ctx.verifier is not None:
+        ctx.verifier.measure_background() # nothing plays yet: the level silence is judged against
+
+    try:
+        project.strategy.run(ctx)
+        checkpoint.finish()
+    finally:
+        ctx.progress.close("finished" if checkpoint.finished else "stopped")
+        report.finish() # output excel with everything measured so far, also if the run died. Relaunch to resume
+        if store_results:
+            write_Run_Into_Results_Db(read_journal(checkpoint.journal.path), checkpoint.run_key, project.name, plan.simulation_file_path, fingerprint,
+                                      complete=checkpoint.finished, config_hash=plan.config_hash, device=project.device,
+                                      output=output_path) # bulk store the run in results.db for trends across runs
+
+    elapsed = time.perf_counter() - start
+    end_time = datetime.now()
+    UTAS.print_stats() # per-command uTAS latency / error breakdown
+    timeline.finish(floors={"measure_Sound": plan.duration * (1.0 if dry_run is None else dry_run)}) # per-phase breakdown; a recording cannot be shorter than the duration
+    UTAS.close_trace()
+    n_sounds = len(plan.sounds)
+    print(f"Test completed! {n_sounds}/{n_sounds} sounds played, {ctx.measurements} measurements this run.")
+    print(f"Start:   {start_time:%Y-%m-%d %H:%M:%S}")
+    print(f"End:     {end_time:%Y-%m-%d %H:%M:%S}.")
+    print(f"Elapsed: {elapsed:.3f} s  ({timedelta(seconds=elapsed)})")
+    if dry_run is not None and hasattr(rpa, "report"):
+        print(rpa.report())
+    if interactive:
+        input("Press ENTER to exit…")
+    return ctx
+
+
+__all__ = [
+    "ProjectPlan",
+    "RunContext",
+    "SoundTuneStimulus",
+    "TelegramStimulus",
+    "Repeats",
+    "VolumeSweep",
+    "VolumeSearch",
+    "Sleep",
+    "Call",
+    "Command",
+    "SoundBank",
+    "run_Project",
+    "start_Simulation",
+]
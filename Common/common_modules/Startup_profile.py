@@ -0,0 +1,114 @@
+# Startup_profile.py — import-time / time-to-first-command profile for the project executables
+# Off unless AA_PROFILE_STARTUP is set. Set it to 1 to print the report, or to a file path to also save it:
+#
+#   set AA_PROFILE_STARTUP=startup.txt
+#   Suzuki_auto.exe
+#
+# Works frozen (PyInstaller) as well, where "python -X importtime" is not available.
+# Also usable from the command line to time importing any modules:
+#   python -m common_modules.Startup_profile common_modules.RPA common_modules.File_IO pandas
+from __future__ import annotations
+import builtins, os, sys, time
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_ENV_VAR = "AA_PROFILE_STARTUP"
+
+
+class StartupProfiler():
+    def __init__(self):
+        self.enabled = False
+        self.t0: Optional[float] = None
+        self.cumulative: Dict[str, float] = {}   # module -> seconds including nested imports
+        self.self_time: Dict[str, float] = {}    # module -> seconds excluding nested imports
+        self.marks: List[Tuple[str, float]] = []  # (label, seconds since begin)
+        self._stack: List[List[float]] = []       # per active import: [child seconds]
+        self._orig_import = None
+
+    # start profiling (no-op unless forced or AA_PROFILE_STARTUP is set). Call before the heavy imports.
+    def begin(self, force: bool = False):
+        if self.enabled or not (force or os.environ.get(PROFILE_ENV_VAR)):
+            return
+        self.enabled = True
+        self.t0 = time.perf_counter()
+        self._orig_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # only first-time absolute imports cost anything worth reporting
+        if level != 0 or name in sys.modules:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        self._stack.append([0.0])
+        t = time.perf_counter()
+        try:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        finally:
+            dt = time.perf_counter() - t
+            children = self._stack.pop()[0]
+            if self._stack:
+                self._stack[-1][0] += dt
+            self.cumulative[name] = self.cumulative.get(name, 0.0) + dt
+            self.self_time[name] = self.self_time.get(name, 0.0) + dt - children
+
+    def mark(self, label: str):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter() - self.t0))
+
+    def end(self):
+        if self.enabled and self._orig_import is not None:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+
+    def report(self, limit: int = 25) -> str:
+        lines = [f"[startup] {'module':<44}{'self ms':>10}{'cumul ms':>10}"]
+        for name, cum in sorted(self.cumulative.items(), key=lambda kv: -kv[1])[:limit]:
+            lines.append(f"[startup] {name:<44}{self.self_time[name] * 1e3:>10.1f}{cum * 1e3:>10.1f}")
+        total_imports = sum(self.self_time.values())
+        lines.append(f"[startup] {len(self.cumulative)} modules imported, {total_imports * 1e3:.1f} ms in imports")
+        for label, t in self.marks:
+            lines.append(f"[startup] {label}: {t * 1e3:.1f} ms after start")
+        return "\n".join(lines)
+
+    # print (and save if AA_PROFILE_STARTUP is a path) the report, then stop profiling
+    def finish(self, label: Optional[str] = None):
+        if not self.enabled:
+            return
+        if label is not None:
+            self.mark(label)
+        self.end()
+        text = self.report()
+        print(text)
+        target = os.environ.get(PROFILE_ENV_VAR, "")
+        if target and target not in ("1", "true", "yes"):
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        self.enabled = False
+
+
+# process-wide instance used by the projects
+startup_profile = StartupProfiler()
+
+
+__all__ = [
+    "StartupProfiler",
+    "startup_profile",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Time importing the given modules (cold, in this process)")
+    p.add_argument("modules", nargs="+", help="e.g. common_modules.RPA pandas")
+    p.add_argument("--limit", type=int, default=25)
+    args = p.parse_args()
+
+    startup_profile.begin(force=True)
+    for m in args.modules:
+        t = time.perf_counter()
+        try:
+            __import__(m)
+            startup_profile.mark(f"import {m} done ({(time.perf_counter() - t) * 1e3:.1f} ms)")
+        except Exception as e:
+            startup_profile.mark(f"import {m} FAILED: {e}")
+    startup_profile.end()
+    print(startup_profile.report(args.limit))
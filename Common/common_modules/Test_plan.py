@@ -0,0 +1,236 @@
+# Test_plan.py — typed test plan loaded from config.xlsx (streaming) with a hash-keyed cache
+# Layout of config.xlsx (first sheet), as documented in File_IO.read_Config_File_For_HW_Team:
+#   row 2: col 1 simulation .cfg path (compulsory), col 2 security key (0/1/2), col 3 repeats,
+#          col 4 output excel name, col 5 duration (s, currently fixed at 12), col 6 tolerance (dB, optional)
+#   row 3+: col 1 sound index (negative row = switch to voice bank), col 2 level
+# The sheet is read once with openpyxl read-only streaming and validated into a TestPlan. The plan is cached
+# as JSON next to the config keyed by the file's SHA-256, so relaunching with an unchanged config skips Excel.
+#
+#   python -m common_modules.Test_plan config.xlsx        # validate and summarize
+#   python -m common_modules.Test_plan --bench 5000       # load time for a generated 5000-row plan
+from __future__ import annotations
+import argparse, hashlib, json, os, sys, time
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional, Tuple
+
+PLAN_CACHE_VERSION = 1
+DEFAULT_DURATION_S = 12  # duration is hardcoded, see read_Config_File_For_HW_Team
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass
+class TestPlan:
+    simulation_file_path: str
+    sounds: List[Tuple[int, float]] = field(default_factory=list)   # (index, level) in config order
+    output_excel_name: str = "Output.xlsx"
+    repeats: int = 3
+    security_key: int = 0
+    duration: float = DEFAULT_DURATION_S
+    tolerance: Optional[float] = None     # dB; None = project default
+    config_hash: str = ""                 # SHA-256 of the config file the plan came from
+
+    # the tuple read_Config_File_For_HW_Team has always returned
+    def as_tuple(self):
+        return (self.sounds, self.output_excel_name, self.simulation_file_path,
+                self.duration, self.repeats, self.security_key)
+
+    # identity of the campaign, for Checkpoint / result provenance. extra: project-side constants
+    def fingerprint(self, *extra) -> str:
+        from common_modules.Checkpoint import config_Fingerprint
+        return config_Fingerprint(self.sounds, self.simulation_file_path, self.duration, self.repeats,
+                                  self.security_key, self.tolerance, *extra)
+
+    @staticmethod
+    def from_dict(d: dict) -> "TestPlan":
+        d = dict(d)
+        d["sounds"] = [(int(i), l) for i, l in d.get("sounds", [])]
+        return TestPlan(**d)
+
+
+# config.xlsx next to the executable (frozen) or in Common/ (script), as before
+def default_Config_Path():
+    if getattr(sys, 'frozen', False):
+        base = os.path.dirname(sys.executable) # running as EXE
+    else:
+        base = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)) # running as script
+    return os.path.join(base, "config.xlsx")
+
+def file_sha256(path, chunk=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def plan_cache_path_for(config_file):
+    return os.path.splitext(config_file)[0] + ".plan.json"
+
+
+# ---------------- Parsing / validation ----------------
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def _as_int(v, name, errors, lo=None, hi=None):
+    try:
+        f = float(str(v).strip())
+    except (TypeError, ValueError):
+        errors.append(f"{name}: expected a whole number, got {v!r}")
+        return None
+    if not f.is_integer():
+        errors.append(f"{name}: expected a whole number, got {v!r}")
+        return None
+    i = int(f)
+    if (lo is not None and i < lo) or (hi is not None and i > hi):
+        errors.append(f"{name}: {i} out of range {lo}..{hi}")
+    return i
+
+def _as_float(v, name, errors):
+    try:
+        return float(str(v).strip())
+    except (TypeError, ValueError):
+        errors.append(f"{name}: expected a number, got {v!r}")
+        return None
+
+# build and validate a plan from the rows of the sheet (row 2 onwards, values only).
+# level_range: allowed (min, max) for the level column, e.g. (0, 255) for Suzuki volumes
+def parse_Plan_Rows(rows, level_range: Optional[Tuple[float, float]] = None) -> TestPlan:
+    errors: List[str] = []
+    rows = iter(rows)
+    params = next(rows, None)
+    if params is None:
+        raise ConfigError("Config sheet is empty")
+    params = tuple(params) + (None,) * (6 - len(params))
+    sim, sec, rep, out_name, dur, tol = params[:6]
+
+    if sim is None or str(sim).strip() == "":
+        errors.append("row 2 col 1: simulation file path (.cfg) is compulsory")
+    plan = TestPlan(simulation_file_path=str(sim).strip() if sim is not None else "")
+    if sec is not None:
+        plan.security_key = _as_int(sec, "row 2 col 2 (security key)", errors, 0, 2)
+    if rep is not None:
+        plan.repeats = _as_int(rep, "row 2 col 3 (repeats)", errors, 1, 100)
+    if out_name is not None and str(out_name).strip():
+        plan.output_excel_name = str(out_name).strip()
+    # col 5 duration is not taken from the config for now, it stays DEFAULT_DURATION_S
+    if tol is not None:
+        plan.tolerance = _as_float(tol, "row 2 col 6 (tolerance)", errors)
+        if plan.tolerance is not None and plan.tolerance <= 0:
+            errors.append("row 2 col 6 (tolerance): must be > 0")
+
+    for excel_row, row in enumerate(rows, start=3):
+        if not row:
+            continue
+        index, level = (tuple(row) + (None, None))[:2]
+        if index is None or level is None:
+            continue # incomplete rows are skipped, as before
+        idx = _as_int(index, f"row {excel_row} col 1 (index)", errors)
+        lvl = level if _is_number(level) else _as_float(level, f"row {excel_row} col 2 (level)", errors)
+        if idx is None or lvl is None:
+            continue
+        if level_range is not None and idx >= 0 and not (level_range[0] <= lvl <= level_range[1]):
+            errors.append(f"row {excel_row} col 2 (level): {lvl} out of range {level_range[0]}..{level_range[1]}")
+        plan.sounds.append((idx, lvl))
+
+    if errors:
+        shown = "\n  ".join(errors[:20])
+        more = f"\n  ... and {len(errors) - 20} more" if len(errors) > 20 else ""
+        raise ConfigError(f"Invalid config ({len(errors)} problems):\n  {shown}{more}")
+    return plan
+
+def _stream_rows(config_file):
+    from openpyxl import load_workbook
+    wb = load_workbook(filename=config_file, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        for row in ws.iter_rows(min_row=2, max_col=6, values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+# Load the plan for config_file (default: config.xlsx next to the exe). Uses the cached plan when the file
+# hash matches, otherwise streams the sheet, validates and refreshes the cache.
+def load_Test_Plan(config_file=None, use_cache=True, level_range=None) -> TestPlan:
+    config_file = config_file or default_Config_Path()
+    if not os.path.exists(config_file):
+        raise FileNotFoundError(f"Config file not found: {config_file}")
+    digest = file_sha256(config_file)
+    cache = plan_cache_path_for(config_file)
+    if use_cache:
+        try:
+            with open(cache, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == PLAN_CACHE_VERSION and cached.get("hash") == digest \
+                    and cached.get("level_range") == (list(level_range) if level_range else None):
+                return TestPlan.from_dict(cached["plan"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    plan = parse_Plan_Rows(_stream_rows(config_file), level_range=level_range)
+    plan.config_hash = digest
+    if use_cache:
+        try:
+            tmp = cache + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": PLAN_CACHE_VERSION, "hash": digest,
+                           "level_range": list(level_range) if level_range else None,
+                           "plan": asdict(plan)}, f)
+            os.replace(tmp, cache)
+        except OSError:
+            pass # read-only location: run without the cache
+    return plan
+
+
+# ---------------- Benchmark ----------------
+def benchmark(n_rows: int = 5000, workdir=None):
+    import tempfile
+    from openpyxl import Workbook
+    workdir = workdir or tempfile.mkdtemp(prefix="plan_bench_")
+    path = os.path.join(workdir, "config.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Simulation", "Security", "Repeats", "Output", "Duration", "Tolerance"])
+    ws.append([r"C:\sim\suzuki.cfg", 1, 3, "Output.xlsx", 12, 3])
+    for i in range(n_rows):
+        ws.append([i - 1 if i == n_rows // 2 else i, (i * 37) % 256])
+    wb.save(path)
+
+    t = time.perf_counter()
+    plan = load_Test_Plan(path, use_cache=True, level_range=(0, 255))
+    cold = time.perf_counter() - t
+    t = time.perf_counter()
+    load_Test_Plan(path, use_cache=True, level_range=(0, 255))
+    warm = time.perf_counter() - t
+    return len(plan.sounds), cold, warm
+
+
+__all__ = [
+    "TestPlan",
+    "ConfigError",
+    "load_Test_Plan",
+    "parse_Plan_Rows",
+    "default_Config_Path",
+    "file_sha256",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Validate config.xlsx into a test plan, or benchmark plan loading")
+    p.add_argument("config", nargs="?", help="config.xlsx (default: next to the executable)")
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--bench", type=int, metavar="ROWS", help="Generate a plan with ROWS sounds and time loading it")
+    args = p.parse_args()
+
+    if args.bench:
+        n, cold, warm = benchmark(args.bench)
+        print(f"{n} sounds: streamed+validated {cold * 1e3:.1f} ms, from cache {warm * 1e3:.1f} ms")
+    else:
+        plan = load_Test_Plan(args.config, use_cache=not args.no_cache)
+        print(f"Simulation: {plan.simulation_file_path}")
+        print(f"Sounds: {len(plan.sounds)}, repeats: {plan.repeats}, duration: {plan.duration} s, "
+              f"security key: {plan.security_key}, tolerance: {plan.tolerance}, output: {plan.output_excel_name}")
+        print(f"Config hash: {plan.config_hash[:16]}  fingerprint: {plan.fingerprint()}")
@@ -0,0 +1,224 @@
+# Timeline.py — per-phase timeline of a run: where each iteration's time goes
+# Off unless AA_TIMELINE is set (or begin(force=True)). Set it to 1 to print the breakdown at the end of the
+# run, or to a file path to also save a Chrome trace of every span (open it in https://ui.perfetto.dev or
+# chrome://tracing):
+#
+#   set AA_TIMELINE=timeline.json
+#   Suzuki_auto.exe
+#   python -m common_modules.Timeline timeline.json        # breakdown of a saved trace
+#
+# The runner records one "iteration" span per measurement and a "phase" span for each step in it
+# (before_measurement, play, measure_Sound, stop, save_CSV, process_CSV, record) plus every report save;
+# UtasWrapper adds a "utas" span per command, nested in the phase that sent it. The breakdown gives
+# total / mean / p95 per phase, idle time (run time outside any phase) and the time projected to be saved
+# if every iteration ran a phase as fast as its floor (the fastest observed, or a known minimum such as the
+# recording length).
+from __future__ import annotations
+import argparse, json, os, threading, time
+from typing import Dict, List, Optional, Tuple
+
+TIMELINE_ENV_VAR = "AA_TIMELINE"
+
+Span = Tuple[str, str, float, float, int] # (name, category, start, end, iteration) in perf_counter seconds
+
+
+class _NullSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class _TimedSpan():
+    def __init__(self, timeline, name, cat):
+        self.timeline, self.name, self.cat = timeline, name, cat
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timeline.add(self.name, self.start, time.perf_counter(), self.cat)
+        return False
+
+
+class Timeline():
+    def __init__(self):
+        self.enabled = False
+        self.t0: Optional[float] = None
+        self.spans: List[Span] = []
+        self.iteration = 0 # current iteration, stamped on every span
+        self._lock = threading.Lock()
+
+    # start recording (no-op unless forced or AA_TIMELINE is set)
+    def begin(self, force: bool = False):
+        if self.enabled or not (force or os.environ.get(TIMELINE_ENV_VAR)):
+            return
+        self.enabled = True
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.iteration = 0
+
+    # with timeline.span("save_CSV"): ...   — costs one attribute check when the timeline is off
+    def span(self, name: str, cat: str = "phase"):
+        return _TimedSpan(self, name, cat) if self.enabled else _NULL_SPAN
+
+    # a span timed elsewhere (e.g. the uTAS command stats)
+    def add(self, name: str, start: float, end: float, cat: str = "phase"):
+        if self.enabled:
+            with self._lock:
+                self.spans.append((name, cat, start, end, self.iteration))
+
+    def end(self) -> float:
+        self.enabled = False
+        return time.perf_counter()
+
+    # per-phase statistics. floors: {phase: seconds} an iteration cannot go below (default: fastest observed)
+    def breakdown(self, end: Optional[float] = None, floors: Optional[Dict[str, float]] = None) -> dict:
+        return breakdown_Spans(self.spans, self.t0, end if end is not None else time.perf_counter(), floors)
+
+    def report(self, end: Optional[float] = None, floors: Optional[Dict[str, float]] = None) -> str:
+        return format_Breakdown(self.breakdown(end, floors))
+
+    # Chrome trace event format: complete ("X") events in microseconds, phases / iterations / uTAS on
+    # separate tracks so nesting always holds
+    def save_trace(self, path):
+        save_Chrome_Trace(self.spans, self.t0, path)
+
+    # print the breakdown (and save the trace if AA_TIMELINE is a path), then stop recording
+    def finish(self, floors: Optional[Dict[str, float]] = None, trace_path=None):
+        if not self.enabled:
+            return None
+        end = self.end()
+        print(self.report(end, floors))
+        target = trace_path or os.environ.get(TIMELINE_ENV_VAR, "")
+        if target and target not in ("1", "true", "yes"):
+            self.save_trace(target)
+            print(f"[timeline] trace saved to {target}")
+        return end
+
+
+_TRACKS = {"iteration": 1, "phase": 2, "utas": 3}
+
+def save_Chrome_Trace(spans, t0, path):
+    events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": cat}} for cat, tid in _TRACKS.items()]
+    for name, cat, start, end, it in spans:
+        events.append({"name": name, "cat": cat, "ph": "X", "pid": 1, "tid": _TRACKS.get(cat, 4),
+                       "ts": round((start - t0) * 1e6, 1), "dur": round((end - start) * 1e6, 1), "args": {"iteration": it}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def load_Chrome_Trace(path) -> List[Span]:
+    with open(path, "r", encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    return [(e["name"], e.get("cat", ""), e["ts"] / 1e6, (e["ts"] + e["dur"]) / 1e6, e.get("args", {}).get("iteration", 0))
+            for e in events if e.get("ph") == "X"]
+
+
+def _stats(durations: List[float]) -> dict:
+    import numpy as np
+    d = np.asarray(durations)
+    return {"n": len(d), "total": float(d.sum()), "mean": float(d.mean()), "p95": float(np.percentile(d, 95)),
+            "min": float(d.min()), "max": float(d.max())}
+
+def breakdown_Spans(spans: List[Span], t0: float, end: float, floors: Optional[Dict[str, float]] = None) -> dict:
+    floors = floors or {}
+    by_name: Dict[str, List[float]] = {}
+    utas: Dict[str, List[float]] = {}
+    iterations = []
+    for name, cat, start, stop, _ in spans:
+        if cat == "iteration":
+            iterations.append((start, stop))
+        elif cat == "utas":
+            utas.setdefault(name, []).append(stop - start)
+        else:
+            by_name.setdefault(name, []).append(stop - start)
+    phases = {}
+    for name, durations in by_name.items():
+        s = _stats(durations)
+        s["floor"] = floors.get(name, s["min"])
+        s["saving"] = sum(max(d - s["floor"], 0.0) for d in durations)
+        phases[name] = s
+    windows = [(start, stop) for _, cat, start, stop, _ in spans if cat not in ("iteration", "utas")]
+    def idle_in(a, b): # time in [a, b] outside every phase (phases do not overlap each other)
+        return max((b - a) - sum(max(min(stop, b) - max(start, a), 0.0) for start, stop in windows), 0.0)
+    out = {"wall": end - t0, "phases": phases, "utas": {k: _stats(v) for k, v in utas.items()},
+           "idle": idle_in(t0, end), "iterations": _stats([b - a for a, b in iterations]) if iterations else None}
+    if iterations:
+        out["setup"] = idle_in(t0, iterations[0][0])
+        out["tail"] = idle_in(iterations[-1][1], end)
+        out["idle_between"] = max(out["idle"] - out["setup"] - out["tail"], 0.0) # strategy logic, prints, waits outside the phases
+    return out
+
+def format_Breakdown(b: dict) -> str:
+    lines = [f"[timeline] {'phase':<22}{'n':>7}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'share':>8}{'floor ms':>10}{'saving s':>10}"]
+    wall = b["wall"] or 1e-12
+    for name, s in sorted(b["phases"].items(), key=lambda kv: -kv[1]["total"]):
+        lines.append(f"[timeline] {name:<22}{s['n']:>7}{s['total']:>10.2f}{s['mean'] * 1e3:>10.1f}{s['p95'] * 1e3:>10.1f}"
+                     f"{100 * s['total'] / wall:>7.1f}%{s['floor'] * 1e3:>10.1f}{s['saving']:>10.2f}")
+    if b["utas"]:
+        n = sum(s["n"] for s in b["utas"].values())
+        total = sum(s["total"] for s in b["utas"].values())
+        lines.append(f"[timeline]   of which uTAS commands: {n} in {total:.2f} s ({100 * total / wall:.1f}% of the run)")
+    lines.append(f"[timeline] idle (outside any phase): {b['idle']:.2f} s ({100 * b['idle'] / wall:.1f}%)"
+                 + (f" = setup {b['setup']:.2f} s + between iterations {b['idle_between']:.2f} s + tail {b['tail']:.2f} s"
+                    if b["iterations"] else ""))
+    saving = sum(s["saving"] for s in b["phases"].values())
+    it = b["iterations"]
+    per_it = f", iteration mean {it['mean']:.2f} s, p95 {it['p95']:.2f} s" if it else ""
+    lines.append(f"[timeline] run {b['wall']:.2f} s{per_it}; projected saving if every phase ran at its floor: "
+                 f"{saving:.2f} s ({100 * saving / wall:.1f}%), plus {b.get('idle_between', 0.0):.2f} s idle between iterations")
+    return "\n".join(lines)
+
+
+# process-wide instance used by the runner and UtasWrapper
+timeline = Timeline()
+
+
+# ---------------- Self-check ----------------
+# a dry run with the timeline on: every phase must show up once per measurement and the trace must load back
+def selfcheck_timeline(workdir=None) -> bool:
+    import contextlib, io, tempfile
+    from common_modules.Coordinator import demo_Plan, demo_Project
+    from common_modules.Runner import run_Project
+    from common_modules.Timeline import timeline as shared # the instance the runner uses, also when run as __main__
+    workdir = workdir or tempfile.mkdtemp(prefix="timeline_")
+    trace = os.path.join(workdir, "timeline.json")
+    shared.begin(force=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctx = run_Project(demo_Project(), plan=demo_Plan(4, repeats=2), output_path=os.path.join(workdir, "Output.xlsx"),
+                          interactive=False, dry_run=0.001)
+    end = shared.end()
+    shared.save_trace(trace)
+    b = breakdown_Spans(load_Chrome_Trace(trace), 0.0, end - shared.t0)
+    print(format_Breakdown(b))
+    want = ("before_measurement", "play", "measure_Sound", "stop", "save_CSV", "process_CSV", "record")
+    ok = all(b["phases"].get(p, {}).get("n") == ctx.measurements for p in want) and b["utas"] and "report save" in b["phases"]
+    print(f"[selfcheck] timeline {'OK' if ok else 'FAILED'} ({ctx.measurements} iterations, trace {trace})")
+    return bool(ok)
+
+
+__all__ = [
+    "Timeline",
+    "timeline",
+    "breakdown_Spans",
+    "format_Breakdown",
+    "save_Chrome_Trace",
+    "load_Chrome_Trace",
+    "selfcheck_timeline",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Per-phase breakdown of a saved timeline trace (default: self-check on a dry run)")
+    p.add_argument("trace", nargs="?", help="Chrome trace written with AA_TIMELINE=<path>")
+    args = p.parse_args()
+    if args.trace:
+        spans = load_Chrome_Trace(args.trace)
+        print(format_Breakdown(breakdown_Spans(spans, 0.0, max((s[3] for s in spans), default=0.0))))
+    else:
+        selfcheck_timeline()
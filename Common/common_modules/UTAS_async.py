@@ -0,0 +1,166 @@
+# UTAS_async.py — asyncio client for the uTAS Execution Engine
+# Same command vocabulary as UtasWrapper, but every call is awaitable so a project flow can overlap
+# uTAS round trips with audio capture / file I/O, e.g.
+#
+#   async with AsyncUtasWrapper() as utas:
+#       await utas.toggle_env("SoundTune_PlaySound", "200")
+#       meas = asyncio.to_thread(RPA_automation.measure_Sound, Rec_duration=12)
+#       ...
+#
+# The .NET client is blocking, so calls run on a single dedicated worker thread. That keeps commands
+# on the one engine connection strictly ordered while the event loop stays free.
+from __future__ import annotations
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from common_modules.UTAS_trace import CommandStats, open_trace
+from common_modules.Timeline import timeline
+from common_modules.UTAS_wrapper import env_predicate, load_eecom, WATCH_INITIAL_INTERVAL_S, WATCH_MAX_INTERVAL_S, WATCH_BACKOFF
+
+DEFAULT_TIMEOUT_S = 30.0
+
+
+class AsyncUtasWrapper():
+    # client: anything exposing the ExecEngineCommunicationClient API (Connect / SendCmdRequest).
+    # If None, the real .NET client is created on connect().
+    # trace_path: JSON-lines command trace as in UtasWrapper (defaults to $AA_UTAS_TRACE, off if unset)
+    def __init__(self, clientName = "PythonClient", port = 8888, client=None, timeout: Optional[float] = DEFAULT_TIMEOUT_S,
+                 trace_path=None):
+        self.stats = CommandStats()
+        self.tracer = open_trace(trace_path)
+        self.clientName = clientName
+        self.port = port
+        self.timeout = timeout
+        self.EECOM_OBJ = client
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="uTAS")
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    # run a blocking call on the uTAS thread, bounded by timeout (None = wait forever).
+    # On timeout/cancel the awaiting task is released straight away; the engine call itself cannot be
+    # interrupted and finishes in the background, so the next command queues behind it.
+    async def _call(self, func, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._executor, func, *args)
+        return await asyncio.wait_for(fut, timeout)
+
+    async def connect(self, timeout: Optional[float] = None):
+        def _connect():
+            if self.EECOM_OBJ is None:
+                self.EECOM_OBJ = load_eecom().ExecEngineCommunicationClient(self.port, self.clientName)
+            # connect to the ExecutionEngine context
+            self.EECOM_OBJ.Connect().ConfigureAwait(False).GetAwaiter().GetResult()
+        try:
+            await self._call(_connect, timeout=self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.error_log("Connecting to uTAS Error: timed out")
+            raise
+        except Exception as e:
+            self.error_log("Connecting to uTAS Error: {}".format(e))
+            return False
+        return True
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.tracer is not None:
+            self.tracer.close()
+
+    # runs on the uTAS thread; timed there so queueing behind an earlier command is not counted
+    def _send(self, command, param):
+        t0 = time.perf_counter()
+        errorDesc = None
+        result = None
+        try:
+            response = self.EECOM_OBJ.SendCmdRequest(command, param)
+            errorDesc = response.get_Err().get_Description()
+            if errorDesc is not None:
+                raise Exception(errorDesc)
+            result = response.get_Result()
+            return result
+        except Exception as e:
+            errorDesc = errorDesc if errorDesc is not None else e
+            raise
+        finally:
+            t1 = time.perf_counter()
+            self.stats.record(command, t0, t1, ok=errorDesc is None)
+            timeline.add(command, t0, t1, "utas")
+            if self.tracer is not None:
+                self.tracer.write(command, param, t0, t1, ok=errorDesc is None, error=errorDesc, result=result)
+
+    # Same contract as UtasWrapper.send_command: engine errors are logged and give None.
+    # Timeouts raise asyncio.TimeoutError and cancellation propagates, so the caller can react to both.
+    async def send_command(self, command: str, param: list = None, timeout: Optional[float] = None):
+        param = [] if param is None else list(param)
+        result = None
+        try:
+            result = await self._call(self._send, command, param,
+                                      timeout=self.timeout if timeout is None else timeout)
+            print(f"{command=}, {param=}, {result=}")
+        except asyncio.TimeoutError:
+            self.error_log("send_command Error when sending {}: timed out".format(command))
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error_log("send_command Error when sending {}: {}".format(command, e))
+        return result
+
+    async def load_project_settings(self, project_path, timeout: Optional[float] = None):
+        try:
+            await self._call(self._send, "load_project_settings", [project_path, "default", "default"],
+                             timeout=self.timeout if timeout is None else timeout)
+            errorDesc = None
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            errorDesc = e
+        if errorDesc is not None:
+            self.error_log("Loading project Settings error: {}".format(errorDesc))
+            return False
+        return True
+
+    async def get_env(self, name: str, as_type: str = "str", timeout: Optional[float] = None):
+        return await self.send_command("get_env", [name, as_type], timeout=timeout)
+
+    async def set_env(self, name: str, value, timeout: Optional[float] = None):
+        return await self.send_command("set_env", [name, str(value)], timeout=timeout)
+
+    # press an env "button" for duration_ms, as the panels expect
+    async def toggle_env(self, name: str, duration_ms="200", timeout: Optional[float] = None):
+        return await self.send_command("toggle_env", [name, str(duration_ms)], timeout=timeout)
+
+    # async counterpart of UtasWrapper.wait_for_any_env (adaptive backoff polling); returns (matched, name, value)
+    async def wait_for_any_env(self, names, expected, timeout: float = 10.0, as_type: str = "str",
+                               initial_interval: float = WATCH_INITIAL_INTERVAL_S, max_interval: float = WATCH_MAX_INTERVAL_S):
+        names = [names] if isinstance(names, str) else list(names)
+        predicate = env_predicate(expected)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = initial_interval
+        last = {}
+        while True:
+            seen = {n: await self.get_env(n, as_type) for n in names}
+            for n in names:
+                if seen[n] is not None and predicate(seen[n]):
+                    return True, n, seen[n]
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False, names[-1], seen[names[-1]]
+            interval = initial_interval if (last and seen != last) else min(interval * WATCH_BACKOFF, max_interval)
+            last = seen
+            await asyncio.sleep(min(interval, remaining))
+
+    async def wait_for_env(self, name: str, expected, timeout: float = 10.0, as_type: str = "str", **kwargs):
+        matched, _, value = await self.wait_for_any_env([name], expected, timeout=timeout, as_type=as_type, **kwargs)
+        return matched, value
+
+    def print_stats(self):
+        print(self.stats.summary())
+
+    def error_log(self, msg):
+        print(msg)
@@ -0,0 +1,502 @@
+# UTAS_mock.py — local stand-in for the uTAS Execution Engine
+# Speaks the ExecEngineCommunicationClient API (Connect / SendCmdRequest) that UtasWrapper and
+# AsyncUtasWrapper drive, so project flows can run on a plain Linux box:
+#
+#   engine = MockExecEngine(latency_s=0.005)
+#   UTAS = UtasWrapper(client=engine)
+#
+# The real client talks to ExecutionEngine.exe over a proprietary protocol on port 8888, so the mock
+# plugs in at the client object rather than on the wire. It keeps an in-memory env-variable store,
+# follows the panel behaviour the projects rely on (SoundTune play/stop, free diag telegrams,
+# Diag_LastResp_Text, security access display) and supports injectable latency and faults.
+from __future__ import annotations
+import argparse, random, threading, time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+
+# env variables the Suzuki / Mitsubishi panels expose, with their power-on values
+DEFAULT_ENV = {
+    "MAIN_eTerminal15": "0",
+    "TESTER_eDMInitVdoProduction": "0",
+    "TESTER_eProdType": "0",
+    "TESTER_eDMSecAccessVdo": "0",
+    "TESTER_eDMSecAccess_Display": "",
+    "TESTER_eDMDiagStatusLine": "",
+    "SoundTune_SoundNo": "0",
+    "SoundTune_SoundVolume_new": "0",
+    "SoundTune_PlaySound": "0",
+    "SoundTune_StopSound": "0",
+    "SoundTune_VoiceNo": "0",
+    "SoundTune_VoiceVolume_new": "0",
+    "SoundTune_PlayVoice": "0",
+    "SoundTune_StopVoice": "0",
+    "Env_TesterPresent": "0",
+    "Diag_FreeDiagTelegram_Data": "",
+    "Diag_FreeDiagTelegram_Btn": "0",
+    "Diag_LastResp_Text": "",
+}
+
+
+# ---------------- .NET-shaped response objects ----------------
+class _MockErr():
+    def __init__(self, description=None):
+        self._description = description
+
+    def get_Description(self):
+        return self._description
+
+class _MockResponse():
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._err = _MockErr(error)
+
+    def get_Err(self):
+        return self._err
+
+    def get_Result(self):
+        return self._result
+
+class _CompletedTask():
+    # enough of System.Threading.Tasks.Task for Connect().ConfigureAwait(False).GetAwaiter().GetResult()
+    def __init__(self, error: Optional[Exception] = None):
+        self._error = error
+
+    def ConfigureAwait(self, _continue_on_captured_context):
+        return self
+
+    def GetAwaiter(self):
+        return self
+
+    def GetResult(self):
+        if self._error is not None:
+            raise self._error
+        return None
+
+
+class _EnvStore(dict):
+    # env dict that notifies SubscribeEnv listeners when a value actually changes
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listeners: Dict[str, list] = {}
+
+    def __setitem__(self, name, value):
+        changed = self.get(name) != value
+        super().__setitem__(name, value)
+        if changed:
+            for cb in list(self.listeners.get(name, ())):
+                cb(name, value)
+
+
+class EngineDisconnected(ConnectionError):
+    pass
+
+
+# ---------------- Faults ----------------
+@dataclass
+class Fault:
+    command: str                       # command name, or "*" for any command
+    message: str = "Injected fault"    # error description returned by the engine
+    times: int = 1                     # how many matching calls fail (-1 = forever)
+    after: int = 0                     # let this many matching calls through first
+    disconnect: bool = False           # raise EngineDisconnected instead of returning an error
+    match: Optional[Callable[[list], bool]] = None   # optional filter on the params
+
+    def matches(self, command: str, param: list) -> bool:
+        if self.command not in ("*", command):
+            return False
+        return self.match is None or bool(self.match(param))
+
+
+# ---------------- Engine ----------------
+class MockExecEngine():
+    # latency_s: per-command round-trip latency, either one number or {command: seconds} ("*" = default)
+    # jitter_s:  uniform extra latency 0..jitter_s added on every call
+    # time_scale: scales engine-side waits (delay, toggle_env press duration). 0 = instantaneous
+    # push_notifications: offer SubscribeEnv; False makes watchers fall back to polling like on a real engine
+    def __init__(self, env: Optional[Dict[str, str]] = None,
+                 latency_s: Union[float, Dict[str, float]] = 0.0, jitter_s: float = 0.0,
+                 time_scale: float = 0.0, seed: Optional[int] = None, strict_env: bool = False,
+                 push_notifications: bool = True):
+        self.env: Dict[str, str] = _EnvStore(DEFAULT_ENV)
+        if env:
+            self.env.update({k: str(v) for k, v in env.items()})
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.time_scale = time_scale
+        self.strict_env = strict_env
+        self.push_notifications = push_notifications
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+
+        self.connected = False
+        self.connect_error: Optional[Exception] = None
+        self.project_path = None
+        self.settings: Dict[str, str] = {}
+        self.simulation_open = False
+        self.simulation_running = False
+        self.playing = None            # ("tone"|"voice"|"diag", index, volume) while a sound plays
+        self.faults: List[Fault] = []
+        self._fault_seen: Dict[int, int] = {}
+
+        self.command_log: List[tuple] = []     # (t_monotonic, command, params)
+        self.command_counts: Dict[str, int] = {}
+
+        # scripted reactions to toggle_env, keyed by env name: fn(engine)
+        self.scripts: Dict[str, Callable[["MockExecEngine"], None]] = {
+            "TESTER_eDMSecAccessVdo":    MockExecEngine._script_security_access,
+            "SoundTune_PlaySound":       lambda e: e._script_play("tone"),
+            "SoundTune_StopSound":       lambda e: e._script_stop(),
+            "SoundTune_PlayVoice":       lambda e: e._script_play("voice"),
+            "SoundTune_StopVoice":       lambda e: e._script_stop(),
+            "Diag_FreeDiagTelegram_Btn": MockExecEngine._script_diag_telegram,
+        }
+        self.diag_session_open = False
+
+    # ---- client API ----
+    def Connect(self):
+        with self._lock:
+            if self.connect_error is None:
+                self.connected = True
+            return _CompletedTask(self.connect_error)
+
+    def SendCmdRequest(self, command: str, param=None):
+        param = [] if param is None else [str(p) for p in param]
+        self._sleep(self._latency_for(command))
+        with self._lock:
+            self.command_log.append((time.monotonic(), command, param))
+            self.command_counts[command] = self.command_counts.get(command, 0) + 1
+            if not self.connected:
+                raise EngineDisconnected("Client is not connected to the Execution Engine")
+            fault = self._take_fault(command, param)
+            if fault is not None:
+                if fault.disconnect:
+                    self.connected = False
+                    raise EngineDisconnected(fault.message)
+                return _MockResponse(error=fault.message)
+            handler = getattr(self, "_cmd_" + command, None)
+            if handler is None:
+                return _MockResponse(error=f"Unknown command: {command}")
+            try:
+                return _MockResponse(result=handler(param))
+            except _CommandError as e:
+                return _MockResponse(error=str(e))
+
+    # push notification of env changes: callback(name, value) on every change, returns an unsubscribe function.
+    # UtasWrapper.wait_for_env uses this instead of polling when the client offers it (None = not supported).
+    def SubscribeEnv(self, name: str, callback):
+        if not self.push_notifications:
+            return None
+        with self._lock:
+            self.env.listeners.setdefault(name, []).append(callback)
+
+        def _unsubscribe():
+            with self._lock:
+                cbs = self.env.listeners.get(name, [])
+                if callback in cbs:
+                    cbs.remove(callback)
+        return _unsubscribe
+
+    # ---- test/bench controls ----
+    def inject_fault(self, command: str, **kwargs) -> Fault:
+        fault = Fault(command=command, **kwargs)
+        with self._lock:
+            self.faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        with self._lock:
+            self.faults.clear()
+            self._fault_seen.clear()
+
+    def script(self, env_name: str, fn: Callable[["MockExecEngine"], None]):
+        self.scripts[env_name] = fn
+
+    def set_env_value(self, name: str, value, after_s: float = 0.0):
+        # engine-side write (what the simulation itself would do), not counted as a command.
+        # after_s > 0 makes the change happen later on a timer thread, like an ECU answering.
+        def _write():
+            with self._lock:
+                self.env[name] = str(value)
+        if after_s > 0:
+            threading.Timer(after_s, _write).start()
+        else:
+            _write()
+
+    def reset_stats(self):
+        with self._lock:
+            self.command_log.clear()
+            self.command_counts.clear()
+
+    # ---- internals ----
+    def _latency_for(self, command: str) -> float:
+        if isinstance(self.latency_s, dict):
+            base = self.latency_s.get(command, self.latency_s.get("*", 0.0))
+        else:
+            base = self.latency_s
+        if self.jitter_s > 0:
+            base += self._rng.uniform(0.0, self.jitter_s)
+        return base
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _take_fault(self, command: str, param: list) -> Optional[Fault]:
+        for fault in list(self.faults):
+            if not fault.matches(command, param):
+                continue
+            seen = self._fault_seen.get(id(fault), 0)
+            self._fault_seen[id(fault)] = seen + 1
+            if seen < fault.after:
+                continue
+            if fault.times >= 0 and seen - fault.after >= fault.times:
+                continue
+            return fault
+        return None
+
+    def _require_running(self):
+        if not self.simulation_running:
+            raise _CommandError("Simulation is not running")
+
+    # ---- command handlers ----
+    def _cmd_load_project_settings(self, param):
+        if not param:
+            raise _CommandError("load_project_settings requires a project path")
+        self.project_path = param[0]
+        return True
+
+    def _cmd_save_setting(self, param):
+        if len(param) < 2:
+            raise _CommandError("save_setting requires a key and a value")
+        self.settings[param[0].strip('"')] = param[1]
+        return True
+
+    def _cmd_get_setting(self, param):
+        if not param:
+            raise _CommandError("get_setting requires a key")
+        return self.settings.get(param[0].strip('"'))
+
+    def _cmd_open_simulation(self, param):
+        if self.project_path is None:
+            raise _CommandError("No project settings loaded")
+        self.simulation_open = True
+        return True
+
+    def _cmd_start_simulation(self, param):
+        if not self.simulation_open:
+            raise _CommandError("Simulation is not open")
+        self.simulation_running = True
+        return True
+
+    def _cmd_stop_simulation(self, param):
+        self.simulation_running = False
+        self.playing = None
+        return True
+
+    def _cmd_delay(self, param):
+        ms = float(param[0]) if param else 0.0
+        self._sleep(ms / 1000.0 * self.time_scale)
+        return True
+
+    def _cmd_set_env(self, param):
+        self._require_running()
+        if len(param) < 2:
+            raise _CommandError("set_env requires a name and a value")
+        name, value = param[0], param[1]
+        if self.strict_env and name not in self.env:
+            raise _CommandError(f"Unknown environment variable: {name}")
+        self.env[name] = value
+        return True
+
+    def _cmd_get_env(self, param):
+        self._require_running()
+        if not param:
+            raise _CommandError("get_env requires a name")
+        name = param[0]
+        as_type = param[1] if len(param) > 1 else "str"
+        if name not in self.env:
+            if self.strict_env:
+                raise _CommandError(f"Unknown environment variable: {name}")
+            return None
+        value = self.env[name]
+        if as_type == "int":
+            return int(float(value or 0))
+        if as_type == "float":
+            return float(value or 0)
+        return value
+
+    def _cmd_toggle_env(self, param):
+        self._require_running()
+        if not param:
+            raise _CommandError("toggle_env requires a name")
+        name = param[0]
+        press_ms = float(param[1]) if len(param) > 1 else 200.0
+        if self.strict_env and name not in self.env:
+            raise _CommandError(f"Unknown environment variable: {name}")
+        self.env[name] = "1"
+        self._sleep(press_ms / 1000.0 * self.time_scale)
+        self.env[name] = "0"
+        script = self.scripts.get(name)
+        if script is not None:
+            script(self)
+        return True
+
+    # ---- panel scripts ----
+    def _script_security_access(self):
+        if self.env.get("MAIN_eTerminal15") != "1":
+            self.env["TESTER_eDMSecAccess_Display"] = "Security Access: RC ($24) not yet defined"
+            return
+        self.env["TESTER_eDMSecAccess_Display"] = "Security Access: Positive Response"
+        self.env["TESTER_eDMDiagStatusLine"] = "Access Granted ! !"
+
+    def _script_play(self, bank: str):
+        if bank == "tone":
+            index, volume = self.env["SoundTune_SoundNo"], self.env["SoundTune_SoundVolume_new"]
+        else:
+            index, volume = self.env["SoundTune_VoiceNo"], self.env["SoundTune_VoiceVolume_new"]
+        self.playing = (bank, int(float(index)), float(volume))
+        self.env["TESTER_eDMDiagStatusLine"] = "I/O Control By Local Identifier: Positive Response"
+
+    def _script_stop(self):
+        self.playing = None
+
+    def _script_diag_telegram(self):
+        data = self.env.get("Diag_FreeDiagTelegram_Data", "").split()
+        if data[:2] == ["10", "60"]:
+            self.diag_session_open = True
+            self.env["Diag_LastResp_Text"] = "OK"
+            return
+        if not self.diag_session_open:
+            self.env["Diag_LastResp_Text"] = "NRC: serviceNotSupportedInActiveSession"
+            return
+        if data[:4] == ["31", "01", "fe", "23"] and len(data) >= 6:
+            self.playing = ("diag", int(data[4], 16), float(int(data[5], 16)))
+            self.env["Diag_LastResp_Text"] = "OK"
+        elif data[:4] == ["31", "02", "fe", "23"]:
+            self.playing = None
+            self.env["Diag_LastResp_Text"] = "OK"
+        else:
+            self.env["Diag_LastResp_Text"] = "NRC: requestOutOfRange"
+
+    def drop_diag_session(self):
+        # what the ECU does when it falls out of the extended session; Mitsubishi has to send "10 60" again
+        with self._lock:
+            self.diag_session_open = False
+            self.env["Diag_LastResp_Text"] = "NRC: serviceNotSupportedInActiveSession"
+
+
+class _CommandError(Exception):
+    pass
+
+
+# ---------------- Benchmark ----------------
+# Suzuki-style command sequence per measurement (index, volume, play, stop)
+def _suzuki_step(UTAS, index, level):
+    UTAS.send_command("set_env", ["SoundTune_SoundNo", str(index)])
+    UTAS.send_command("set_env", ["SoundTune_SoundVolume_new", str(level)])
+    UTAS.send_command("toggle_env", ["SoundTune_PlaySound", "200"])
+    UTAS.send_command("toggle_env", ["SoundTune_StopSound", "200"])
+
+def _setup(UTAS):
+    UTAS.load_project_settings("mock_project")
+    UTAS.send_command("save_setting", ['"CANoe.cfg_set.cfg_group.SimulationConfigPath.value"', "mock.cfg"])
+    UTAS.send_command("open_simulation")
+    UTAS.send_command("delay", ["1000"])
+    UTAS.send_command("start_simulation")
+
+def benchmark(steps: int = 200, latency_s: float = 0.002, jitter_s: float = 0.0) -> Dict[str, float]:
+    import asyncio, contextlib, io
+    from common_modules.UTAS_wrapper import UtasWrapper
+    from common_modules.UTAS_async import AsyncUtasWrapper
+
+    results = {}
+    engine = MockExecEngine(latency_s=latency_s, jitter_s=jitter_s, seed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        UTAS = UtasWrapper(client=engine)
+        _setup(UTAS)
+        engine.reset_stats()
+        t0 = time.perf_counter()
+        for i in range(steps):
+            _suzuki_step(UTAS, i, 50.0)
+        dt = time.perf_counter() - t0
+    n = sum(engine.command_counts.values())
+    results["sync_cmds_per_s"] = n / dt
+    results["sync_overhead_ms_per_cmd"] = (dt / n - latency_s - jitter_s / 2) * 1e3
+
+    async def _async_run():
+        engine2 = MockExecEngine(latency_s=latency_s, jitter_s=jitter_s, seed=0)
+        async with AsyncUtasWrapper(client=engine2) as utas:
+            await utas.load_project_settings("mock_project")
+            for cmd in ("open_simulation", "start_simulation"):
+                await utas.send_command(cmd)
+            engine2.reset_stats()
+            t0 = time.perf_counter()
+            for i in range(steps):
+                await utas.set_env("SoundTune_SoundNo", i)
+                await utas.set_env("SoundTune_SoundVolume_new", 50.0)
+                await utas.toggle_env("SoundTune_PlaySound")
+                await utas.toggle_env("SoundTune_StopSound")
+            return sum(engine2.command_counts.values()), time.perf_counter() - t0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        n, dt = asyncio.run(_async_run())
+    results["async_cmds_per_s"] = n / dt
+    results["async_overhead_ms_per_cmd"] = (dt / n - latency_s - jitter_s / 2) * 1e3
+    return results
+
+
+# ---------------- Self-check ----------------
+def selfcheck_mock() -> bool:
+    import contextlib, io
+    from common_modules.UTAS_wrapper import UtasWrapper
+
+    engine = MockExecEngine()
+    ok = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        UTAS = UtasWrapper(client=engine)
+        ok &= UTAS.send_command("set_env", ["MAIN_eTerminal15", "1"]) is None   # simulation not running yet
+        _setup(UTAS)
+        UTAS.send_command("set_env", ["MAIN_eTerminal15", "1"])
+        UTAS.send_command("toggle_env", ["TESTER_eDMSecAccessVdo", "200"])
+        ok &= UTAS.send_command("get_env", ["TESTER_eDMSecAccess_Display", "str"]) == "Security Access: Positive Response"
+        _suzuki_step(UTAS, 7, 50.2)
+        ok &= engine.playing is None and engine.command_counts["toggle_env"] == 3
+
+        UTAS.send_command("set_env", ["Diag_FreeDiagTelegram_Data", "31 01 fe 23 5 a0"])
+        UTAS.send_command("toggle_env", ["Diag_FreeDiagTelegram_Btn", "200"])
+        ok &= UTAS.send_command("get_env", ["Diag_LastResp_Text", "str"]) != "OK"  # no "10 60" yet
+        UTAS.send_command("set_env", ["Diag_FreeDiagTelegram_Data", "10 60"])
+        UTAS.send_command("toggle_env", ["Diag_FreeDiagTelegram_Btn", "200"])
+        UTAS.send_command("set_env", ["Diag_FreeDiagTelegram_Data", "31 01 fe 23 5 a0"])
+        UTAS.send_command("toggle_env", ["Diag_FreeDiagTelegram_Btn", "200"])
+        ok &= engine.playing == ("diag", 5, 160.0)
+
+        engine.inject_fault("get_env", message="Timeout waiting for CANoe", times=1)
+        ok &= UTAS.send_command("get_env", ["Diag_LastResp_Text", "str"]) is None
+        ok &= UTAS.send_command("get_env", ["Diag_LastResp_Text", "str"]) == "OK"
+    print(f"[selfcheck] mock engine {'OK' if ok else 'FAILED'}")
+    return bool(ok)
+
+
+__all__ = [
+    "MockExecEngine",
+    "EngineDisconnected",
+    "Fault",
+    "DEFAULT_ENV",
+    "benchmark",
+    "selfcheck_mock",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Mock uTAS Execution Engine self-check and throughput benchmark")
+    p.add_argument("--steps", type=int, default=200, help="Measurement steps (4 commands each)")
+    p.add_argument("--latency-ms", type=float, default=2.0, help="Per-command engine latency")
+    p.add_argument("--jitter-ms", type=float, default=0.0)
+    args = p.parse_args()
+
+    selfcheck_mock()
+    res = benchmark(args.steps, args.latency_ms / 1000.0, args.jitter_ms / 1000.0)
+    for k, v in res.items():
+        print(f"{k:>28}: {v:.3f}")
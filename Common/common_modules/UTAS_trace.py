@@ -0,0 +1,174 @@
+# UTAS_trace.py — per-command latency histograms, error counters and JSON-lines trace for uTAS calls
+# UtasWrapper / AsyncUtasWrapper always keep in-memory stats (a few perf_counter calls per command).
+# The trace file is only written when asked for, either via trace_path= or the AA_UTAS_TRACE env var:
+#
+#   set AA_UTAS_TRACE=utas_trace.jsonl
+#   Suzuki_auto.exe
+#   python -m common_modules.UTAS_trace utas_trace.jsonl     # summarize after the run
+from __future__ import annotations
+import argparse, bisect, json, os, threading, time
+from typing import Dict, Iterable, List, Optional
+
+TRACE_ENV_VAR = "AA_UTAS_TRACE"
+
+# histogram bucket upper bounds in ms (last bucket is open ended)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class LatencyHistogram():
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.n += 1
+        self.total_ms += ms
+        if ms < self.min_ms:
+            self.min_ms = ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.n if self.n else 0.0
+
+    # bucket-resolution percentile (upper bound of the bucket holding the q-th sample, capped at max)
+    def percentile(self, q: float) -> float:
+        if self.n == 0:
+            return 0.0
+        target = q / 100.0 * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+                return min(float(upper), self.max_ms)
+        return self.max_ms
+
+
+class CommandStats():
+    def __init__(self):
+        self.hist: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, command: str, start: float, end: float, ok: bool = True):
+        ms = (end - start) * 1000.0
+        with self._lock:
+            h = self.hist.get(command)
+            if h is None:
+                h = self.hist[command] = LatencyHistogram()
+            h.add(ms)
+            if not ok:
+                self.errors[command] = self.errors.get(command, 0) + 1
+            if self.first_start is None:
+                self.first_start = start
+            self.last_end = end
+
+    @property
+    def total_commands(self) -> int:
+        return sum(h.n for h in self.hist.values())
+
+    @property
+    def total_errors(self) -> int:
+        return sum(self.errors.values())
+
+    def summary(self) -> str:
+        span_s = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        in_utas_ms = sum(h.total_ms for h in self.hist.values())
+        lines = [f"{'command':<24}{'n':>7}{'err':>6}{'mean ms':>10}{'p50':>9}{'p95':>9}{'max ms':>10}{'total s':>10}{'share':>8}"]
+        for name, h in sorted(self.hist.items(), key=lambda kv: -kv[1].total_ms):
+            share = h.total_ms / in_utas_ms * 100.0 if in_utas_ms else 0.0
+            lines.append(f"{name:<24}{h.n:>7}{self.errors.get(name, 0):>6}{h.mean_ms:>10.1f}"
+                         f"{h.percentile(50):>9.0f}{h.percentile(95):>9.0f}{h.max_ms:>10.1f}"
+                         f"{h.total_ms / 1000.0:>10.2f}{share:>7.1f}%")
+        lines.append(f"{self.total_commands} commands, {self.total_errors} errors, "
+                     f"{in_utas_ms / 1000.0:.2f} s in uTAS over a {span_s:.2f} s span")
+        return "\n".join(lines)
+
+
+class TraceWriter():
+    # one JSON object per command: t (wall clock start), start/end (perf_counter), dur_ms, cmd, param, ok, error
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, command: str, param, start: float, end: float, ok: bool, error: Optional[str] = None, result=None):
+        rec = {
+            "t": time.time() - (time.perf_counter() - start),
+            "start": start,
+            "end": end,
+            "dur_ms": round((end - start) * 1000.0, 3),
+            "cmd": command,
+            "param": list(param) if param is not None else [],
+            "ok": ok,
+        }
+        if error is not None:
+            rec["error"] = str(error)
+        if result is not None:
+            rec["result"] = result if isinstance(result, (str, int, float, bool)) else str(result)
+        line = json.dumps(rec, ensure_ascii=False)
+        with self._lock:
+            self._f.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+
+# trace writer from an explicit path or from AA_UTAS_TRACE; None means tracing is off
+def open_trace(trace_path=None) -> Optional[TraceWriter]:
+    path = trace_path or os.environ.get(TRACE_ENV_VAR)
+    return TraceWriter(path) if path else None
+
+
+def read_trace(path) -> Iterable[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def summarize_trace(path) -> CommandStats:
+    stats = CommandStats()
+    for rec in read_trace(path):
+        stats.record(rec["cmd"], rec["start"], rec["end"], rec.get("ok", True))
+    return stats
+
+# the n slowest individual calls in a trace, e.g. to spot one env var that is always slow
+def slowest_calls(path, n: int = 10) -> List[dict]:
+    return sorted(read_trace(path), key=lambda r: r["dur_ms"], reverse=True)[:n]
+
+
+__all__ = [
+    "LatencyHistogram",
+    "CommandStats",
+    "TraceWriter",
+    "open_trace",
+    "read_trace",
+    "summarize_trace",
+    "slowest_calls",
+]
+
+
+# ---------------- CLI ----------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Summarize a uTAS command trace (JSON lines)")
+    p.add_argument("trace", help="Trace file written by UtasWrapper (AA_UTAS_TRACE / trace_path)")
+    p.add_argument("--slowest", type=int, default=10, help="Also list the N slowest calls")
+    args = p.parse_args()
+
+    print(summarize_trace(args.trace).summary())
+    if args.slowest > 0:
+        print(f"\nSlowest {args.slowest} calls:")
+        for rec in slowest_calls(args.trace, args.slowest):
+            err = f"  ERROR: {rec['error']}" if "error" in rec else ""
+            print(f"{rec['dur_ms']:>10.1f} ms  {rec['cmd']} {rec['param']}{err}")
@@ -1,4 +1,14 @@
-import clr, sys, os, winreg
+import sys, os, time, threading
+from common_modules.UTAS_trace import CommandStats, open_trace
+from common_modules.Timeline import timeline
+
+__all__ = [
+    "UtasWrapper",
+    "find_utas_install_root",
+    "find_utas_lib_folder",
+    "load_eecom",
+    "env_predicate",
+]
 
 def find_utas_install_root():
     """
@@ -6,6 +16,7 @@ def find_utas_install_root():
     all Uninstall subkeys for DisplayName containing “uTAS”, just as we
     did for the lib folder—but this time we return the parent folder.
     """
+    import winreg
     uninstall = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
     hives = [
         (winreg.HKEY_LOCAL_MACHINE, winreg.KEY_WOW64_64KEY),
@@ -39,17 +50,26 @@ def find_utas_install_root():
 
     raise RuntimeError("Could not locate uTAS5 installation root")
 
-# at module top, after you’ve already found utas_lib:
-utas_root = find_utas_install_root()
+def _utas_project_path():
+    utas_root = find_utas_install_root()
+    return os.path.join(
+        utas_root,
+        "Projects",
+        "Test",          # or whatever subfolder you actually want
+        "v01.00.00"
+    )
 
-UTAS_PROJECT_PATH = os.path.join(
-    utas_root,
-    "Projects",
-    "Test",          # or whatever subfolder you actually want
-    "v01.00.00"
-)
+# UTAS_PROJECT_PATH is resolved on first access rather than at import, so the wrapper can be imported
+# (and driven by UTAS_mock) on machines without a uTAS install
+def __getattr__(name):
+    if name == "UTAS_PROJECT_PATH":
+        value = _utas_project_path()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def find_utas_lib_folder():
+    import winreg
     uninstall = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
     hives = [
         (winreg.HKEY_LOCAL_MACHINE, winreg.KEY_WOW64_64KEY),
@@ -88,36 +108,74 @@ def find_utas_lib_folder():
 
     return None
 
-utas_lib = find_utas_lib_folder()
-if utas_lib:
-    # make sure pythonnet can load the assemblies
-    if hasattr(os, "add_dll_directory"):
-        os.add_dll_directory(utas_lib)   # Python 3.8+
-    sys.path.append(utas_lib)            # for any pure-Python bits
+_EECOM = None
+
+# load the uTAS .NET assemblies through pythonnet on first use and return the ExecEngineComAPI namespace
+def load_eecom():
+    global _EECOM
+    if _EECOM is not None:
+        return _EECOM
+    import clr
+    utas_lib = find_utas_lib_folder()
+    if utas_lib:
+        # make sure pythonnet can load the assemblies
+        if hasattr(os, "add_dll_directory"):
+            os.add_dll_directory(utas_lib)   # Python 3.8+
+        sys.path.append(utas_lib)            # for any pure-Python bits
 
+    clr.AddReference("uTAS.API")
+    clr.AddReference("uTAS.Communication.ExecEngineComAPI")
+    import uTAS.Communication.ExecEngineComAPI as EECOM
+    _EECOM = EECOM
+    return _EECOM
 
-clr.AddReference("uTAS.API")
-clr.AddReference("uTAS.Communication.ExecEngineComAPI")
-import uTAS.Communication.ExecEngineComAPI as EECOM
+# Turn what a caller is waiting for into a predicate on the env value:
+# a callable is used as is, a set/list/tuple means "value is one of these", anything else means equality
+def env_predicate(expected):
+    if callable(expected):
+        return expected
+    if isinstance(expected, (set, frozenset, list, tuple)):
+        return lambda value: value in expected
+    return lambda value: value == expected
+
+# polling schedule for wait_for_env: start fast, back off geometrically while nothing changes
+WATCH_INITIAL_INTERVAL_S = 0.01
+WATCH_MAX_INTERVAL_S = 0.25
+WATCH_BACKOFF = 1.5
 
 class UtasWrapper():
-    def __init__(self, clientName = "PythonClient", port = 8888):
+    # client: optional stand-in for ExecEngineCommunicationClient (e.g. UTAS_mock.MockExecEngine).
+    # If None, the real .NET client is created.
+    # trace_path: write a JSON-lines record per command (see UTAS_trace). Defaults to $AA_UTAS_TRACE, off if unset.
+    # env_cache_ttl: how long (s) a get_env value may be served from cache. Any set_env/toggle_env clears it.
+    def __init__(self, clientName = "PythonClient", port = 8888, client = None, trace_path = None, env_cache_ttl = 0.1):
+        self.stats = CommandStats() # per-command latency histograms and error counters
+        self.tracer = open_trace(trace_path)
+        self.env_cache_ttl = env_cache_ttl
+        self._env_cache = {} # (name, type) -> (value, perf_counter when read)
         try:
-            self.EECOM_OBJ = EECOM.ExecEngineCommunicationClient(port, clientName)
+            self.EECOM_OBJ = client if client is not None else load_eecom().ExecEngineCommunicationClient(port, clientName)
             # connect to the ExecutionEngine context
             self.EECOM_OBJ.Connect().ConfigureAwait(False).GetAwaiter().GetResult()
         except Exception as e:
             self.error_log("Connecting to uTAS Error: {}".format(e))
 
     def load_project_settings(self, project_path):
+        t0 = time.perf_counter()
         response = self.EECOM_OBJ.SendCmdRequest("load_project_settings", [project_path, "default", "default"])
-        if response.get_Err().get_Description() is not None:
-            self.error_log("Loading project Settings error: {}".format(response.get_Err().get_Description()))
-            assert response.get_Err().get_Description() == None, "Loading project Settings error"
+        errorDesc = response.get_Err().get_Description()
+        self._record("load_project_settings", [project_path], t0, time.perf_counter(), errorDesc)
+        if errorDesc is not None:
+            self.error_log("Loading project Settings error: {}".format(errorDesc))
+            assert errorDesc == None, "Loading project Settings error"
             return False
 
     def send_command(self, command: str, param: list = []):
         result = None
+        errorDesc = None
+        if command != "get_env" and self._env_cache:
+            self._env_cache.clear() # anything else may change env values (panel scripts react to toggles)
+        t0 = time.perf_counter()
         try:
             response = self.EECOM_OBJ.SendCmdRequest(command, param)
 
@@ -130,8 +188,89 @@ class UtasWrapper():
                 result = response.get_Result()
             print(f"{command=}, {param=}, {result=}")
         except Exception as e:
+            errorDesc = errorDesc if errorDesc is not None else e
             self.error_log("send_command Error when sending {}: {}".format(command, e))
         finally:
+            self._record(command, param, t0, time.perf_counter(), errorDesc, result)
             return result
+
+    def _record(self, command, param, start, end, errorDesc, result = None):
+        self.stats.record(command, start, end, ok = errorDesc is None)
+        timeline.add(command, start, end, "utas")
+        if self.tracer is not None:
+            self.tracer.write(command, param, start, end, ok = errorDesc is None, error = errorDesc, result = result)
+
+    def set_env(self, name, value):
+        return self.send_command("set_env", [name, str(value)])
+
+    def toggle_env(self, name, duration_ms = 200):
+        return self.send_command("toggle_env", [name, str(duration_ms)])
+
+    # get_env with a short-lived cache: a value read less than max_age seconds ago (default env_cache_ttl) is
+    # returned without a round trip. max_age = 0 always asks the engine.
+    def get_env(self, name, as_type = "str", max_age = None):
+        max_age = self.env_cache_ttl if max_age is None else max_age
+        key = (name, as_type)
+        if max_age > 0:
+            hit = self._env_cache.get(key)
+            if hit is not None and time.perf_counter() - hit[1] <= max_age:
+                return hit[0]
+        value = self.send_command("get_env", [name, as_type])
+        if value is not None:
+            self._env_cache[key] = (value, time.perf_counter())
+        return value
+
+    # Block until one of the env variables in names satisfies expected (value, set of values or predicate).
+    # Returns (matched, name, value) with the last values seen; matched is False on timeout.
+    # If the client can push env changes (SubscribeEnv(name, callback) -> unsubscribe) we wake on the change,
+    # otherwise poll with an adaptive backoff that restarts fast whenever a value changes.
+    def wait_for_any_env(self, names, expected, timeout = 10.0, as_type = "str",
+                         initial_interval = WATCH_INITIAL_INTERVAL_S, max_interval = WATCH_MAX_INTERVAL_S):
+        names = [names] if isinstance(names, str) else list(names)
+        predicate = env_predicate(expected)
+        deadline = time.perf_counter() + timeout
+        changed = threading.Event()
+        unsubscribe = []
+        subscribe = getattr(self.EECOM_OBJ, "SubscribeEnv", None)
+        if subscribe is not None:
+            for n in names:
+                unsub = subscribe(n, lambda _name, _value: changed.set())
+                if unsub is not None:
+                    unsubscribe.append(unsub)
+        try:
+            interval = initial_interval
+            last = {}
+            while True:
+                changed.clear()
+                seen = {n: self.get_env(n, as_type, max_age = 0) for n in names}
+                for n in names:
+                    if seen[n] is not None and predicate(seen[n]):
+                        return True, n, seen[n]
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False, names[-1], seen[names[-1]]
+                interval = initial_interval if (last and seen != last) else min(interval * WATCH_BACKOFF, max_interval)
+                last = seen
+                if unsubscribe:
+                    changed.wait(min(max_interval, remaining)) # push wakes us; the timeout is only a safety net
+                else:
+                    time.sleep(min(interval, remaining))
+        finally:
+            for unsub in unsubscribe:
+                unsub()
+
+    # wait_for_any_env for a single variable, returns (matched, value)
+    def wait_for_env(self, name, expected, timeout = 10.0, as_type = "str", **kwargs):
+        matched, _, value = self.wait_for_any_env([name], expected, timeout = timeout, as_type = as_type, **kwargs)
+        return matched, value
+
+    # print the per-command latency/error table, e.g. at the end of a run
+    def print_stats(self):
+        print(self.stats.summary())
+
+    def close_trace(self):
+        if self.tracer is not None:
+            self.tracer.close()
+
     def error_log(self, msg):
-        print(msg)
\ No newline at end of file
+        print(msg)
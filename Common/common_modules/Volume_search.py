@@ -0,0 +1,170 @@
+# Volume_search.py — find the volume whose LAFmax is within tolerance of a target, in a few measurements
+# The Mitsubishi sweep measures every sound at volume 10, 20, ... 250 (25 recordings of 12 s+) to find the
+# volumes that land within +-tolerance dB of the target level. The volume -> dB response is monotonic, so
+# this searches it instead: a first guess from a 20*log10(volume) model, model / secant extrapolation until
+# the target is bracketed, then interpolation in log-volume inside the bracket. Every measured volume is kept.
+#
+#   python -m common_modules.Volume_search      # search vs sweep over the simulated volume -> SPL response
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+MODEL_DB_PER_DECADE = 20.0 # amplitude scaling, 20*log10(volume / 255)
+
+
+@dataclass
+class SearchResult:
+    target: float
+    tolerance: float
+    volume: Optional[int] = None     # measured volume closest to the target
+    value: Optional[float] = None    # its LAFmax
+    measured: List[Tuple[int, float]] = field(default_factory=list) # (volume, dB) in measurement order
+    reason: str = ""                 # why the search stopped short of the tolerance ("" when it got there)
+
+    @property
+    def in_tolerance(self) -> bool:
+        return self.value is not None and abs(self.value - self.target) <= self.tolerance
+
+    def describe(self) -> str:
+        vols = ", ".join(f"{v}:{d:.1f}" for v, d in self.measured)
+        got = f"volume {self.volume} -> {self.value:.2f} dB" if self.value is not None else "nothing measured"
+        why = f", {self.reason}" if self.reason else ""
+        return (f"target {self.target} +-{self.tolerance} dB: {got} "
+                f"({'in' if self.in_tolerance else 'NOT in'} tolerance, {len(self.measured)} measurements{why}) [{vols}]")
+
+
+def _log(v):
+    return math.log10(max(v, 1))
+
+# next volume from two (volume, dB) points by linear interpolation / extrapolation in log-volume
+def _secant(p0, p1, target):
+    (v0, d0), (v1, d1) = p0, p1
+    if d1 == d0:
+        return None
+    x = _log(v0) + (target - d0) * (_log(v1) - _log(v0)) / (d1 - d0)
+    return 10 ** x
+
+
+# measure: fn(volume) -> dB (plays the sound at that volume and returns LAFmax).
+# The response is assumed non-decreasing in volume; lo/hi bound the volumes tried (inclusive).
+# first: initial volume (default hi, the loudest setting, which is always clearly above the noise floor)
+def search_Volume(measure: Callable[[int], float], target: float, tolerance: float, lo: int = 10, hi: int = 255,
+                  max_measurements: int = 8, first: Optional[int] = None) -> SearchResult:
+    res = SearchResult(target=target, tolerance=tolerance)
+    seen = {}
+    below = above = None # bracket: loudest volume under the target, quietest volume over it
+
+    def take(v):
+        nonlocal below, above
+        d = float(measure(v))
+        seen[v] = d
+        res.measured.append((v, d))
+        if d < target and (below is None or v > below[0]):
+            below = (v, d)
+        if d > target and (above is None or v < above[0]):
+            above = (v, d)
+        return d
+
+    v = hi if first is None else int(min(max(first, lo), hi))
+    while True:
+        d = take(v)
+        if abs(d - target) <= tolerance:
+            break
+        if len(res.measured) >= max_measurements:
+            res.reason = "measurement budget used"
+            break
+        if below is not None and above is not None:
+            if above[0] - below[0] <= 1:
+                res.reason = "no volume step between the bracket"
+                break
+            guess = _secant(below, above, target)
+            nxt = int(round(guess)) if guess is not None else (below[0] + above[0]) // 2
+            nxt = min(max(nxt, below[0] + 1), above[0] - 1) # stay strictly inside the bracket
+        else:
+            near = sorted(sorted(seen.items(), key=lambda p: abs(_log(p[0]) - _log(v)))[:2])
+            guess = None
+            if len(near) == 2 and near[1][1] > near[0][1]: # measured slope, used once the readings agree it is positive
+                guess = _secant(near[0], near[1], target)
+            if guess is None:
+                guess = 10 ** (_log(v) + (target - d) / MODEL_DB_PER_DECADE)
+            nxt = int(round(min(max(guess, lo), hi)))
+            if nxt in seen:
+                if (nxt == hi and d < target) or (nxt == lo and d > target):
+                    res.reason = f"target out of range at volume {nxt}"
+                    break
+                nxt = nxt + 1 if d < target else nxt - 1
+        if nxt in seen or not (lo <= nxt <= hi):
+            res.reason = "no untried volume left"
+            break
+        v = nxt
+
+    best = min(res.measured, key=lambda p: abs(p[1] - target))
+    res.volume, res.value = best
+    return res
+
+
+# ---------------- Self-check ----------------
+# an ECU volume curve that is linear in dB (0.15 dB per step) rather than the 20*log10 model, so the
+# search has to correct its first guess from the readings
+def linear_db_spl_model(playing) -> float:
+    from common_modules.Fake_backends import default_spl_model
+    if playing is None or playing[0] != "diag":
+        return default_spl_model(playing)
+    _, index, volume = playing
+    return max(30.0, 80.0 + (abs(int(index)) % 10) - 0.15 * (255 - volume))
+
+# search vs the 10..250 sweep against simulated volume -> SPL responses (mock engine + FakeRPA with
+# reading noise), playing through the same diag telegrams as Mitsubishi
+def selfcheck_search(noise_db: float = 0.3, tolerance: float = 3.0) -> bool:
+    import contextlib, io
+    from common_modules.UTAS_mock import MockExecEngine
+    from common_modules.UTAS_wrapper import UtasWrapper
+    from common_modules.Fake_backends import FakeRPA, default_spl_model
+    from common_modules.Plan_compiler import make_Telegram_Cell
+
+    sweep = list(range(10, 251, 10))
+    targets = [(1, 75.0), (3, 80.0), (5, 62.0), (7, 86.5), (9, 50.0)]
+    all_ok = True
+    for name, model in (("20*log10 response", default_spl_model), ("linear dB response", linear_db_spl_model)):
+        engine = MockExecEngine()
+        UTAS = UtasWrapper(client=engine)
+        rpa = FakeRPA(engine, spl_model=model, noise_db=noise_db, seed=1)
+        ok, total, sweep_total, results = True, 0, 0, []
+        with contextlib.redirect_stdout(io.StringIO()):
+            UTAS.load_project_settings("p"); UTAS.send_command("open_simulation"); UTAS.send_command("start_simulation")
+            UTAS.send_command("set_env", ["Diag_FreeDiagTelegram_Data", "10 60"])
+            UTAS.send_command("toggle_env", ["Diag_FreeDiagTelegram_Btn", "200"])
+
+            def measure(index, volume):
+                cell = make_Telegram_Cell(1, volume, index, 0, volume, "31 01 fe 23 ", "31 02 fe 23")
+                cell.play(UTAS)
+                rpa.measure_Sound(Rec_duration=12)
+                cell.stop(UTAS)
+                rpa.save_CSV(iter=volume, Rec_duration=12)
+                return rpa.process_CSV(iter=volume, Rec_duration=12)
+
+            for index, target in targets:
+                r = search_Volume(lambda v: measure(index, v), target, tolerance)
+                swept = [(v, measure(index, v)) for v in sweep]
+                sweep_hit = any(abs(d - target) <= tolerance for _, d in swept)
+                ok &= r.in_tolerance or not sweep_hit # the search finds a volume whenever the sweep has one
+                total += len(r.measured)
+                sweep_total += len(swept)
+                results.append((index, r))
+        for index, r in results:
+            print(f"[selfcheck] {name}, sound {index}: {r.describe()}")
+        print(f"[selfcheck] volume search, {name}: {'OK' if ok else 'FAILED'} ({total} measurements vs {sweep_total} for the sweep)")
+        all_ok &= ok
+    return all_ok
+
+
+__all__ = [
+    "SearchResult",
+    "search_Volume",
+    "selfcheck_search",
+]
+
+
+if __name__ == "__main__":
+    selfcheck_search()